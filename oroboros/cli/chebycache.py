@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Oroboros ephemeris cache utilities.
+
+Build an ephemeris cache file with the bodies and settings of a filter,
+then select it in a filter with ephemeris type 'cheby'.
+
+"""
+
+import sys
+
+if len(sys.argv) == 1:
+	sys.exit('oroboros-cheby: no arguments. Try "oroboros-cheby --help" instead.')
+
+import swisseph as swe
+
+from oroboros.core import cfg
+from oroboros.core import swestate
+from oroboros.core import chebycache
+from oroboros.core.filters import Filter
+from oroboros.core.planets import planets_registry
+
+help_text = """
+usage: oroboros-cheby option[=arg] [option[=arg]...]
+
+options:
+  --build=path      build cache file
+  --check=path      compare cache file with swisseph
+  --filter=name     filter (settings and bodies), default %s
+  --bodies=names    comma-separated bodies names, default filter bodies
+  --start=year      first year, default 1900
+  --end=year        last year (included), default 2100
+  --samples=num     number of random dates to check, default 1000
+  -h, --help        print this text
+
+see also: oroboros
+""" % cfg.dft_filter._name
+
+def getarg(opt):
+	"""Get option argument.
+	
+	:type opt: str
+	:rtype: str or None
+	"""
+	try:
+		cmd, arg = opt.split('=', 1)
+	except ValueError:
+		arg = None
+	return arg
+
+opts = dict()
+for cmd in sys.argv[1:]:
+	if cmd in ('-h', '--help'):
+		sys.exit(help_text)
+	name = cmd.split('=', 1)[0]
+	if name not in ('--build', '--check', '--filter', '--bodies', '--start',
+		'--end', '--samples'):
+		sys.exit(help_text)
+	opts[name] = getarg(cmd)
+
+if '--filter' in opts:
+	filt = Filter(opts['--filter'])
+else:
+	filt = cfg.dft_filter
+if filt._ephe_type == 'cheby':
+	sys.exit('oroboros-cheby: filter %s already uses a cache.' % filt._name)
+if filt._xcentric == 'topo':
+	sys.exit('oroboros-cheby: cannot cache topocentric positions.')
+swestate.setup(filt, 0.0, 0.0, 0)
+flag = filt.get_calcflag()
+
+if '--build' in opts:
+	if '--bodies' in opts:
+		bodies = opts['--bodies'].split(',')
+	else:
+		reg = planets_registry()
+		bodies = [x for x in filt.compile().bodies
+			if reg[x]._family in (0, 1, 3)]
+	start = int(opts.get('--start', 1900))
+	end = int(opts.get('--end', 2100))
+	chebycache.build(opts['--build'], bodies,
+		swe.julday(start, 1, 1, 0.0), swe.julday(end + 1, 1, 1, 0.0), flag)
+elif '--check' in opts:
+	err = chebycache.check(opts['--check'],
+		int(opts.get('--samples', 1000)))
+	reg = planets_registry()
+	for num in sorted(err):
+		print '%s: %s' % (reg.get_num(num)._name,
+			' '.join('%.2e' % x for x in err[num]))
+else:
+	sys.exit(help_text)
+
+
+# End.
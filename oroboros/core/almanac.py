@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Almanac events: sign ingresses and stations.
+
+Bodies are followed with adaptive steps: the step is chosen so that a
+body moves a few degrees at its current speed, bounded by a maximum
+step shorter than its retrograde periods. Slow bodies thus need only a
+few evaluations per year. Sign changes of the speed (stations) and of
+the zodiac sign (ingresses) are then refined (see roots). Motions
+shorter than the maximum step of a body (e.g. a few hours retrograde of
+the true node) may be missed.
+
+Events are generated lazily, in chronological order.
+	
+	Find the events of one year.
+		
+		>>> flag = swe.FLG_SPEED|swe.FLG_MOSEPH
+		>>> events = list(find_events(['Sun', 'Mercury'], 2451545,
+		...     2451545 + 365, flag))
+		>>> len([x for x in events if x.body.name == 'Sun'])
+		12
+		>>> len([x for x in events if x.kind == 'retrograde'])
+		3
+	
+	Retrograde periods.
+		
+		>>> len(list(retrograde_periods(['Mercury'], 2451545,
+		...     2451545 + 365, flag)))
+		3
+	
+	Write events.
+		
+		>>> import StringIO
+		>>> f = StringIO.StringIO()
+		>>> write_csv(events, f)
+
+"""
+
+import csv
+import heapq
+import json
+
+import swisseph as swe
+
+from oroboros.core import roots
+from oroboros.core.planets import Planet, planets_registry
+
+
+__all__ = ['AlmanacEvent', 'find_events', 'retrograde_periods',
+	'write_csv', 'write_json', 'signs']
+
+
+#: Zodiac signs names
+signs = ('Aries', 'Taurus', 'Gemini', 'Cancer', 'Leo', 'Virgo', 'Libra',
+	'Scorpio', 'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces')
+
+#: Degrees a body may move in one step
+_move = 10.0
+
+#: Maximum steps (days), by swisseph num
+_max_steps = {
+	1: 1, # moon
+	0: 10, # sun
+	2: 8, # mercury
+	3: 15, # venus
+	4: 25, # mars
+	11: 0.25, # true node
+	13: 1, # osculating apogee
+	-3: 0.25, # ketu (true)
+	-5: 0.25 # priapus (true)
+	}
+
+#: Maximum step for other bodies (days)
+_max_step = 45
+
+#: Minimum step (days)
+_min_step = 0.01
+
+
+class AlmanacEvent(object):
+	"""Sign ingress or station of a body."""
+	
+	__slots__ = ('_jd', '_body', '_kind', '_longitude', '_lonspeed')
+	
+	def _get_jd(self):
+		"""Get Julian day (UT).
+		
+		:rtype: float
+		"""
+		return self._jd
+	
+	def _get_body(self):
+		"""Get body.
+		
+		:rtype: Planet
+		"""
+		return self._body
+	
+	def _get_kind(self):
+		"""Get event kind ('ingress', 'retrograde', 'direct').
+		
+		:rtype: str
+		"""
+		return self._kind
+	
+	def _get_longitude(self):
+		"""Get body longitude.
+		
+		:rtype: float
+		"""
+		return self._longitude
+	
+	def _get_lonspeed(self):
+		"""Get body longitude speed.
+		
+		:rtype: float
+		"""
+		return self._lonspeed
+	
+	def _get_sign(self):
+		"""Get zodiac sign (0 to 11) entered, or of the station.
+		
+		:rtype: int
+		"""
+		return int(self._longitude // 30) % 12
+	
+	def _get_retrograde(self):
+		"""Return True if body is retrograde after the event.
+		
+		:rtype: bool
+		"""
+		if self._kind == 'ingress':
+			return self._lonspeed < 0
+		return self._kind == 'retrograde'
+	
+	jd = property(_get_jd,
+		doc='Julian day.')
+	body = property(_get_body,
+		doc='Body.')
+	kind = property(_get_kind,
+		doc='Event kind (ingress|retrograde|direct).')
+	longitude = property(_get_longitude,
+		doc='Body longitude.')
+	lonspeed = property(_get_lonspeed,
+		doc='Body longitude speed.')
+	sign = property(_get_sign,
+		doc='Zodiac sign (0 to 11).')
+	retrograde = property(_get_retrograde,
+		doc='Body is retrograde after the event (bool).')
+	
+	def __init__(self, jd, body, kind, longitude, lonspeed):
+		"""Init event.
+		
+		For ingresses in retrograde motion, longitude is the sign cusp
+		left behind, at the end of the sign entered.
+		
+		:type jd: float
+		:type body: Planet
+		:type kind: str
+		:type longitude: float
+		:type lonspeed: float
+		"""
+		self._jd = jd
+		self._body = body
+		self._kind = kind
+		self._longitude = longitude
+		self._lonspeed = lonspeed
+	
+	def __cmp__(self, other):
+		return cmp((self._jd, self._body._ranking),
+			(other._jd, other._body._ranking))
+	
+	def __iter__(self):
+		"""Iterate over Julian day, date, body, kind, sign, longitude.
+		
+		:rtype: iterator
+		"""
+		return iter((self._jd, '%04d-%02d-%02d %02d:%02d:%02d' % (
+			swe._revjul(self._jd)), self._body._name, self._kind,
+			signs[self.sign], self._longitude))
+	
+	def __repr__(self):
+		return 'AlmanacEvent(%s, %s, %s, %s)' % (self._jd, self._body._name,
+			self._kind, signs[self.sign])
+
+
+def _follow(planet, jd_start, jd_end, flag):
+	"""Generate events of one body, in chronological order.
+	
+	:type planet: Planet
+	:type jd_start: float
+	:type jd_end: float
+	:type flag: int
+	:rtype: generator
+	"""
+	max_step = float(_max_steps.get(planet._num, _max_step))
+	calc = planet.calc_ut
+	t0 = jd_start
+	r0 = calc(t0, flag)
+	while t0 < jd_end:
+		dt = max(min(_move / max(abs(r0[3]), 1e-9), max_step), _min_step)
+		t1 = min(t0 + dt, jd_end)
+		r1 = calc(t1, flag)
+		events = list()
+		pieces = [(t0, r0, t1, r1)]
+		if (r0[3] < 0) != (r1[3] < 0) and r0[3] != 0 and r1[3] != 0:
+			ts = roots.find_root(_speed(planet, flag, t0, r0[3]), t0, t1,
+				r0[3], r1[3])
+			rs = calc(ts, flag)
+			events.append(AlmanacEvent(ts, planet,
+				'retrograde' if r1[3] < 0 else 'direct', rs[0], rs[3]))
+			pieces = [(t0, r0, ts, rs), (ts, rs, t1, r1)]
+		for ta, ra, tb, rb in pieces:
+			events.extend(_ingresses(planet, ta, ra, tb, rb, flag))
+		events.sort()
+		for ev in events:
+			yield ev
+		t0, r0 = t1, r1
+
+
+def _speed(planet, flag, t, v):
+	"""Return speed function for stations, with secant derivative.
+	
+	:type planet: Planet
+	:type flag: int
+	:type t: float
+	:type v: float
+	:rtype: callable
+	"""
+	last = [t, v]
+	def func(t):
+		v = planet.calc_ut(t, flag)[3]
+		dv = None
+		if t != last[0]:
+			dv = (v - last[1]) / (t - last[0])
+		last[:] = [t, v]
+		return v, dv
+	return func
+
+
+def _ingresses(planet, t0, r0, t1, r1, flag):
+	"""Return ingresses of a body moving in one direction.
+	
+	:type planet: Planet
+	:type t0: float
+	:type r0: tuple
+	:type t1: float
+	:type r1: tuple
+	:type flag: int
+	:rtype: list
+	"""
+	ret = list()
+	arc = roots.angle_diff(r1[0], r0[0])
+	if arc == 0:
+		return ret
+	if arc > 0: # cusps in ]lon0;lon1]
+		cusp = (r0[0] // 30 + 1) * 30
+		cusps = list()
+		while cusp <= r0[0] + arc:
+			cusps.append(cusp % 360.0)
+			cusp += 30
+	else: # cusps in [lon1;lon0[
+		cusp = (r0[0] // 30) * 30
+		if cusp == r0[0]:
+			cusp -= 30
+		cusps = list()
+		while cusp >= r0[0] + arc:
+			cusps.append(cusp % 360.0)
+			cusp -= 30
+	calc = planet.calc_ut
+	diff = roots.angle_diff
+	for cusp in cusps:
+		def func(t):
+			res = calc(t, flag)
+			return diff(res[0], cusp), res[3]
+		try:
+			jd = roots.find_root(func, t0, t1, diff(r0[0], cusp),
+				diff(r1[0], cusp))
+		except ValueError:
+			continue
+		res = calc(jd, flag)
+		lon = cusp if arc > 0 else (cusp - 1e-9) % 360.0
+		ret.append(AlmanacEvent(jd, planet, 'ingress', lon, res[3]))
+	return ret
+
+
+def find_events(bodies, jd_start, jd_end, flag):
+	"""Generate ingresses and stations of bodies, in chronological order.
+	
+	Swisseph must be set up before.
+	
+	:type bodies: sequence of Planet, str or int
+	:type jd_start: numeric
+	:type jd_end: numeric
+	:type flag: int
+	:rtype: generator of AlmanacEvent
+	:raise ValueError: invalid span or body (houses, parts)
+	"""
+	if jd_end <= jd_start:
+		raise ValueError('Invalid span %s %s.' % (jd_start, jd_end))
+	reg = planets_registry()
+	pl = list()
+	for b in bodies:
+		if isinstance(b, Planet):
+			pl.append(b)
+		elif isinstance(b, int):
+			pl.append(reg.get_num(b))
+		else:
+			pl.append(reg[b])
+	for p in pl:
+		if p._family in (4, 5):
+			raise ValueError('Cannot follow %s.' % p._name)
+	flag |= swe.FLG_SPEED
+	return heapq.merge(*[_follow(p, float(jd_start), float(jd_end), flag)
+		for p in pl])
+
+
+def retrograde_periods(bodies, jd_start, jd_end, flag):
+	"""Generate retrograde periods, as (body, start, end) tuples.
+	
+	Periods are cut at jd_start and jd_end, and generated in order of
+	their end.
+	
+	:type bodies: sequence of Planet, str or int
+	:type jd_start: numeric
+	:type jd_end: numeric
+	:type flag: int
+	:rtype: generator
+	"""
+	flag |= swe.FLG_SPEED
+	reg = planets_registry()
+	starts = dict()
+	for b in bodies:
+		p = b if isinstance(b, Planet) else (reg.get_num(b)
+			if isinstance(b, int) else reg[b])
+		if p.calc_ut(jd_start, flag)[3] < 0:
+			starts[p._name] = float(jd_start)
+	for ev in find_events(bodies, jd_start, jd_end, flag):
+		if ev._kind == 'retrograde':
+			starts[ev._body._name] = ev._jd
+		elif ev._kind == 'direct' and ev._body._name in starts:
+			yield ev._body, starts.pop(ev._body._name), ev._jd
+	for name, start in sorted(starts.items(), key=lambda x: x[1]):
+		yield reg[name], start, float(jd_end)
+
+
+def write_csv(events, fileobj):
+	"""Write events as CSV (jd, date, body, event, sign, longitude).
+	
+	:type events: iterable of AlmanacEvent
+	:type fileobj: file
+	"""
+	writer = csv.writer(fileobj)
+	writer.writerow(('jd', 'date', 'body', 'event', 'sign', 'longitude'))
+	for ev in events:
+		writer.writerow([x.encode('utf-8') if isinstance(x, unicode) else x
+			for x in ev])
+
+
+def write_json(events, fileobj):
+	"""Write events as a JSON list of objects.
+	
+	:type events: iterable of AlmanacEvent
+	:type fileobj: file
+	"""
+	keys = ('jd', 'date', 'body', 'event', 'sign', 'longitude')
+	json.dump([dict(zip(keys, ev)) for ev in events], fileobj, indent=1)
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
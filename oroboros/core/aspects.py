@@ -55,11 +55,16 @@ from oroboros.core.colors import RGBColor
 from oroboros.core import xmlutils
 
 
-__all__ = ['Aspect', 'AspectsList',
+__all__ = ['Aspect', 'AspectsList', 'AspectsRegistry',
 	'all_aspects', 'all_aspects_names',
+	'aspects_registry', 'clear_aspects_registry',
 	'xml_export_aspects', 'xml_import_aspects']
 
 
+#: Shared aspects definitions (see aspects_registry())
+_registry = None
+
+
 
 class PiAngle(Decimal):
 	"""Aspect angle type (in degrees, despite the name) [0;180]."""
@@ -344,6 +349,8 @@ class Aspect(db.Object):
 			self._insert()
 		else:
 			self._update()
+		clear_aspects_registry()
+		db.touch()
 	
 	def _insert(self):
 		"""Insert new aspect in database.
@@ -389,6 +396,8 @@ class Aspect(db.Object):
 		sql = "delete from Aspects where _idx = ?;"
 		db.execute(sql, (self._idx_,))
 		self._idx_ = None
+		clear_aspects_registry()
+		db.touch()
 	
 	def __iter__(self):
 		"""Return iterator over aspect properties.
@@ -520,6 +529,82 @@ class AspectsList(list):
 		raise KeyError(idx)
 
 
+class AspectsRegistry(AspectsList):
+	"""All aspects definitions, indexed by name, angle and db idx.
+	
+	Aspects are shared by all calculations results: they must not be
+	modified (use Aspect objects to edit definitions).
+	
+	"""
+	
+	def __init__(self):
+		"""Load all aspects definitions, by ranking and angle."""
+		AspectsList.__init__(self)
+		sql = 'select * from Aspects order by ranking, angle;'
+		for row in db.execute(sql).fetchall():
+			self.append(Aspect())
+			self[-1].set(*row)
+		self._names = dict((a._name, a) for a in self)
+		self._angles = dict((a._angle, a) for a in self)
+		self._idxs = dict((a._idx_, a) for a in self)
+	
+	def __getitem__(self, item):
+		"""Return aspect by position in list, or by name.
+		
+		:type item: int or str
+		:rtype: Aspect
+		:raise KeyError: aspect not found
+		"""
+		if isinstance(item, int):
+			return list.__getitem__(self, item)
+		return self._names[item]
+	
+	def __contains__(self, item):
+		"""Return True if an aspect name is registered.
+		
+		:type item: str
+		:rtype: bool
+		"""
+		return item in self._names
+	
+	def get_idx(self, idx):
+		"""Return aspect by database index.
+		
+		:type idx: int
+		:rtype: Aspect
+		:raise KeyError: aspect not found
+		"""
+		return self._idxs[idx]
+	
+	def get_angle(self, angle):
+		"""Return aspect by angle.
+		
+		:type angle: PiAngle
+		:rtype: Aspect
+		:raise KeyError: aspect not found
+		"""
+		return self._angles[angle]
+
+
+def aspects_registry():
+	"""Return shared aspects definitions, loaded once.
+	
+	Registry is cleared when an aspect is saved or deleted.
+	
+	:rtype: AspectsRegistry
+	"""
+	global _registry
+	if _registry == None:
+		_registry = AspectsRegistry()
+	return _registry
+
+
+def clear_aspects_registry():
+	"""Forget shared aspects definitions (reload them when needed)."""
+	global _registry
+	_registry = None
+
+
 def all_aspects():
 	"""Return a list of all aspect objects in database.
 	
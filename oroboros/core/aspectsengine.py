@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bulk aspects matching.
+
+Positions are handled as flat lists of floats (longitudes and longitude
+speeds), orbs as a matrix indexed by bodies and aspects. All pairs are
+screened against all aspects with plain float arithmetic, exact results
+are then computed by swisseph for the few candidates left, so that they
+do not differ from the one-by-one comparisons.
+	
+	Build an orbs matrix (two bodies, aspects conjunction and square).
+		
+		>>> from decimal import Decimal
+		>>> from oroboros.core.orbs import OrbModifier
+		>>> mods = [OrbModifier('0'), OrbModifier('-50%')]
+		>>> orbs = orbs_matrix([Decimal('10'), Decimal('8')], mods, mods)
+		>>> orbs[0][1]
+		(7.5, 6.0)
+	
+	Match positions.
+		
+		>>> list(match([10.0, 98.0], [1.0, 0.5], [10.0, 98.0], [1.0, 0.5],
+		...     [0.0, 90.0], orbs, triangle(2)))
+		[(0, 1, 1, 2.0, False, 0.3333333333333333)]
+	
+	Match mid-points (or any points without orbs) against bodies.
+		
+		>>> list(match_points([54.0, 200.0], [0.5, 0.5], [10.0, 145.0],
+		...     [1.0, 0.0], [0.0, 90.0], [(5.0, 5.0), (1.0, 1.0)]))
+		[(0, 1, 1, 1.0, True, 1.0)]
+
+"""
+
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+import swisseph as swe
+
+
+__all__ = ['separation', 'orbs_matrix', 'triangle', 'rectangle', 'match',
+	'match_points', 'scan_points', 'benchmark']
+
+
+#: Margin added to orbs when screening candidates, so that the final
+#: decision is always left to swisseph.
+_epsilon = 1e-7
+
+
+def separation(lon1, lon2):
+	"""Return angular distance between two longitudes, in [0;180].
+	
+	:type lon1: float
+	:type lon2: float
+	:rtype: float
+	"""
+	d = (lon1 - lon2) % 360.0
+	if d > 180.0:
+		return 360.0 - d
+	return d
+
+
+def orbs_matrix(orbs, mods1, mods2):
+	"""Return a matrix of orbs for all bodies pairs and aspects.
+	
+	Orbs are the aspects base orbs, modifiers the orb modifiers of bodies
+	(rows, then columns). Orb is computed as the base orb plus the mean of
+	both modifiers. Bodies having None as modifier are excluded, giving
+	None in the matrix. Negative orbs are set to -1.
+	
+	Values are computed with Decimal, like the one-by-one comparisons,
+	once for each distinct couple of modifiers.
+	
+	:type orbs: sequence of Decimal
+	:type mods1: sequence of OrbModifier or None
+	:type mods2: sequence of OrbModifier or None
+	:rtype: list of lists of tuples of float
+	"""
+	two = Decimal('2')
+	memo = dict()
+	ret = list()
+	for m1 in mods1:
+		row = list()
+		for m2 in mods2:
+			if m1 == None or m2 == None:
+				row.append(None)
+				continue
+			try:
+				row.append(memo[(m1, m2)])
+			except KeyError:
+				orbrow = list()
+				for orb in orbs:
+					orb = orb + (m1.get_absolute(orb) + m2.get_absolute(orb)) / two
+					if orb < 0:
+						orbrow.append(-1.0)
+					else:
+						orbrow.append(float(orb))
+				memo[(m1, m2)] = tuple(orbrow)
+				row.append(memo[(m1, m2)])
+		ret.append(row)
+	return ret
+
+
+def triangle(num):
+	"""Return pairs of indexes (i, j), with i < j < num.
+	
+	Use it to compare bodies of one chart.
+	
+	:type num: int
+	:rtype: generator
+	"""
+	return ((i, j) for i in xrange(num - 1) for j in xrange(i + 1, num))
+
+
+def rectangle(num1, num2):
+	"""Return all pairs of indexes (i, j), with i < num1 and j < num2.
+	
+	Use it to compare bodies of two charts.
+	
+	:type num1: int
+	:type num2: int
+	:rtype: generator
+	"""
+	return ((i, j) for i in xrange(num1) for j in xrange(num2))
+
+
+def match(lons1, speeds1, lons2, speeds2, angles, orbs, pairs):
+	"""Match pairs of positions against all aspects.
+	
+	Yield (i, j, k, diff, apply, factor) for each pair (i, j) in aspect k,
+	in order of pairs, then aspects. Diff, apply and factor are the
+	swisseph.match_aspect2 results.
+	
+	:see: orbs_matrix()
+	
+	:type lons1: sequence of float
+	:type speeds1: sequence of float
+	:type lons2: sequence of float
+	:type speeds2: sequence of float
+	:type angles: sequence of float
+	:type orbs: list of lists of tuples of float
+	:type pairs: iterable of (int, int)
+	:rtype: generator
+	"""
+	if len(angles) == 0:
+		return
+	# aspects sorted by angle, and widest orb, to bisect candidates
+	order = sorted(xrange(len(angles)), key=angles.__getitem__)
+	sorted_angles = [angles[k] for k in order]
+	reach = -1.0
+	for row in orbs:
+		for cell in row:
+			if cell != None:
+				reach = max(reach, max(cell))
+	if reach < 0:
+		return
+	reach += _epsilon
+	match_aspect = swe._match_aspect2
+	for i, j in pairs:
+		cell = orbs[i][j]
+		if cell == None:
+			continue
+		lon1, lon2 = lons1[i], lons2[j]
+		sep = (lon1 - lon2) % 360.0
+		if sep > 180.0:
+			sep = 360.0 - sep
+		lo = bisect_left(sorted_angles, sep - reach)
+		hi = bisect_right(sorted_angles, sep + reach)
+		if lo == hi:
+			continue
+		found = [k for k in order[lo:hi]
+			if cell[k] >= 0 and abs(sep - angles[k]) <= cell[k] + _epsilon]
+		found.sort()
+		for k in found:
+			diff, apply, factor = match_aspect(lon1, speeds1[i], lon2,
+				speeds2[j], angles[k], cell[k])
+			if diff != None:
+				yield i, j, k, diff, apply, factor
+
+
+
+def _windows(center, orb):
+	"""Return longitudes intervals within orb of a point, in [0;360].
+	
+	:type center: float
+	:type orb: float
+	:rtype: list of tuples
+	"""
+	if orb >= 180.0:
+		return [(0.0, 360.0)]
+	lo = (center - orb) % 360.0
+	hi = lo + 2 * orb
+	if hi < 360.0:
+		return [(lo, hi)]
+	return [(lo, 360.0), (0.0, hi - 360.0)]
+
+
+def match_points(lons1, speeds1, lons2, speeds2, angles, orbs):
+	"""Match points (e.g. mid-points) against bodies, for all aspects.
+	
+	Points 1 are sorted by longitude once (the dial). Then, for each body
+	and aspect, the points within orb are found by binary search, around
+	both longitudes at the aspect angle from the body. Exact results are
+	computed by swisseph for the candidates.
+	
+	Orbs are given by body (points 2), as tuples of floats by aspect.
+	Negative orbs are ignored.
+	
+	Yield (i, j, k, diff, apply, factor), in order of points 1, points 2,
+	then aspects, like a scan of all combinations would.
+	
+	:see: scan_points()
+	
+	:type lons1: sequence of float
+	:type speeds1: sequence of float
+	:type lons2: sequence of float
+	:type speeds2: sequence of float
+	:type angles: sequence of float
+	:type orbs: sequence of tuples of float
+	:rtype: generator
+	"""
+	order = sorted(xrange(len(lons1)), key=lons1.__getitem__)
+	dial = [lons1[i] for i in order]
+	found = set()
+	for j, row in enumerate(orbs):
+		lon2 = lons2[j]
+		for k, orb in enumerate(row):
+			if orb < 0:
+				continue
+			orb += _epsilon
+			angle = angles[k]
+			for center in (lon2 + angle, lon2 - angle):
+				for lo, hi in _windows(center, orb):
+					for x in xrange(bisect_left(dial, lo),
+						bisect_right(dial, hi)):
+						found.add((order[x], j, k))
+	match_aspect = swe._match_aspect2
+	for i, j, k in sorted(found):
+		diff, apply, factor = match_aspect(lons1[i], speeds1[i], lons2[j],
+			speeds2[j], angles[k], orbs[j][k])
+		if diff != None:
+			yield i, j, k, diff, apply, factor
+
+
+def scan_points(lons1, speeds1, lons2, speeds2, angles, orbs):
+	"""Match points against bodies, comparing all combinations.
+	
+	Same arguments and results as match_points(), for cross-checking.
+	
+	:rtype: generator
+	"""
+	match_aspect = swe._match_aspect2
+	for i, lon1 in enumerate(lons1):
+		for j, row in enumerate(orbs):
+			for k, orb in enumerate(row):
+				if orb < 0:
+					continue
+				diff, apply, factor = match_aspect(lon1, speeds1[i],
+					lons2[j], speeds2[j], angles[k], orb)
+				if diff != None:
+					yield i, j, k, diff, apply, factor
+
+
+def benchmark(counts=(10, 20, 40, 80), orb=2.0, seed=0):
+	"""Compare mid-points aspects scan and dial search, print timings.
+	
+	For each number of bodies, random positions are generated, and their
+	mid-points matched against the bodies, for the usual aspects.
+	
+	Return list of (bodies, mid-points, scan seconds, dial seconds).
+	
+	:type counts: sequence of int
+	:type orb: float
+	:type seed: int
+	:rtype: list
+	"""
+	import random
+	import time
+	rnd = random.Random(seed)
+	angles = [0.0, 30.0, 45.0, 60.0, 72.0, 90.0, 120.0, 135.0, 144.0, 150.0,
+		180.0]
+	ret = list()
+	for n in counts:
+		lons = [rnd.uniform(0, 360) for x in xrange(n)]
+		speeds = [rnd.uniform(-1, 1) for x in xrange(n)]
+		midp = [(i, j) for i, j in triangle(n)]
+		mlons = [swe.deg_midp(lons[i], lons[j]) for i, j in midp]
+		mspeeds = [(speeds[i] + speeds[j]) / 2 for i, j in midp]
+		orbs = [tuple(orb for x in angles)] * n
+		t0 = time.time()
+		res1 = list(scan_points(mlons, mspeeds, lons, speeds, angles, orbs))
+		t1 = time.time()
+		res2 = list(match_points(mlons, mspeeds, lons, speeds, angles, orbs))
+		t2 = time.time()
+		if res1 != res2:
+			raise AssertionError('Results differ for %s bodies.' % n)
+		ret.append((n, len(midp), t1 - t0, t2 - t1))
+		print '%4d bodies %6d mid-points: scan %8.3fs, dial %8.3fs (x%.1f)' % (
+			n, len(midp), t1 - t0, t2 - t1, (t1 - t0) / max(t2 - t1, 1e-6))
+	return ret
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
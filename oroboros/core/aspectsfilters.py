@@ -79,6 +79,7 @@ class AspectsFilter(db.Object):
 	
 	def _set_dict(self, res):
 		"""Set internal dict of aspects (with db result rows)."""
+		db.touch()
 		self._dict_.clear()
 		for x, y in res:
 			if y in (True, '1', 1, 'True', 'true', 'yes'):
@@ -265,6 +266,7 @@ class AspectsFilter(db.Object):
 				else:
 					value = False
 				self._dict_[asp] = value
+				db.touch()
 				return
 		raise KeyError(key)
 	
@@ -90,6 +90,7 @@ class AspectsRestrictions(db.Object):
 		
 		:type res: sequence
 		"""
+		db.touch()
 		self._dict_.clear()
 		for x, y in res:
 			if y in (True, '1', 1, 'True', 'true'):
@@ -290,6 +291,7 @@ class AspectsRestrictions(db.Object):
 				else:
 					value = False
 				self._dict_[plt] = value
+				db.touch()
 				return
 		raise KeyError(key)
 	
@@ -8,8 +8,11 @@ Provides functions for searching, retrieving, sorting results.
 
 """
 
-from oroboros.core.aspects import Aspect
-from oroboros.core.results import PlanetData, MidPointData
+import heapq
+from operator import attrgetter
+
+from oroboros.core.aspects import Aspect, PiAngle, aspects_registry
+from oroboros.core.results import PlanetData, MidPointData, _IndexedList
 
 
 __all__ = ['AspectData', 'AspectDataList', 'MidPointAspectData',
@@ -74,7 +77,12 @@ class AspectData(object):
 		"""
 		if not isinstance(asp, Aspect):
 			try:
-				asp = Aspect(asp)
+				if isinstance(asp, int):
+					asp = aspects_registry().get_idx(asp)
+				elif isinstance(asp, PiAngle):
+					asp = aspects_registry().get_angle(asp)
+				else:
+					asp = aspects_registry()[asp]
 			except:
 				raise TypeError('Invalid aspect object %s.' % asp)
 		self._aspect = asp
@@ -148,14 +156,62 @@ class AspectData(object):
 			self._apply, self._factor])
 	
 	def __repr__(self):
-		return 'AspectData(%s, %s, %s, %s, %s, %s)' % (
+		return 'AspectData(%s, %s, %s, %s, %s, %s)' % tuple(
 			repr(x) for x in (
 			self._data1, self._data2, self._aspect, self._diff, self._apply,
 			self._factor))
 
 
-class AspectDataList(list):
-	"""Aspects data list."""
+def _body(data):
+	"""Return key of a planet or midpoint data.
+	
+	Planet name for planets, tuple of planets names for midpoints.
+	
+	:type data: PlanetData or MidPointData
+	:rtype: str or tuple
+	"""
+	if isinstance(data, MidPointData):
+		return data._data1._planet._name, data._data2._planet._name
+	return data._planet._name
+
+
+def _pair(data1, data2):
+	"""Return key of a pair of planets or midpoints data (in any order).
+	
+	:type data1: PlanetData or MidPointData
+	:type data2: PlanetData or MidPointData
+	:rtype: frozenset
+	"""
+	return frozenset((_body(data1), _body(data2)))
+
+
+#: Sort key functions
+_precision_key = attrgetter('_diff')
+_ranking_key = attrgetter('_aspect._ranking')
+_factor_key = attrgetter('_factor')
+
+
+class AspectDataList(_IndexedList):
+	"""Aspects data list.
+	
+	Results are indexed by aspect name, by planet name and by pair of
+	planets, and kept sorted by precision and by ranking, so they can be
+	queried without scanning or sorting the list again. Indexes are built
+	when first needed, and reset when the list changes (including sorting
+	in place).
+	
+	Midpoints are queried by their planets names (any of them for
+	by_body(), tuple of both names for by_pair()).
+	
+	"""
+	
+	def __init__(self, seq=()):
+		"""Init list.
+		
+		:type seq: iterable of AspectData
+		"""
+		list.__init__(self, seq)
+		self._index = None
 	
 	def feed(self, data1, data2, asp, diff, apply, factor):
 		"""Append calculation results.
@@ -167,68 +223,132 @@ class AspectDataList(list):
 		"""
 		self.append(AspectData(data1, data2, asp, diff, apply, factor))
 	
+	def _get_index(self, kind):
+		"""Get an index of results, build it if needed.
+		
+		Kind is one of aspect, body, pair (dicts of lists of results), or
+		precision, ranking (sorted lists of results).
+		
+		:type kind: str
+		:rtype: dict or list
+		"""
+		if self._index == None:
+			self._index = dict()
+		try:
+			return self._index[kind]
+		except KeyError:
+			pass
+		if kind == 'precision':
+			idx = sorted(self, key=_precision_key)
+		elif kind == 'ranking':
+			idx = sorted(self, key=_ranking_key)
+		else:
+			idx = dict()
+			for e in self:
+				if kind == 'aspect':
+					keys = (e._aspect._name,)
+				elif kind == 'pair':
+					keys = (_pair(e._data1, e._data2),)
+				else: # body
+					keys = set()
+					for data in (e._data1, e._data2):
+						if isinstance(data, MidPointData):
+							keys.add(data._data1._planet._name)
+							keys.add(data._data2._planet._name)
+						else:
+							keys.add(data._planet._name)
+				for k in keys:
+					idx.setdefault(k, list()).append(e)
+		self._index[kind] = idx
+		return idx
+	
+	def sort(self, *args, **kwargs):
+		list.sort(self, *args, **kwargs)
+		self._index = None
+	
 	def sort_by_precision(self, reverse=False):
 		"""Sort results by precision.
 		
 		:rtype: self
 		"""
-		self.sort(self._sort_by_precision, reverse=reverse)
+		self.sort(key=_precision_key, reverse=reverse)
 		return self
 	
-	@staticmethod
-	def _sort_by_precision(x, y):
-		"""Function to sort aspects list by aspect precision."""
-		if x._diff > y._diff:
-			return 1
-		elif x._diff < y._diff:
-			return -1
-		return 0
-	
 	def sort_by_ranking(self, reverse=False):
 		"""Sort results by aspect ranking.
 		
 		:rtype: self
 		"""
-		self.sort(self._sort_by_ranking, reverse=reverse)
+		self.sort(key=_ranking_key, reverse=reverse)
 		return self
 	
-	@staticmethod
-	def _sort_by_ranking(x, y):
-		"""Function to sort results list by aspect ranking."""
-		if x._aspect._ranking > y._aspect._ranking:
-			return 1
-		elif x._aspect._ranking < y._aspect._ranking:
-			return -1
-		return 0
-	
 	def sort_by_factor(self, reverse=False):
 		"""Sort aspects list by aspect strength factor.
 		
 		:rtype: self
 		"""
-		self.sort(self._sort_by_factor, reverse=reverse)
+		self.sort(key=_factor_key, reverse=reverse)
 		return self
 	
-	@staticmethod
-	def _sort_by_factor(x, y):
-		"""Function to sort results by strength factor."""
-		if x._factor > y._factor:
-			return 1
-		elif x._factor < y._factor:
-			return -1
-		return 0
+	def by_aspect(self, aspname):
+		"""Get all results for an aspect.
+		
+		:type aspname: str
+		:rtype: AspectDataList
+		"""
+		return self.__class__(self._get_index('aspect').get(aspname, ()))
+	
+	def by_body(self, name):
+		"""Get all results involving a planet (or midpoints of a planet).
+		
+		:type name: str
+		:rtype: AspectDataList
+		"""
+		return self.__class__(self._get_index('body').get(name, ()))
+	
+	def by_pair(self, body1, body2):
+		"""Get all results between two planets or midpoints (in any order).
+		
+		Midpoints are given as tuples of planets names.
+		
+		:type body1: str or tuple
+		:type body2: str or tuple
+		:rtype: AspectDataList
+		"""
+		return self.__class__(self._get_index('pair').get(
+			frozenset((body1, body2)), ()))
+	
+	def tightest(self, n=None):
+		"""Get results sorted by precision, the n most exact only if given.
+		
+		The list is left unchanged.
+		
+		:type n: int
+		:rtype: AspectDataList
+		"""
+		if n != None and (self._index == None
+			or 'precision' not in self._index):
+			return self.__class__(heapq.nsmallest(n, self, key=_precision_key))
+		return self.__class__(self._get_index('precision')[:n])
+	
+	def ranked(self):
+		"""Get results sorted by aspect ranking.
+		
+		The list is left unchanged.
+		
+		:rtype: AspectDataList
+		"""
+		return self.__class__(self._get_index('ranking'))
 	
 	def __getitem__(self, aspname):
 		"""Get all results for an aspect.
 		
+		:see: by_aspect()
+		
 		:type aspname: str
 		:rtype: AspectDataList
 		"""
-		ret = AspectDataList()
-		for e in self:
-			if e._aspect._name == aspname:
-				ret.append(e)
-		return ret
+		return self.by_aspect(aspname)
 
 
 class MidPointAspectData(AspectData):
@@ -268,7 +388,7 @@ class MidPointAspectData(AspectData):
 		doc='Strength factor.')
 	
 	def __repr__(self):
-		return 'MidPointAspectData(%s, %s, %s, %s, %s, %s)' % (
+		return 'MidPointAspectData(%s, %s, %s, %s, %s, %s)' % tuple(
 			repr(x) for x in (
 			self._data1, self._data2, self._aspect,
 			self._diff, self._apply, self._factor))
@@ -289,18 +409,6 @@ class MidPointAspectDataList(AspectDataList):
 		"""
 		self.append(MidPointAspectData(data1, data2, asp, diff, apply, factor))
 	
-	def __getitem__(self, aspname):
-		"""Get all results for an aspect.
-		
-		:type aspname: str
-		:rtype: MidPointAspectDataList
-		"""
-		ret = MidPointAspectDataList()
-		for e in self:
-			if e._aspect._name == aspname:
-				ret.append(e)
-		return ret
-	
 	def get_midpoints(self):
 		"""Get a set of midpoints data.
 		
@@ -349,7 +457,7 @@ class InterMidPointAspectData(MidPointAspectData):
 		doc='Strength factor.')
 	
 	def __repr__(self):
-		return 'InterMidPointAspectData(%s, %s, %s, %s, %s, %s)' % (
+		return 'InterMidPointAspectData(%s, %s, %s, %s, %s, %s)' % tuple(
 			repr(x) for x in (
 			self._data1, self._data2, self._aspect,
 			self._diff, self._apply, self._factor))
@@ -370,18 +478,6 @@ class InterMidPointAspectDataList(MidPointAspectDataList):
 		"""
 		self.append(InterMidPointAspectData(data1, data2, asp, diff, apply, factor))
 	
-	def __getitem__(self, aspname):
-		"""Get all results for an aspect.
-		
-		:type aspname: str
-		:rtype: InterMidPointAspectDataList
-		"""
-		ret = InterMidPointAspectDataList()
-		for e in self:
-			if e._aspect._name == aspname:
-				ret.append(e)
-		return ret
-	
 	def get_midpoints2(self):
 		"""Get a set of midpoints data.
 		
@@ -4,88 +4,149 @@
 """
 Import astrolog32 files.
 
+Files are read one line at a time. A chart is made of a /qb line (date,
+time and coordinates) and a /zi line (name and location), and a file can
+hold many charts.
+
 """
 
 import os.path
 
+from oroboros.core.chartfile import ChartFile
 from oroboros.core.charts import Chart
 
 
-__all__ = ['load']
+__all__ = ['load', 'iterload']
 
 
+def _parse_qb(line):
+	"""Parse a /qb line (without command).
+	
+	Return datetime, longitude, latitude, utc offset and dst.
+	
+	:type line: str
+	:rtype: tuple
+	"""
+	# get date and time, latitude, longitude
+	parts = [x for x in line.split(' ') if x != '']
+	# datetime
+	mth, d, y, time, stdt, offset, lon, lat = parts
+	h, m, s = time.split(':')
+	dt = [int(x) for x in (y, mth, d, h, m, s)]
+	# longitude
+	try:
+		londg, rest = lon.split(':')
+		lonmn, rest = rest.split("'")
+		lonsc, londr = rest[:2], rest[-1]
+	except ValueError:
+		londg, lonmn, lonsc = lon.split(':')
+		lonsc, londr = lonsc[:1], lonsc[-1]
+	longitude = (londg, londr, lonmn, lonsc)
+	# latitude
+	try:
+		latdg, rest = lat.split(':')
+		latmn, rest = rest.split("'")
+		latsc, latdr = rest[:2], rest[-1]
+	except ValueError:
+		latdg, latmn, latsc = lat.split(':')
+		latsc, latdr = latsc[:1], latsc[-1]
+	latitude = (latdg, latdr, latmn, latsc)
+	# get utc offset
+	hoffset, moffset = offset.split(':')
+	soffset, hoffset = hoffset[0], int(hoffset[1:])
+	moffset = int(moffset) / 60.0
+	hoffset += moffset
+	if soffset == '+': # a32 inverts utc offsets
+		hoffset = -hoffset
+	if stdt == 'DT':
+		hoffset += 1
+		dst = True
+	else:
+		dst = False
+	return dt, longitude, latitude, hoffset, dst
+
+
+def _parse_zi(line):
+	"""Parse a /zi line (without command). Return name and location.
+	
+	:type line: str
+	:rtype: tuple
+	"""
+	name, location = line[1:-1].split('" "')
+	return name, location
+
+
+def _records(path):
+	"""Read file line by line, generate (qb, zi) parsed tuples.
+	
+	:type path: str
+	:rtype: generator
+	"""
+	qb = zi = None
+	f = file(path)
+	try:
+		for line in f:
+			line = line.strip()
+			if line.startswith('/qb'):
+				qb = _parse_qb(line[4:])
+			elif line.startswith('/zi'):
+				zi = _parse_zi(line[4:])
+			else:
+				continue
+			if qb != None and zi != None:
+				yield qb, zi
+				qb = zi = None
+	finally:
+		f.close()
+
+
+def _set(cht, qb, zi):
+	"""Set chart properties from parsed lines.
+	
+	:type cht: ChartFile
+	:type qb: tuple
+	:type zi: tuple
+	:rtype: ChartFile
+	"""
+	dt, longitude, latitude, hoffset, dst = qb
+	cht.name, cht.location = zi
+	cht.country = '?'
+	cht.datetime = dt
+	cht.longitude = longitude
+	cht.latitude = latitude
+	cht.utcoffset = hoffset
+	cht.dst = dst
+	cht.comment = 'Imported from Astrolog32'
+	return cht
+
 
 def load(path):
 	"""Load an astrolog32 file. Return chart (no positions calculated).
 	
+	If the file holds many charts, the last one is returned.
+	
+	:type path: str
 	:rtype: Chart
+	:raise ValueError: no chart found
 	"""
 	path = os.path.abspath(os.path.expanduser(path))
-	f = file(path)
-	lines = f.read().split('\n')
-	f.close()
-	for line in [x.strip() for x in lines]:
-		if not line.startswith('/'):
-			continue
-		if line.startswith('/qb'):
-			line = line[4:]
-			# get date and time, latitude, longitude
-			prts = line.split(' ')
-			parts = list()
-			for i, p in enumerate(prts):
-				if p != '':
-					parts.append(p)
-			# datetime
-			mth, d, y, time, stdt, offset, lon, lat = parts
-			h, m, s = time.split(':')
-			dt = [int(x) for x in (y, mth, d, h, m, s)]
-			# longitude
-			try:
-				londg, rest = lon.split(':')
-				lonmn, rest = rest.split("'")
-				lonsc, londr = rest[:2], rest[-1]
-			except ValueError:
-				londg, lonmn, lonsc = lon.split(':')
-				lonsc, londr = lonsc[:1], lonsc[-1]
-			longitude = (londg, londr, lonmn, lonsc)
-			# latitude
-			try:
-				latdg, rest = lat.split(':')
-				latmn, rest = rest.split("'")
-				latsc, latdr = rest[:2], rest[-1]
-			except ValueError:
-				latdg, latmn, latsc = lat.split(':')
-				latsc, latdr = latsc[:1], latsc[-1]
-			latitude = (latdg, latdr, latmn, latsc)
-			# get utc offset
-			hoffset, moffset = offset.split(':')
-			soffset, hoffset = hoffset[0], int(hoffset[1:])
-			moffset = int(moffset) / 60.0
-			hoffset += moffset
-			if soffset == '+': # a32 inverts utc offsets
-				hoffset = -hoffset
-			if stdt == 'DT':
-				hoffset += 1
-				dst = True
-			else:
-				dst = False
-		if line.startswith('/zi'):
-			line = line[4:]
-			name, location = line[1:-1].split('" "')
-	try:
-		cht = Chart(set_default=False, do_calc=False)
-		cht.name = name
-		cht.location = location
-		cht.country = '?'
-		cht.datetime = dt
-		cht.longitude = longitude
-		cht.latitude = latitude
-		cht.utcoffset = hoffset
-		cht.dst = dst
-		cht.comment = 'Imported from Astrolog32'
-	except:
-		raise
-	return cht
+	rec = None
+	for rec in _records(path):
+		pass
+	if rec == None:
+		raise ValueError('No chart found in %s.' % path)
+	return _set(Chart(set_default=False, do_calc=False), *rec)
+
+
+def iterload(path):
+	"""Generate charts of an astrolog32 file (no positions calculated).
+	
+	:type path: str
+	:rtype: generator of ChartFile
+	"""
+	path = os.path.abspath(os.path.expanduser(path))
+	for rec in _records(path):
+		yield _set(ChartFile(set_default=False), *rec)
 
 
 # End.
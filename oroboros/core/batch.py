@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Batch calculations of many charts, with a pool of processes.
+
+Swisseph settings are global, so charts can not be calculated in
+threads. Here each worker process has its own database connection and
+swisseph state, and charts are sent to workers by chunks.
+
+Charts are given as xml files paths, chart objects, or tuples of chart
+properties (in the order of ChartFile.set() arguments). Results are
+small picklable objects (positions, houses and aspects as tuples), given
+back in input order, or as soon as completed.
+	
+	Calculate some charts.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> chart = Chart(do_calc=False)
+		>>> specs = [chart, (None, 'Test', '2000-01-01 12:00:00')]
+		>>> res = list(calc_charts(specs, workers=0))
+		>>> [x.index for x in res]
+		[0, 1]
+		>>> res[1].name
+		u'Test'
+
+"""
+
+import multiprocessing
+
+from oroboros.core import db
+from oroboros.core import swestate
+from oroboros.core import poscache
+from oroboros.core.chartfile import ChartFile
+from oroboros.core.chartcalc import ChartCalc
+from oroboros.core.filters import Filter
+
+
+__all__ = ['BatchResult', 'calc_charts']
+
+
+#: Filter used in worker process
+_filter = None
+
+
+class BatchResult(object):
+	"""Results of one chart calculations."""
+	
+	__slots__ = ('_index', '_name', '_path', '_julday', '_planets',
+		'_houses', '_aspects', '_properties', '_error')
+	
+	def _get_index(self):
+		"""Get chart index in input.
+		
+		:rtype: int
+		"""
+		return self._index
+	
+	def _get_name(self):
+		"""Get chart name.
+		
+		:rtype: str
+		"""
+		return self._name
+	
+	def _get_path(self):
+		"""Get chart file path.
+		
+		:rtype: str or None
+		"""
+		return self._path
+	
+	def _get_julday(self):
+		"""Get chart Julian day.
+		
+		:rtype: float
+		"""
+		return self._julday
+	
+	def _get_planets(self):
+		"""Get planets, as (name, longitude, latitude, distance, lonspeed,
+		latspeed, distspeed) tuples.
+		
+		:rtype: tuple
+		"""
+		return self._planets
+	
+	def _get_houses(self):
+		"""Get houses cusps and ascmc, as (name, longitude) tuples.
+		
+		:rtype: tuple
+		"""
+		return self._houses
+	
+	def _get_aspects(self):
+		"""Get aspects, as (name 1, name 2, aspect name, diff, apply,
+		factor) tuples.
+		
+		:rtype: tuple
+		"""
+		return self._aspects
+	
+	def _get_properties(self):
+		"""Get chart properties, in the order of ChartFile.set() arguments.
+		
+		:rtype: tuple
+		"""
+		return self._properties
+	
+	def _get_error(self):
+		"""Get error message, if calculations failed.
+		
+		:rtype: str or None
+		"""
+		return self._error
+	
+	index = property(_get_index,
+		doc='Chart index in input.')
+	name = property(_get_name,
+		doc='Chart name.')
+	path = property(_get_path,
+		doc='Chart file path.')
+	julday = property(_get_julday,
+		doc='Chart Julian day.')
+	planets = property(_get_planets,
+		doc='Planets positions.')
+	houses = property(_get_houses,
+		doc='Houses positions.')
+	aspects = property(_get_aspects,
+		doc='Aspects.')
+	properties = property(_get_properties,
+		doc='Chart properties.')
+	error = property(_get_error,
+		doc='Error message (None if successful).')
+	
+	def __init__(self, index, name=None, path=None, julday=None, planets=(),
+		houses=(), aspects=(), properties=(), error=None):
+		"""Init results.
+		
+		:type index: int
+		:type name: str
+		:type path: str
+		:type julday: float
+		:type planets: tuple
+		:type houses: tuple
+		:type aspects: tuple
+		:type properties: tuple
+		:type error: str
+		"""
+		self._index = index
+		self._name = name
+		self._path = path
+		self._julday = julday
+		self._planets = planets
+		self._houses = houses
+		self._aspects = aspects
+		self._properties = properties
+		self._error = error
+	
+	def __getstate__(self):
+		return tuple(getattr(self, x) for x in self.__slots__)
+	
+	def __setstate__(self, state):
+		for k, v in zip(self.__slots__, state):
+			setattr(self, k, v)
+	
+	def __repr__(self):
+		if self._error != None:
+			return 'BatchResult(%s, error=%s)' % (self._index,
+				repr(self._error))
+		return 'BatchResult(%s, %s, %s)' % (self._index, repr(self._name),
+			self._julday)
+
+
+def _spec(chart):
+	"""Return picklable properties of a chart object.
+	
+	:type chart: ChartFile
+	:rtype: tuple
+	"""
+	return (chart._path, chart._name, chart._datetime, chart._calendar,
+		chart._location, str(chart._latitude), str(chart._longitude),
+		int(chart._altitude), chart._country, chart._zoneinfo,
+		chart._timezone.utc if chart._timezone != None else None,
+		chart._comment, str(chart._keywords), chart._dst, chart._utcoffset)
+
+
+def _init_worker(dsn, filt):
+	"""Prepare a worker process.
+	
+	:type dsn: str or None
+	:type filt: str or int or None
+	"""
+	if dsn != None:
+		db.connect(dsn)
+	else:
+		db.connect()
+	swestate.invalidate()
+	poscache.clear()
+	_load_filter(filt)
+
+
+def _load_filter(filt):
+	"""Load filter used by calculations.
+	
+	:type filt: str or int or None
+	"""
+	global _filter
+	_filter = Filter(filt)
+
+
+def _calc(item):
+	"""Calculate one chart, return results.
+	
+	:type item: tuple
+	:rtype: BatchResult
+	"""
+	index, spec = item
+	try:
+		if isinstance(spec, basestring): ## not py3
+			chart = ChartCalc(spec, do_calc=False)
+		else:
+			chart = ChartCalc(set_default=False, do_calc=False)
+			chart.set(None, *spec[1:])
+			chart._path = spec[0]
+		chart.filter = _filter
+		chart.calc()
+		planets = tuple((x._planet._name, x._longitude, x._latitude,
+			x._distance, x._lonspeed, x._latspeed, x._distspeed)
+			for x in chart._planets)
+		houses = tuple((x._planet._name, x._longitude)
+			for x in chart._houses)
+		aspects = tuple((x._data1._planet._name, x._data2._planet._name,
+			x._aspect._name, x._diff, x._apply, x._factor)
+			for x in chart._aspects)
+		return BatchResult(index, chart._name, chart._path, chart.julday,
+			planets, houses, aspects, _spec(chart))
+	except Exception, err:
+		return BatchResult(index, error='%s: %s' % (err.__class__.__name__,
+			err))
+
+
+def _items(specs):
+	"""Generate (index, picklable spec) tuples.
+	
+	:type specs: iterable
+	:rtype: generator
+	"""
+	for i, spec in enumerate(specs):
+		if isinstance(spec, ChartFile):
+			spec = _spec(spec)
+		elif not isinstance(spec, basestring): ## not py3
+			spec = tuple(spec)
+		yield i, spec
+
+
+def _results(results, pool, errors):
+	"""Generate results, handle errors, stop the pool when done.
+	
+	:type results: iterator
+	:type pool: multiprocessing.Pool or None
+	:type errors: str
+	:rtype: generator of BatchResult
+	"""
+	try:
+		yield None # started, closing the generator stops the pool
+		for res in results:
+			if res._error != None:
+				if errors == 'raise':
+					raise RuntimeError('Chart %s failed (%s).' % (
+						res._index, res._error))
+				elif errors == 'skip':
+					continue
+			yield res
+	finally:
+		if pool != None:
+			pool.terminate()
+			pool.join()
+
+
+def calc_charts(specs, filt=None, workers=None, chunksize=16, ordered=True,
+	errors='raise', dsn=None):
+	"""Calculate charts, generate results.
+	
+	Charts are calculated with the filter given by name or index, default
+	is the default filter. Workers is the number of processes, default is
+	the number of processors, 0 calculates in the current process.
+	
+	Errors can be 'raise' (stop at the first failure), 'skip' (ignore
+	failures) or 'return' (give results with an error message).
+	
+	Processes are started when called, not when results are read: do not
+	call within a database transaction (workers connect again to the
+	database, that would drop the transaction).
+	
+	:type specs: iterable of str, ChartFile or tuple
+	:type filt: str or int
+	:type workers: int
+	:type chunksize: int
+	:type ordered: bool
+	:type errors: str
+	:type dsn: str
+	:rtype: generator of BatchResult
+	:raise ValueError: invalid errors option
+	:raise RuntimeError: calculations failed (errors is 'raise')
+	"""
+	if errors not in ('raise', 'skip', 'return'):
+		raise ValueError('Invalid errors option %s.' % errors)
+	if workers == 0:
+		_load_filter(filt)
+		results = (_calc(x) for x in _items(specs))
+		pool = None
+	else:
+		pool = multiprocessing.Pool(workers, _init_worker, (dsn, filt))
+		if ordered:
+			results = pool.imap(_calc, _items(specs), chunksize)
+		else:
+			results = pool.imap_unordered(_calc, _items(specs), chunksize)
+	ret = _results(results, pool, errors)
+	ret.next()
+	return ret
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -4,15 +4,19 @@
 """
 Charts with two subcharts.
 
+Comparison results are calculated when first needed. The bi-chart
+subscribes to its charts, and only drops the results depending on what
+changed in a chart.
+
 """
 
 from decimal import Decimal
 
-import swisseph as swe
-
+from oroboros.core import aspectsengine
+from oroboros.core import poscache
 from oroboros.core.charts import Chart
-from oroboros.core.planets import all_planets
-from oroboros.core.aspects import all_aspects
+from oroboros.core.planets import planets_registry
+from oroboros.core.aspects import aspects_registry
 from oroboros.core.results import PlanetDataList
 from oroboros.core.aspectsresults import AspectDataList, MidPointAspectDataList, InterMidPointAspectDataList
 
@@ -24,7 +28,7 @@ class BiChart(list):
 	"""Chart object with comparisons functions for two subcharts."""
 	
 	__slots__ = ('_interaspects', '_intermidp1', '_intermidp2',
-		'_intermidpoints', '_switched')
+		'_intermidpoints', '_switched', '_orbs', '__weakref__')
 	
 	def _get_interaspects(self):
 		"""Get inter-aspects.
@@ -88,17 +92,35 @@ class BiChart(list):
 		doc='Bichart switched state (bool).')
 	
 	def __init__(self, cht1=None, cht2=None):
-		"""Init bi-chart.
+		"""Init bi-chart (results are calculated when needed).
 		
 		:type cht1: Chart, str, int or None
 		:type cht2: Chart, str, int or None
 		"""
 		self._switched = False
+		self._orbs = None
+		self.reset_calc()
 		if cht1 != None:
 			self.append(cht1)
 		if cht2 != None:
 			self.append(cht2)
-		self.calc()
+	
+	def _attach(self, cht):
+		"""Subscribe to a new chart, drop all results.
+		
+		:type cht: Chart
+		"""
+		cht.subscribe(self)
+		self.reset_calc()
+	
+	def _detach(self, cht):
+		"""Unsubscribe from a removed chart, drop all results.
+		
+		:type cht: Chart
+		"""
+		if not any(x is cht for x in self):
+			cht.unsubscribe(self)
+		self.reset_calc()
 	
 	def append(self, cht):
 		"""Append a chart.
@@ -113,7 +135,7 @@ class BiChart(list):
 				raise
 				raise TypeError('Invalic chart %s.' % cht)
 		list.append(self, cht)
-		self.calc()
+		self._attach(cht)
 	
 	def insert(self, idx, cht):
 		"""Insert a chart.
@@ -131,7 +153,7 @@ class BiChart(list):
 			except:
 				raise TypeError('Invalic chart %s.' % cht)
 		list.insert(self, idx, cht)
-		self.calc()
+		self._attach(cht)
 	
 	def __setitem__(self, idx, cht):
 		if idx > 1 or idx < -2:
@@ -141,20 +163,23 @@ class BiChart(list):
 				cht = Chart(cht)
 			except:
 				raise TypeError('Invalic chart %s.' % cht)
+		old = self[idx]
 		list.__setitem__(self, idx, cht)
-		self.calc()
+		self._detach(old)
+		self._attach(cht)
 	
 	def __delitem__(self, idx):
 		self._switched = False
+		old = self[idx]
 		list.__delitem__(self, idx)
+		self._detach(old)
 	
 	def set(self, idx, **kwargs):
-		"""Set charts properties."""
+		"""Set charts properties.
+		
+		Results are dropped by the chart notifications.
+		"""
 		self[idx].set(**kwargs)
-		if any((x for x in kwargs if x in ('datetime', 'calendar', 'location',
-			'latitude', 'longitude', 'altitude', 'zoneinfo', 'timezone', 'dst',
-			'utcoffset', 'filter'))):
-			self.reset_calc()
 	
 	def reset_calc(self):
 		"""Trigger recalculation of aspects."""
@@ -163,106 +188,139 @@ class BiChart(list):
 		self._intermidp2 = None
 		self._intermidpoints = None
 	
+	def chart_changed(self, chart, names):
+		"""Drop results depending on a chart changes.
+		
+		Called by charts (see ChartCalc.subscribe).
+		
+		:type chart: Chart
+		:type names: tuple of str
+		"""
+		for idx, cht in enumerate(self):
+			if cht is not chart:
+				continue
+			if 'filter' in names:
+				self.reset_calc()
+				return
+			if 'planets' in names:
+				self._interaspects = None
+				self._set_intermidp(1 - idx, None)
+			if 'midpoints' in names:
+				self._set_intermidp(idx, None)
+				self._intermidpoints = None
+	
 	# calculations
 	
+	def _interaspects_orbs(self):
+		"""Get aspects, angles, and orbs matrix for inter-aspects.
+		
+		Aspects are the ones used by both filters, with mean orbs. The orbs
+		matrix has chart 1 planets as rows, chart 2 planets as columns, and
+		None for planets not aspected in one of the filters.
+		
+		The matrix is kept until filters or planets change, and transposed
+		when charts are switched.
+		
+		:rtype: tuple
+		"""
+		plan1 = self[0]._filter.compile()
+		plan2 = self[1]._filter.compile()
+		names1 = tuple(x._planet._name for x in self[0].planets)
+		names2 = tuple(x._planet._name for x in self[1].planets)
+		cache = self._orbs
+		if cache != None:
+			p1, p2, n1, n2, asps, angles, orbs = cache
+			if p1 is plan1 and p2 is plan2 and n1 == names1 and n2 == names2:
+				return asps, angles, orbs
+			if p1 is plan2 and p2 is plan1 and n1 == names2 and n2 == names1:
+				orbs = [list(x) for x in zip(*orbs)]
+				self._orbs = (plan1, plan2, names1, names2, asps, angles, orbs)
+				return asps, angles, orbs
+		all_asp = aspects_registry()
+		# aspects used by both filters, with mean orbs
+		asps = list()
+		orbs = list()
+		for asp, orb in zip(plan1.aspects, plan1.orbs):
+			if asp in plan2.aspects:
+				asps.append(all_asp[asp])
+				orbs.append((orb + plan2.orbs[plan2.aspects.index(asp)])
+					/ Decimal('2'))
+		angles = [float(x._angle) for x in asps]
+		# orb modifiers, or None if not aspected (in any of the filters)
+		mods1 = [plan1.orbmod(x)
+			if plan1.is_aspected(x) and plan2.is_aspected(x) else None
+			for x in names1]
+		mods2 = [plan2.orbmod(x)
+			if plan1.is_aspected(x) and plan2.is_aspected(x) else None
+			for x in names2]
+		orbs = aspectsengine.orbs_matrix(orbs, mods1, mods2)
+		self._orbs = (plan1, plan2, names1, names2, asps, angles, orbs)
+		return asps, angles, orbs
+	
 	def _calc_interaspects(self):
 		"""Calculate inter-aspects of planets between charts 1 and 2."""
 		res = AspectDataList()
 		if len(self) != 2:
 			self._interaspects = res
 			return
-		f1 = self[0]._filter
-		f2 = self[1]._filter
-		all_asp = all_aspects()
-		for pos1 in self[0]._planets:
-			p1, lon1, lonsp1 = pos1._planet, pos1._longitude, pos1._lonspeed
-			for pos2 in self[1]._planets:
-				p2, lon2, lonsp2 = pos2._planet, pos2._longitude, pos2._lonspeed
-				for asp, doasp in f1._aspects.items():
-					if not doasp:
-						continue
-					if not f2._aspects[asp]:
-						continue
-					if not f1._asprestr[p1._name] or not f2._asprestr[p1._name]:
-						continue
-					if not f2._asprestr[p2._name] or not f2._asprestr[p2._name]:
-						continue
-					asp = all_asp[asp]
-					orb = (f1._orbs[asp._name]+f2._orbs[asp._name])/Decimal('2')
-					orbmod1 = f1.orbrestr[p1._name].get_absolute(orb)
-					orbmod2 = f2.orbrestr[p2._name].get_absolute(orb)
-					orb += (orbmod1 + orbmod2) / Decimal('2')
-					if orb < 0:
-						continue
-					diff, apply, factor = swe._match_aspect2(
-						lon1, lonsp1, lon2, lonsp2,
-						float(asp._angle), float(orb))
-					if diff != None:
-						res.feed(pos1, pos2, asp, diff, apply, factor)
+		asps, angles, orbs = self._interaspects_orbs()
+		pl1 = self[0].planets
+		pl2 = self[1].planets
+		found = aspectsengine.match(
+			pl1.column('longitude'), pl1.column('lonspeed'),
+			pl2.column('longitude'), pl2.column('lonspeed'),
+			angles, orbs, aspectsengine.rectangle(len(pl1), len(pl2)))
+		for i, j, k, diff, apply, factor in found:
+			res.feed(pl1[i], pl2[j], asps[k], diff, apply, factor)
 		self._interaspects = res
 	
+	def _set_intermidp(self, idx, res):
+		"""Set aspects to chart 1 or chart 2 midpoints.
+		
+		:type idx: int
+		:type res: MidPointAspectDataList or None
+		"""
+		if idx in (0, -2):
+			self._intermidp1 = res
+		else:
+			self._intermidp2 = res
+	
 	def _calc_intermidp(self, idx):
 		"""Calculate aspects between one midpoints and other planets."""
 		res = MidPointAspectDataList()
-		try:
-			if len(self) != 2 or not self[idx]._filter._calc_midp:
-				if idx == 0:
-					self._intermidp1 = res
-				else:
-					self._intermidp2 = res
-				return
-		except IndexError:
-			if idx == 0:
-				self._intermidp1 = res
-			else:
-				self._intermidp2 = res
+		if len(self) != 2 or not self[idx]._filter._calc_midp:
+			self._set_intermidp(idx, res)
 			return
 		# ok do calc
 		oth = 1 if idx in (0, -2) else 0 # other's idx
-		midpres = self[idx]._midpoints
+		midpres = self[idx].midpoints
 		jd = self[oth].julday
-		flag = self[oth]._filter.get_calcflag()
+		flag = self[oth]._filter.compile().calcflag
 		self[oth]._setup_swisseph()
-		f = self[idx]._filter._midpoints
-		all_pl = all_planets()
-		all_asp = all_aspects()
+		mplan = self[idx]._filter.compile().midpoints
+		all_pl = planets_registry()
+		all_asp = aspects_registry()
+		asps = [all_asp[x] for x in mplan.aspects]
+		angles = mplan.angles
 		# get all concerned planets, if not already calculated
 		plres = PlanetDataList()
-		for pl in [x for x in f._planets if f._planets[x] and f._asprestr[x]]:
+		for pl in mplan.targets:
 			try:
-				plres.append(self[oth]._planets.get_data(pl))
+				plres.append(self[oth].planets.get_data(pl))
 			except KeyError:
 				p = all_pl[pl]
-				plres.feed(p, p.calc_ut(jd, flag, self[oth]))
+				plres.feed(p, poscache.calc_ut(p, jd, flag, self[oth]))
 		# get midp aspects
 		plres.sort_by_ranking()
-		for i, midp in enumerate(midpres):
-			##p1, p2 = midp._planet, midp._planet2
-			lon1, lonsp1 = midp._longitude, midp._lonspeed
-			for pos in plres:
-				pl, lon2, lonsp2 = pos._planet, pos._longitude, pos._lonspeed
-				for asp, doasp in f._aspects.items():
-					if not doasp: # dont use this aspect
-						continue
-					asp = all_asp[asp]
-					# modify orb
-					orb = f._orbs[asp._name]
-					#orbmod1 = plorbfilt[p1._name].get_absolute(orb)
-					orbmod1 = 0 # todo?: midp obrestr
-					orbmod2 = f._orbrestr[pl._name].get_absolute(orb)
-					orb += (orbmod1 + orbmod2) / Decimal('2')
-					if orb < 0: # we'll never get such a precision
-						continue
-					# check aspect match
-					diff, apply, factor = swe._match_aspect2(
-						lon1, lonsp1, lon2, lonsp2,
-						float(asp._angle), float(orb))
-					if diff != None:
-						res.feed(midp, pos, asp, diff, apply, factor)
-		if idx == 0:
-			self._intermidp1 = res
-		else:
-			self._intermidp2 = res
+		# orbs (midpoints have no orb modifier)
+		orbs = [mplan.orbs_for(x._planet._name) for x in plres]
+		found = aspectsengine.match_points(
+			[x._longitude for x in midpres], [x._lonspeed for x in midpres],
+			[x._longitude for x in plres], [x._lonspeed for x in plres],
+			angles, orbs)
+		for i, j, k, diff, apply, factor in found:
+			res.feed(midpres[i], plres[j], asps[k], diff, apply, factor)
+		self._set_intermidp(idx, res)
 	
 	def _calc_intermidpoints(self):
 		"""Calculate aspects between midpoints."""
@@ -273,56 +331,55 @@ class BiChart(list):
 		elif not self[0]._filter._calc_midp or not self[1]._filter._calc_midp:
 			self._intermidpoints = res
 			return
-		f1 = self[0]._filter._midpoints
-		f2 = self[1]._filter._midpoints
-		all_asp = all_aspects()
+		mplan1 = self[0]._filter.compile().midpoints
+		mplan2 = self[1]._filter.compile().midpoints
+		all_asp = aspects_registry()
+		# aspects used by both filters (no asp restr, nor orb restr)
+		asps = list()
+		for asp, orb1 in zip(mplan1.aspects, mplan1.orbs):
+			if asp in mplan2.aspects:
+				orb2 = mplan2.orbs[mplan2.aspects.index(asp)]
+				asps.append((all_asp[asp], float(all_asp[asp]._angle),
+					float(orb1 + orb2 / Decimal('2'))))
 		# begin calc
-		for i, pos1 in enumerate(self[0]._midpoints):
-			p1, lon1, lonsp1 = pos1._data2, pos1._longitude, pos1._lonspeed
-			for pos2 in self[1]._midpoints:
-				p2, lon2, lonsp2 = pos2._data2, pos2._longitude, pos2._lonspeed
-				for asp, doasp in f1._aspects.items():
-					if not doasp: # dont use this aspect
-						continue
-					if not f2._aspects[asp]:
-						continue
-					# no asp restr
-					asp = all_asp[asp]
-					# modify orb
-					orb1 = f1._orbs[asp._name]
-					orb2 = f2._orbs[asp._name]
-					orb = orb1 + orb2 / Decimal('2')
-					# nor orb restr
-					# check aspect match
-					diff, apply, factor = swe._match_aspect2(
-						lon1, lonsp1, lon2, lonsp2,
-						float(asp._angle), float(orb))
-					if diff != None:
-						res.feed(pos1, pos2, asp, diff, apply, factor)
+		midp1 = self[0].midpoints
+		midp2 = self[1].midpoints
+		row = tuple(orb for asp, angle, orb in asps)
+		found = aspectsengine.match_points(
+			[x._longitude for x in midp1], [x._lonspeed for x in midp1],
+			[x._longitude for x in midp2], [x._lonspeed for x in midp2],
+			[angle for asp, angle, orb in asps], [row] * len(midp2))
+		for i, j, k, diff, apply, factor in found:
+			res.feed(midp1[i], midp2[j], asps[k][0], diff, apply, factor)
 		self._intermidpoints = res
 	
 	def calc(self):
-		"""Do all calculations."""
-		self._calc_interaspects()
-		self._calc_intermidp(0)
-		self._calc_intermidp(1)
-		self._calc_intermidpoints()
+		"""Do all calculations not done yet.
+		
+		Results are otherwise calculated when first needed.
+		"""
+		self._get_interaspects()
+		self._get_intermidp1()
+		self._get_intermidp2()
+		self._get_intermidpoints()
 	
 	def _all_draw_aspects(self):
 		"""Return a list of all drawable aspects (incl. activated midpoints).
 		
+		Each part is sorted by ranking, for cheap sorting of the whole.
+		
 		:rtype: AspectDataList
 		"""
 		ret = AspectDataList()
-		ret.extend(self._interaspects)
+		ret.extend(self.interaspects.ranked())
 		try:
 			if self[0]._filter._draw_midp:
-				ret.extend(self._intermidp1)
+				ret.extend(self.intermidp1.ranked())
 		except IndexError: # none chart
 			pass
 		try:
 			if self[1]._filter._draw_midp:
-				ret.extend(self._intermidp2)
+				ret.extend(self.intermidp2.ranked())
 		except IndexError: # none chart
 			pass
 #		try:
@@ -340,24 +397,29 @@ class BiChart(list):
 		"""
 		ret = PlanetDataList()
 		if idx == 0:
-			ret.extend(self[0]._planets)
-			ret.extend(self._intermidp1.get_midpoints())
+			ret.extend(self[0].planets)
+			ret.extend(self.intermidp1.get_midpoints())
 		else:
-			ret.extend(self[1]._planets)
-			ret.extend(self._intermidp2.get_midpoints())
+			ret.extend(self[1].planets)
+			ret.extend(self.intermidp2.get_midpoints())
 		return ret
 	
 	def switch(self):
-		"""Switch chart 1 and 2."""
+		"""Switch chart 1 and 2.
+		
+		Inter-aspects orbs are symmetric, the orbs matrix is transposed.
+		Aspects to midpoints of each chart are kept.
+		"""
 		self.reverse()
 		self._switched = not self._switched
-		self.calc()
+		self._interaspects = None
+		self._intermidpoints = None
+		self._intermidp1, self._intermidp2 = self._intermidp2, self._intermidp1
 	
 	def synastry_mode(self):
 		"""Set comparison mode transit/synastry."""
 		for i, cht in enumerate(self):
 			self[i].calc()
-		self.calc()
 	
 	def progression_of(self, idx=0):
 		"""Set comparison mode progression.
@@ -374,7 +436,6 @@ class BiChart(list):
 			cht1 = 1
 			cht2 = 0
 		self[cht2].progression_of(self[cht1].julday)
-		self.calc()
 	
 	def direction_of(self, idx=0):
 		"""Set comparison mode direction.
@@ -391,7 +452,6 @@ class BiChart(list):
 			cht1 = 1
 			cht2 = 0
 		self[cht2].direction_of(self[cht1].julday)
-		self.calc()
 	
 	def multiply_pos(self, value, idx):
 		"""Multiply positions by value.
@@ -400,7 +460,6 @@ class BiChart(list):
 		:type idx: int
 		"""
 		self[idx].multiply_pos(value)
-		self.calc()
 	
 	def add_pos(self, value, idx):
 		"""Add value to positions.
@@ -409,7 +468,6 @@ class BiChart(list):
 		:type idx: int
 		"""
 		self[idx].add_pos(value)
-		self.calc()
 	
 	def profection_of(self, op, value, unit, idx=0):
 		"""Profection.
@@ -429,7 +487,6 @@ class BiChart(list):
 			cht1 = 1
 			cht2 = 0
 		self[cht2].profection_of(op, value, unit, self[cht1].julday)
-		self.calc()
 	
 	def __repr__(self):
 		return "BiChart(%s)" % ', '.join([repr(x) for x in self])
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bulk import of charts archives.
+
+Astrolog32 (.dat) and Skylendar (.skif) files, or whole directories of
+them, are read incrementally and give chart objects (no positions
+calculated), so archives of any size can be migrated. Charts can then
+be written in Oroboros xml files by a pool of processes, and catalogued
+in the charts index (see chartsindex module).
+	
+	Read an archive.
+		
+		>>> import tempfile, shutil
+		>>> src = tempfile.mkdtemp()
+		>>> f = open(os.path.join(src, 'test.dat'), 'w')
+		>>> f.write('''/qb 7 14 1972 10:30:00 ST -1:00 6:38'00E 46:31'00N
+		... /zi "Alice" "Lausanne"
+		... /qb 2 3 1981 22:05:00 ST -1:00 2:20'00E 48:52'00N
+		... /zi "Bob" "Paris"
+		... /qb 3 14 1881 6:00:00 ST -0:10 2:20'00E 48:52'00N
+		... /zi "Carol" "Paris"
+		... ''')
+		>>> f.close()
+		>>> [str(x.name) for x in iterload(src)]
+		['Alice', 'Bob', 'Carol']
+	
+	Write charts in xml files, and index them.
+		
+		>>> dest = tempfile.mkdtemp()
+		>>> res = import_charts(src, dest, index=True)
+		>>> res
+		(3, 3, 0, 0)
+		>>> sorted(os.listdir(dest))
+		['Alice.xml', 'Bob.xml', 'Carol.xml']
+		>>> shutil.rmtree(src)
+		>>> shutil.rmtree(dest)
+		>>> chartsindex.update(dest)
+		(0, 0, 3, 0)
+
+"""
+
+import itertools
+import multiprocessing
+import os
+import os.path
+import re
+from collections import deque
+
+from oroboros.core import cfg
+from oroboros.core import astrolog32
+from oroboros.core import skylendar
+from oroboros.core import batch
+from oroboros.core import chartsindex
+from oroboros.core.chartfile import ChartFile
+
+
+__all__ = ['iterload', 'write_charts', 'import_charts']
+
+
+#: Archives loaders, by file extension
+_loaders = {
+	'.dat': astrolog32.iterload,
+	'.skif': skylendar.iterload
+	}
+
+
+def _files(path, recursive):
+	"""Return archives files in a directory.
+	
+	:type path: str
+	:type recursive: bool
+	:rtype: list
+	"""
+	ret = list()
+	for root, dirs, files in os.walk(path):
+		dirs.sort()
+		for f in sorted(files):
+			if os.path.splitext(f)[1].lower() in _loaders:
+				ret.append(os.path.join(root, f))
+		if not recursive:
+			break
+	return ret
+
+
+def iterload(path, recursive=True, errors='raise'):
+	"""Generate charts of an archive file, or of all archives in a directory.
+	
+	Errors can be 'raise' (stop at the first unreadable file) or 'skip'
+	(ignore the rest of unreadable files).
+	
+	:type path: str
+	:type recursive: bool
+	:type errors: str
+	:rtype: generator of ChartFile
+	:raise ValueError: invalid errors option, or unknown file format
+	"""
+	if errors not in ('raise', 'skip'):
+		raise ValueError('Invalid errors option %s.' % errors)
+	path = os.path.abspath(os.path.expanduser(path))
+	if os.path.isdir(path):
+		files = _files(path, recursive)
+	else:
+		files = [path]
+	for f in files:
+		try:
+			load = _loaders[os.path.splitext(f)[1].lower()]
+		except KeyError:
+			raise ValueError('Unknown archive format %s.' % f)
+		try:
+			for cht in load(f):
+				yield cht
+		except Exception:
+			if errors == 'raise':
+				raise
+
+
+_invalid_chars = re.compile(r'[^\w\-]+', re.UNICODE)
+
+
+def _filename(name, used):
+	"""Return a new xml file name for a chart name.
+	
+	:type name: str
+	:type used: set
+	:rtype: str
+	"""
+	base = _invalid_chars.sub('_', name).strip('_')[:64] or 'chart'
+	fname = base + '.xml'
+	i = 1
+	while fname.lower() in used:
+		i += 1
+		fname = '%s-%d.xml' % (base, i)
+	used.add(fname.lower())
+	return fname
+
+
+def _write(spec):
+	"""Write a chart in xml file. Return error message, or None.
+	
+	:type spec: tuple
+	:rtype: str or None
+	"""
+	try:
+		cht = ChartFile(set_default=False)
+		cht.set(*spec)
+		cht.write()
+	except Exception, err:
+		return '%s: %s' % (err.__class__.__name__, err)
+
+
+def write_charts(charts, dest=None, workers=0, chunksize=64):
+	"""Write charts in xml files of a directory, generate written charts.
+	
+	Files are named after charts names, existing files are never
+	overwritten, and charts paths are set. Default directory is the
+	charts directory. Workers is the number of processes, None for the
+	number of processors, 0 writes in the current process.
+	
+	:type charts: iterable of ChartFile
+	:type dest: str
+	:type workers: int
+	:type chunksize: int
+	:rtype: generator of ChartFile
+	:raise RuntimeError: chart not written
+	"""
+	if dest == None:
+		dest = cfg.charts_dir
+	dest = os.path.abspath(os.path.expanduser(dest))
+	if not os.path.isdir(dest):
+		os.makedirs(dest)
+	used = set(x.lower() for x in os.listdir(dest))
+	pending = deque()
+	def specs():
+		for cht in charts:
+			cht.path = os.path.join(dest, _filename(cht._name, used))
+			pending.append(cht)
+			yield batch._spec(cht)
+	if workers == 0:
+		results = itertools.imap(_write, specs())
+		pool = None
+	else:
+		pool = multiprocessing.Pool(workers)
+		results = pool.imap(_write, specs(), chunksize)
+	try:
+		for err in results:
+			cht = pending.popleft()
+			if err != None:
+				raise RuntimeError('Chart %s not written (%s).' % (
+					cht._path, err))
+			yield cht
+	finally:
+		if pool != None:
+			pool.terminate()
+			pool.join()
+
+
+def import_charts(path, dest=None, recursive=True, index=False, filt=None,
+	workers=0, errors='raise', blocksize=1000):
+	"""Import archives in Oroboros xml files, and optionally index them.
+	
+	Charts are indexed by blocks, as soon as written, and calculated with
+	the filter given (default is the default filter).
+	
+	Return numbers of charts written, and of charts added, updated and
+	failed in index.
+	
+	:see: iterload(), write_charts(), chartsindex.add()
+	
+	:type path: str
+	:type dest: str
+	:type recursive: bool
+	:type index: bool
+	:type filt: str or int
+	:type workers: int
+	:type errors: str
+	:type blocksize: int
+	:rtype: tuple
+	"""
+	written = added = updated = failed = 0
+	charts = write_charts(iterload(path, recursive, errors), dest, workers)
+	while True:
+		block = list(itertools.islice(charts, blocksize))
+		if not block:
+			break
+		written += len(block)
+		if index:
+			res = chartsindex.add(block, filt, workers)
+			added += res[0]
+			updated += res[1]
+			failed += res[2]
+	return written, added, updated, failed
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -6,68 +6,105 @@ Chart calculations.
 
 """
 
+import weakref
 from decimal import Decimal
 
 import swisseph as swe
 
 from oroboros.core import cfg
-from oroboros.core import db
+from oroboros.core import aspectsengine
+from oroboros.core import swestate
+from oroboros.core import poscache
+from oroboros.core import directions
 from oroboros.core.chartdate import ChartDate
 from oroboros.core.filters import Filter
-from oroboros.core.planets import all_planets
-from oroboros.core.aspects import all_aspects
+from oroboros.core.planets import planets_registry
+from oroboros.core.aspects import aspects_registry
 from oroboros.core.results import HousesDataList, PlanetDataList, MidPointDataList
 from oroboros.core.aspectsresults import AspectDataList, MidPointAspectDataList
 
 
-__all__ = ['ChartCalc']
+__all__ = ['ChartCalc', 'legacy_aspects', 'debug_trace']
+
+
+#: Calculate aspects with the one-by-one comparisons loop (cross-checking).
+#: :type legacy_aspects: bool
+legacy_aspects = False
+
+#: Recalculation trace. Set it to a list to record what is invalidated
+#: and recalculated, as ('reset'|'calc', result name) tuples.
+#: :type debug_trace: list or None
+debug_trace = None
+
+#: Results, in calculation order (and notifications names, see
+#: ChartCalc.subscribe)
+_results = ('ecl_nut', 'houses', 'planets', 'aspects', 'midpoints',
+    'midp_aspects')
+
+#: Results depending on each result (houses -> planets only for cusps and
+#: parts, see ChartCalc._invalidate)
+_dependents = {
+    'ecl_nut': (),
+    'houses': ('planets',),
+    'planets': ('aspects', 'midpoints', 'midp_aspects'),
+    'aspects': (),
+    'midpoints': ('midp_aspects',),
+    'midp_aspects': ()
+    }
+
+#: Results depending on chart data (topocentric planets depend on
+#: position too, see ChartCalc._changed)
+_inputs = {
+    'julday': ('ecl_nut', 'houses', 'planets'),
+    'position': ('houses',),
+    'altitude': ()
+    }
 
 
 class ChartCalc(ChartDate):
     """Chart with planets, houses, midpoints, aspects calculation methods."""
 
     __slots__ = ChartDate.__slots__ + ['_ecl_nut', '_planets', '_houses',
-        '_aspects', '_midpoints', '_midp_aspects', '_filter']
+        '_aspects', '_midpoints', '_midp_aspects', '_filter', '_plan',
+        '_stale', '_observers']
 
     def _set_datetime(self, dt):
         ChartDate._set_datetime(self, dt)
-        self.reset_positions()
+        self._changed('julday')
 
     def _set_calendar(self, cal):
         ChartDate._set_calendar(self, cal)
-        self.reset_positions()
+        self._changed('julday')
 
     def _set_location(self, location):
         ChartDate._set_location(self, location)
-        self.reset_positions()
 
     def _set_latitude(self, lat):
         ChartDate._set_latitude(self, lat)
-        self.reset_positions()
+        self._changed('position')
 
     def _set_longitude(self, lon):
         ChartDate._set_longitude(self, lon)
-        self.reset_positions()
+        self._changed('position')
 
     def _set_altitude(self, alt):
         ChartDate._set_altitude(self, alt)
-        self.reset_positions()
+        self._changed('altitude')
 
     def _set_zoneinfo(self, tz):
         ChartDate._set_zoneinfo(self, tz)
-        self.reset_positions()
+        self._changed('julday')
 
     def _set_timezone(self, tz):
         ChartDate._set_timezone(self, tz)
-        self.reset_positions()
 
     def _set_dst(self, dst):
         ChartDate._set_dst(self, dst)
-        self.reset_positions()
+        self._changed('julday')
 
     def _set_utcoffset(self, utcoffset):
         ChartDate._set_utcoffset(self, utcoffset)
-        self.reset_positions()
+        self._changed('julday')
 
     def _get_filter(self):
         """Get chart filter.
@@ -81,13 +118,16 @@ class ChartCalc(ChartDate):
 
         Accepts Filter objects, filter names or index.
 
+        Only results depending on the differences between both filters
+        are recalculated.
+
         :type filt: filters.Filter or str or int
         """
         if not isinstance(filt, Filter):
             self._filter = Filter(filt)
         else:
-            self.filter = filt
-        self.reset_positions()
+            self._filter = filt
+        self._check_filter()
 
     def _get_ecl_nut(self):
         """Get results for obliquity, nutation, etc.
@@ -206,26 +246,154 @@ class ChartCalc(ChartDate):
     def reset_positions(self):
         """Trigger recalculation of positions and aspects results."""
         self._ecl_nut = None
+        self._houses = None
         self._planets = None
         self._aspects = None
         self._midpoints = None
         self._midp_aspects = None
+        self._plan = None
+        self._stale = set()
+        self._notify('filter', *_results)
+
+    def subscribe(self, observer):
+        """Notify an object when results change.
+
+        The observer chart_changed(chart, names) method is called with the
+        names of results dropped or transformed (see _results), and
+        'filter' when the compiled filter changes. Observers are weakly
+        referenced.
+
+        :type observer: object
+        """
+        for ref in self._observers:
+            if ref() is observer:
+                return
+        self._observers.append(weakref.ref(observer))
+
+    def unsubscribe(self, observer):
+        """Stop notifying an object.
+
+        :type observer: object
+        """
+        self._observers = [x for x in self._observers
+            if x() is not None and x() is not observer]
+
+    def _notify(self, *names):
+        """Notify observers of results changes.
+
+        :type names: str
+        """
+        for ref in self._observers[:]:
+            observer = ref()
+            if observer is None:
+                self._observers.remove(ref)
+            else:
+                observer.chart_changed(self, names)
+
+    def _invalidate(self, *names):
+        """Drop results, and the results depending on them.
+
+        :type names: str
+        """
+        todo = list(names)
+        dropped = list()
+        while todo:
+            name = todo.pop(0)
+            if getattr(self, '_' + name) != None:
+                setattr(self, '_' + name, None)
+                dropped.append(name)
+                if debug_trace != None:
+                    debug_trace.append(('reset', name))
+            self._stale.discard(name)
+            for dep in _dependents[name]:
+                if dep == 'planets' and not self._uses_houses():
+                    continue
+                todo.append(dep)
+        if dropped:
+            self._notify(*dropped)
+
+    def _uses_houses(self):
+        """Return True if positions need houses (cusps, parts).
+
+        :rtype: bool
+        """
+        if self._plan == None:
+            return True
+        all_pl = planets_registry()
+        for name in self._plan.bodies:
+            if all_pl[name]._family in (4, 5):
+                return True
+        for name in self._plan.midpoints.bodies: # cusps taken from planets
+            if all_pl[name]._family == 5:
+                return True
+        return False
+
+    def _changed(self, data):
+        """Drop results depending on some chart data.
+
+        :type data: str
+        """
+        names = list(_inputs[data])
+        if (data in ('position', 'altitude') and self._filter != None
+            and self._filter._xcentric == 'topo'):
+            names.append('planets')
+        self._invalidate(*names)
+
+    def _check_filter(self):
+        """Drop results depending on filter modifications.
+
+        The compiled filter is compared with the one used for the current
+        results.
+        """
+        plan = self._filter.compile()
+        old = self._plan
+        if plan is old:
+            return
+        self._plan = plan
+        self._notify('filter')
+        if old == None:
+            self._invalidate(*_results)
+            return
+        names = list()
+        if (old.calcflag != plan.calcflag or old.ephemeris != plan.ephemeris
+            or old.sidereal != plan.sidereal):
+            names.extend(('ecl_nut', 'houses', 'planets'))
+        if old.hsys != plan.hsys:
+            names.append('houses')
+        pl1, asp1 = old.registries
+        pl2, asp2 = plan.registries
+        if pl1 is not pl2 or old.bodies != plan.bodies:
+            names.append('planets')
+        if (asp1 is not asp2 or old.aspects != plan.aspects
+            or old.angles != plan.angles or old.orbs != plan.orbs
+            or old.matrix != plan.matrix):
+            names.append('aspects')
+        mp1, mp2 = old.midpoints, plan.midpoints
+        if mp1.bodies != mp2.bodies:
+            names.append('midpoints')
+        if (asp1 is not asp2 or mp1.targets != mp2.targets
+            or mp1.aspects != mp2.aspects or mp1.angles != mp2.angles
+            or [mp1.orbs_for(x) for x in mp1.targets] !=
+                [mp2.orbs_for(x) for x in mp2.targets]):
+            names.append('midp_aspects')
+        self._invalidate(*names)
+
+    def _stale_positions(self, *names):
+        """Mark results as transformed, recalculated by next calc().
+
+        :type names: str
+        """
+        self._stale.update(names)
 
     def _setup_swisseph(self):
-        """Prepare swisseph for calculations."""
-        f = self._filter
-        # ephemeris type
-        if f._ephe_type == 'swiss':
-            swe.set_ephe_path(f._ephe_path)
-        elif f._ephe_type == 'jpl':
-            swe.set_jpl_file(f._ephe_path)
-        # sidereal mode
-        if f._sid_mode > -1:
-            swe.set_sid_mode(f._sid_mode, f._sid_t0, f._sid_ayan_t0)
-        # situation
-        if f._xcentric == 'topo':
-            swe.set_topo(float(self._longitude), float(self._latitude),
-                self._altitude)
+        """Prepare swisseph for calculations.
+
+        Settings are applied only if they differ from the current ones.
+
+        :see: swestate module
+        """
+        swestate.setup(self._filter, float(self._longitude),
+            float(self._latitude), self._altitude)
 
     def _calc_ecl_nut(self):
         """Calculate obliquity and nutation.
@@ -240,50 +408,70 @@ class ChartCalc(ChartDate):
     def _calc_houses(self):
         """Calculate houses cusps."""
         self._setup_swisseph()
-        cusps, ascmc = swe.houses_ex(self.julday, float(self._latitude),
-            float(self._longitude), self._filter._hsys,
-            self._filter.get_calcflag())
+        cusps, ascmc = poscache.houses_ex(self.julday,
+            float(self._latitude), float(self._longitude),
+            self._filter._hsys, self._filter.compile().calcflag)
         self._houses = HousesDataList(cusps, ascmc, self._filter._hsys)
 
     def _calc_planets(self):
         """Calculate planets positions (but houses).
 
-        Houses must be calculated first (for parts).
+        Houses are calculated first, if needed (for parts).
 
         """
         res = PlanetDataList() # results
-        filt = self._filter._planets
+        houses = self.houses
+        plan = self._filter.compile()
         jd = self.julday
-        flag = self._filter.get_calcflag()
+        flag = plan.calcflag
         self._setup_swisseph()
-        all_pl = all_planets()
+        all_pl = planets_registry()
         # get planets
-        db.close() # fixstars_ut will overflow on sqlite buffers: close db.
-        for k, v in filt.items():
-            if v == False: # not this object
-                continue
+        for k in plan.bodies:
             p = all_pl[k]
             if p._family == 4: # houses, dont calc
                 continue
             else:
-                res.feed(p, p.calc_ut(jd, flag, self))
-        db.connect() # fixstars_ut bug: reopen db
+                res.feed(p, poscache.calc_ut(p, jd, flag, self))
         # add cusps needed
-        for h in self._houses:
-            if filt[h._planet._name]:
-                res.append(self._houses.get_data(h._planet._name))
+        for h in houses:
+            if h._planet._name in plan.bodies:
+                res.append(houses.get_data(h._planet._name))
         self._planets = res
 
     def _calc_aspects(self):
         """Calculate aspects.
 
-        Planets must be calculated first.
+        Planets are calculated first, if needed.
+
+        :see: aspectsengine module, legacy_aspects flag
+
+        """
+        if legacy_aspects:
+            return self._calc_aspects_legacy()
+        res = AspectDataList() # results
+        plan = self._filter.compile()
+        all = self.planets.sort_by_ranking()
+        all_asp = aspects_registry()
+        asps = [all_asp[x] for x in plan.aspects]
+        orbs = plan.orbs_for([x._planet._name for x in all])
+        lons = [x._longitude for x in all]
+        speeds = [x._lonspeed for x in all]
+        for i, j, k, diff, apply, factor in aspectsengine.match(lons, speeds,
+            lons, speeds, plan.angles, orbs, aspectsengine.triangle(len(all))):
+            res.feed(all[i], all[j], asps[k], diff, apply, factor)
+        self._aspects = res
+
+    def _calc_aspects_legacy(self):
+        """Calculate aspects, comparing positions one by one.
+
+        Planets are calculated first, if needed.
 
         """
         res = AspectDataList() # results
         f = self._filter
-        all = self._planets
-        all_asp = all_aspects() #;print 'moo' # TODO: fixed stars bug here!?
+        all = self.planets
+        all_asp = aspects_registry() #;print 'moo' # TODO: fixed stars bug here!?
         # begin calc
         for i, pos1 in enumerate(all.sort_by_ranking()):
             p1, lon1, lonsp1 = pos1._planet, pos1._longitude, pos1._lonspeed
@@ -316,19 +504,19 @@ class ChartCalc(ChartDate):
         :todo: fetch houses results?
         """
         res = MidPointDataList() # results
-        filt = self._filter._midpoints._planets
+        plan = self._filter.compile()
         jd = self.julday
-        flag = self._filter.get_calcflag()
+        flag = plan.calcflag
         self._setup_swisseph()
-        all_pl = all_planets()
+        all_pl = planets_registry()
         # get all concerned planets, if not already calculated
         plres = PlanetDataList()
-        for pl in [x for x in filt if filt[x]]:
+        for pl in plan.midpoints.bodies:
             try:
-                plres.append(self._planets.get_data(pl))
+                plres.append(self.planets.get_data(pl))
             except KeyError:
                 p = all_pl[pl]
-                plres.feed(p, p.calc_ut(jd, flag, self))
+                plres.feed(p, poscache.calc_ut(p, jd, flag, self))
         # get midpoints
         plres.sort_by_ranking()
         for i, pos1 in enumerate(plres[:-1]):
@@ -348,61 +536,54 @@ class ChartCalc(ChartDate):
     def _calc_midp_aspects(self):
         """Calculate midpoints aspects."""
         res = MidPointAspectDataList() # results
-        midpres = self._midpoints
+        midpres = self.midpoints
         jd = self.julday
-        flag = self._filter.get_calcflag()
+        plan = self._filter.compile()
+        flag = plan.calcflag
         self._setup_swisseph()
-        f = self._filter._midpoints
-        all_pl = all_planets()
-        all_asp = all_aspects()
+        mplan = plan.midpoints
+        all_pl = planets_registry()
+        all_asp = aspects_registry()
+        asps = [all_asp[x] for x in mplan.aspects]
+        angles = mplan.angles
         # get all concerned planets, if not already calculated
         plres = PlanetDataList()
-        for pl in [x for x in f._planets if f._planets[x] and f._asprestr[x]]:
+        for pl in mplan.targets:
             try:
-                plres.append(self._planets.get_data(pl))
+                plres.append(self.planets.get_data(pl))
             except KeyError:
                 p = all_pl[pl]
-                plres.feed(p, p.calc_ut(jd, flag, self))
+                plres.feed(p, poscache.calc_ut(p, jd, flag, self))
         # get midp aspects
         plres.sort_by_ranking()
-        for i, midp in enumerate(midpres):
-            ##p1, p2 = midp._planet, midp._planet2
-            lon1, lonsp1 = midp._longitude, midp._lonspeed
-            for pos in plres:
-                pl, lon2, lonsp2 = pos._planet, pos._longitude, pos._lonspeed
-                for asp, doasp in f._aspects.items():
-                    if not doasp: # dont use this aspect
-                        continue
-                    asp = all_asp[asp]
-                    # modify orb
-                    orb = f._orbs[asp._name]
-                    #orbmod1 = plorbfilt[p1._name].get_absolute(orb)
-                    orbmod1 = 0 # todo?: midp obrestr
-                    orbmod2 = f._orbrestr[pl._name].get_absolute(orb)
-                    orb += (orbmod1 + orbmod2) / Decimal('2')
-                    if orb < 0: # we'll never get such a precision
-                        continue
-                    # check aspect match
-                    diff, apply, factor = swe._match_aspect2(
-                        lon1, lonsp1, lon2, lonsp2,
-                        float(asp._angle), float(orb))
-                    if diff != None:
-                        res.feed(midp, pos, asp, diff, apply, factor)
+        # orbs (midpoints have no orb modifier)
+        orbs = [mplan.orbs_for(x._planet._name) for x in plres]
+        found = aspectsengine.match_points(
+            [x._longitude for x in midpres], [x._lonspeed for x in midpres],
+            [x._longitude for x in plres], [x._lonspeed for x in plres],
+            angles, orbs)
+        for i, j, k, diff, apply, factor in found:
+            res.feed(midpres[i], plres[j], asps[k], diff, apply, factor)
         self._midp_aspects = res
 
     def calc(self):
         """Calculate all positions and aspects.
 
         Do midpoints if filter allows it.
+        Only results invalidated since last call are recalculated (see
+        debug_trace).
 
         """
-        self._calc_ecl_nut()
-        self._calc_houses()
-        self._calc_planets()
-        self._calc_aspects()
-        if self._filter._calc_midp:
-            self._calc_midpoints()
-            self._calc_midp_aspects()
+        self._check_filter()
+        self._invalidate(*self._stale)
+        for name in _results:
+            if name in ('midpoints', 'midp_aspects') and not (
+                self._filter._calc_midp):
+                break
+            if getattr(self, '_' + name) == None:
+                if debug_trace != None:
+                    debug_trace.append(('calc', name))
+                getattr(self, '_calc_' + name)()
 
     # transformations
 
@@ -423,11 +604,13 @@ class ChartCalc(ChartDate):
             pos._longitude = swe.degnorm(pos._longitude * value)
             pl.append(pos)
         self._planets = pl
+        self._stale_positions('houses', 'planets') # cusps are shared
         # recalc
         self._calc_aspects()
         if self._filter._calc_midp:
             self._calc_midpoints()
             self._calc_midp_aspects()
+        self._notify('planets', 'aspects', 'midpoints', 'midp_aspects')
 
     def add_pos(self, value):
         """Add degrees to positions.
@@ -446,17 +629,22 @@ class ChartCalc(ChartDate):
             pos._longitude = swe.degnorm(pos._longitude + value)
             pl.append(pos)
         self._planets = pl
+        self._stale_positions('houses', 'planets') # cusps are shared
         # recalc
         self._calc_aspects()
         if self._filter._calc_midp:
             self._calc_midpoints()
             self._calc_midp_aspects()
+        self._notify('planets', 'aspects', 'midpoints', 'midp_aspects')
 
     # comparisons (transform planets positions relatively to another julian day)
 
     def progression_of(self, jd):
         """Make itself a progressed chart for some Julian day.
 
+        :see: progressions module, for series of progressions leaving the
+            chart unchanged
+
         :type jd: numeric
         """
         jd += swe._years_diff(jd, self.julday) # years as days
@@ -468,15 +656,49 @@ class ChartCalc(ChartDate):
         # reset datetime
         self._reset_datetime()
         self._datetime = old
+        self._stale_positions('ecl_nut', 'houses', 'planets')
 
     def direction_of(self, jd):
         """Make itself a primary direction chart for some Julian day.
 
-        :todo: to do...
+        Positions of the chart at Julian day jd are directed by the arc
+        for the years elapsed until the chart date: bodies take the
+        longitudes of the ecliptic points at the mundane positions they
+        reach (Placidus semi-arcs). Houses are left unchanged.
+
+        :see: directions module
 
         :type jd: numeric
         """
-        pass
+        years = swe._years_diff(jd, self.julday)
+        old = self.datetime
+        old_dst = self._dst
+        self._set_utc_julday(jd) # directions need the exact moment
+        self.calc()
+        table = directions.DirectionsTable(self)
+        arc = directions.years_to_arc(years)
+        lons = dict()
+        for pos in self._planets:
+            if pos._planet._family == 4: # houses
+                continue
+            try:
+                lons[pos._planet._name] = table.directed_longitude(
+                    pos._planet._name, arc)
+            except (KeyError, ValueError): # circumpolar
+                pass
+        for pos in self._planets:
+            if pos._planet._name in lons:
+                pos._longitude = lons[pos._planet._name]
+        self._calc_aspects()
+        if self._filter._calc_midp:
+            self._calc_midpoints()
+            self._calc_midp_aspects()
+        self._notify('planets', 'aspects', 'midpoints', 'midp_aspects')
+        # reset datetime
+        self._reset_datetime()
+        self._datetime = old
+        self._dst = old_dst
+        self._stale_positions('ecl_nut', 'houses', 'planets')
 
     def profection_of(self, op, value, unit, jd):
         """Transform positions to get profection for some Julian day.
@@ -516,6 +738,9 @@ class ChartCalc(ChartDate):
         :type set_default: bool
         :type do_calc: bool
         """
+        self._observers = list()
+        self._filter = None
+        self.reset_positions()
         ChartDate.__init__(self, path, set_default)
         if set_default:
             self._filter = cfg.dft_filter
@@ -290,7 +290,7 @@ class ChartDate(ChartFile):
             else: # zoneinfo is set
                 tz = pytz.timezone(self._zoneinfo)
                 if self._dst != None: # user-defined, ambiguous
-                    loc_dt = tz.localize(dt, is_dst=self._dst)
+                    loc_dt = tz.localize(self._datetime, is_dst=self._dst)
                 else: # check for ambiguous datetime
                     loc_dt = tz.localize(self._datetime)
                     loc_dt_dst = tz.localize(self._datetime, is_dst=True)
@@ -359,6 +359,25 @@ class ChartDate(ChartFile):
         self._local_sidtime = loc_sidt # further reading
         return loc_sidt
 
+    def _set_utc_julday(self, jd):
+        """Set local datetime (and DST if ambiguous) from a Julian day (UT).
+
+        :type jd: float
+        """
+        cal = swe.GREG_CAL if self._calendar == 'gregorian' else swe.JUL_CAL
+        dt = datetime(*swe._revjul(jd, cal))
+        dst = None
+        if self._utcoffset != None: # user-defined, below 1900
+            dt += timedelta(hours=self._utcoffset)
+        elif self._zoneinfo not in (None, 'UTC', 'utc'):
+            tz = pytz.timezone(self._zoneinfo)
+            loc = pytz.utc.localize(dt).astimezone(tz)
+            dt = loc.replace(tzinfo=None)
+            if tz.localize(dt) != tz.localize(dt, is_dst=True): # ambiguous
+                dst = bool(loc.dst())
+        self.datetime = dt
+        self.dst = dst
+
     def __init__(self, path=None, set_default=True):
         ChartFile.__init__(self, path, set_default)
         self._reset_datetime()
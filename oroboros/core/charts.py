@@ -94,12 +94,14 @@ class Chart(ChartCalc):
 	def _all_draw_aspects(self):
 		"""Return a list of all aspects to draw (incl. midpoints).
 		
+		Each part is sorted by ranking, for cheap sorting of the whole.
+		
 		:rtype: AspectDataList
 		"""
 		ret = AspectDataList()
-		ret.extend(self._aspects)
+		ret.extend(self._aspects.ranked())
 		if self._filter._draw_midp:
-			ret.extend(self._midp_aspects)
+			ret.extend(self._midp_aspects.ranked())
 		return ret
 	
 	def __iter__(self):
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Charts index.
+
+Charts xml files found in a directory (default is the charts directory,
+see cfg) are catalogued in the database, with their positions, houses
+and aspects calculated with a filter. Files are indexed again only when
+modified (checked by modification time, then by contents hash).
+
+Charts can then be searched without parsing files.
+	
+	Index charts in a directory.
+		
+		>>> import tempfile, shutil
+		>>> from oroboros.core.charts import Chart
+		>>> tmp = tempfile.mkdtemp()
+		>>> chart = Chart()
+		>>> chart.path = os.path.join(tmp, 'test.xml')
+		>>> chart.write()
+		True
+		>>> update(tmp)
+		(1, 0, 0, 0)
+		>>> update(tmp)
+		(0, 0, 0, 0)
+	
+	Search charts.
+		
+		>>> sun = chart.planets.get_data('Sun')
+		>>> chart.path in query([('Sun', None, int(sun.longitude // 30) + 1)])
+		True
+	
+	Index with processes, files removed and modified.
+		
+		>>> tmp2 = tempfile.mkdtemp()
+		>>> for i in range(8):
+		...     chart.path = os.path.join(tmp2, 'test%s.xml' % i)
+		...     chart.write()
+		True
+		True
+		True
+		True
+		True
+		True
+		True
+		True
+		>>> update(tmp2, workers=2)
+		(8, 0, 0, 0)
+		>>> os.remove(os.path.join(tmp2, 'test0.xml'))
+		>>> os.utime(os.path.join(tmp2, 'test2.xml'), (0, 0))
+		>>> chart.name = 'modified'
+		>>> chart.path = os.path.join(tmp2, 'test1.xml')
+		>>> chart.write()
+		True
+		>>> update(tmp2, workers=2)
+		(0, 1, 1, 0)
+		>>> shutil.rmtree(tmp2)
+		>>> update(tmp2, workers=2)
+		(0, 0, 7, 0)
+	
+	Remove files from index.
+		
+		>>> shutil.rmtree(tmp)
+		>>> update(tmp)
+		(0, 0, 1, 0)
+
+"""
+
+import hashlib
+import os
+import os.path
+import sys
+
+from oroboros.core import db
+from oroboros.core import cfg
+from oroboros.core import batch
+from oroboros.core import geocoords
+from oroboros.core.filters import Filter
+
+
+__all__ = ['install', 'update', 'add', 'query', 'clear']
+
+
+_basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+def install():
+	"""Create index tables, if needed."""
+	db._execute_file(os.path.join(_basedir, 'sqlite-index.sql'))
+
+
+def _hash(path):
+	"""Return sha1 hash of a file contents.
+	
+	:type path: str
+	:rtype: str
+	"""
+	f = open(path, 'rb')
+	try:
+		return hashlib.sha1(f.read()).hexdigest()
+	finally:
+		f.close()
+
+
+def _files(path, recursive):
+	"""Return xml files in a directory.
+	
+	:type path: str
+	:type recursive: bool
+	:rtype: list
+	"""
+	ret = list()
+	for root, dirs, files in os.walk(path):
+		for f in files:
+			if f.lower().endswith('.xml'):
+				ret.append(os.path.join(root, f))
+		if not recursive:
+			break
+	return ret
+
+
+def _house(lon, cusps):
+	"""Return house number (1 to 12) of a longitude.
+	
+	:type lon: float
+	:type cusps: sequence of 12 float
+	:rtype: int
+	"""
+	for i in xrange(12):
+		width = (cusps[(i + 1) % 12] - cusps[i]) % 360.0
+		if (lon - cusps[i]) % 360.0 < width:
+			return i + 1
+	return 12
+
+
+def _insert(res, mtime, hexdigest, filt_idx):
+	"""Insert results of a chart in index.
+	
+	:type res: batch.BatchResult
+	:type mtime: float
+	:type hexdigest: str
+	:type filt_idx: int
+	"""
+	(path, name, dt, cal, location, lat, lon, alt, country, zoneinfo,
+		tz, comment, kw, dst, utcoffset) = res._properties
+	db.execute('delete from ChartsIndex where path = ?;', (res._path,))
+	sql = """insert into ChartsIndex (path, mtime, hash, filter_idx, name,
+		datetime, calendar, location, latitude, longitude, country, zoneinfo,
+		julday) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);"""
+	idx = db.execute(sql, (res._path, mtime, hexdigest, filt_idx, name,
+		'%04d-%02d-%02d %02d:%02d:%02d' % (dt.year, dt.month, dt.day,
+			dt.hour, dt.minute, dt.second), cal, location,
+		float(geocoords.Latitude(*lat.split(':'))),
+		float(geocoords.Longitude(*lon.split(':'))), country, zoneinfo,
+		res._julday)).lastrowid
+	cusps = [x[1] for x in res._houses if x[0].startswith('Cusp ')]
+	if len(cusps) != 12: # gauquelin sectors
+		cusps = None
+	rows = list()
+	for x in res._planets:
+		rows.append((idx, x[0], x[1], x[2], x[4], int(x[1] // 30) + 1,
+			_house(x[1], cusps) if cusps != None else None))
+	for x in res._houses:
+		rows.append((idx, x[0], x[1], 0.0, 0.0, int(x[1] // 30) + 1,
+			_house(x[1], cusps) if cusps != None else None))
+	sql = """insert into _ChartsIndexPlanets (chart_idx, planet, longitude,
+		latitude, lonspeed, sign, house) values (?, ?, ?, ?, ?, ?, ?);"""
+	db.executemany(sql, rows)
+	sql = """insert into _ChartsIndexAspects (chart_idx, planet1, planet2,
+		aspect, diff, apply, factor) values (?, ?, ?, ?, ?, ?, ?);"""
+	db.executemany(sql, ((idx, x[0], x[1], x[2], x[3],
+		int(x[4]) if x[4] != None else None, x[5]) for x in res._aspects))
+
+
+def _rollback():
+	"""Roll back transaction, and raise the error being handled.
+	
+	Errors of rollback (no transaction active) are ignored.
+	"""
+	exc = sys.exc_info()
+	try:
+		db.execute('rollback;')
+	except Exception:
+		pass
+	raise exc[0], exc[1], exc[2]
+
+
+def _index(todo, results, filt_idx):
+	"""Insert calculated charts in index.
+	
+	Return numbers of charts added, updated, and failed.
+	
+	:type todo: list of (path, mtime, hash, exists) tuples
+	:type results: iterable of batch.BatchResult
+	:type filt_idx: int
+	:rtype: tuple
+	"""
+	added = updated = failed = 0
+	for res in results:
+		f, mtime, hexdigest, exists = todo[res._index]
+		ok = res._error == None
+		if ok:
+			# a bad chart is failed, without aborting the whole transaction
+			db.execute('savepoint chart;')
+			try:
+				_insert(res, mtime, hexdigest, filt_idx)
+				db.execute('release chart;')
+			except Exception:
+				db.execute('rollback to chart;')
+				db.execute('release chart;')
+				ok = False
+		if not ok:
+			db.execute('delete from ChartsIndex where path = ?;', (f,))
+			failed += 1
+			continue
+		if exists:
+			updated += 1
+		else:
+			added += 1
+	return added, updated, failed
+
+
+def update(path=None, filt=None, recursive=True, workers=0):
+	"""Index new and modified charts files of a directory.
+	
+	Files indexed with another filter are indexed again. Files no more
+	found in directory are removed from index.
+	
+	Return numbers of files added, updated, removed, and failed (files
+	not parsed).
+	
+	:see: batch.calc_charts()
+	
+	:type path: str
+	:type filt: str or int
+	:type recursive: bool
+	:type workers: int
+	:rtype: tuple
+	"""
+	install()
+	if path == None:
+		path = cfg.charts_dir
+	path = os.path.abspath(os.path.expanduser(path))
+	filt_idx = Filter(filt)._idx_
+	sql = 'select _idx, path, mtime, hash, filter_idx from ChartsIndex;'
+	known = dict((x[1], x) for x in db.execute(sql).fetchall()
+		if x[1].startswith(os.path.join(path, '')))
+	if not recursive:
+		known = dict((k, v) for k, v in known.items()
+			if os.path.dirname(k) == path)
+	todo = list() # (path, mtime, hash, exists)
+	touched = list() # (mtime, idx)
+	for f in _files(path, recursive):
+		mtime = os.path.getmtime(f)
+		row = known.pop(f, None)
+		if row != None and row[4] == filt_idx and row[2] == mtime:
+			continue
+		hexdigest = _hash(f)
+		if row != None and row[4] == filt_idx and row[3] == hexdigest:
+			touched.append((mtime, row[0]))
+			continue
+		todo.append((f, mtime, hexdigest, row != None))
+	# processes started before the transaction (see batch.calc_charts)
+	results = batch.calc_charts([x[0] for x in todo], filt_idx,
+		workers if todo else 0, errors='return')
+	db.execute('begin;')
+	try:
+		db.executemany('delete from ChartsIndex where _idx = ?;',
+			((x[0],) for x in known.values()))
+		db.executemany('update ChartsIndex set mtime = ? where _idx = ?;',
+			touched)
+		added, updated, failed = _index(todo, results, filt_idx)
+		db.execute('commit;')
+	except:
+		_rollback() # raises
+	return added, updated, len(known), failed
+
+
+def add(charts, filt=None, workers=0):
+	"""Index charts objects, already written in files.
+	
+	Charts are calculated from their properties, files are not parsed.
+	
+	Return numbers of charts added, updated, and failed.
+	
+	:type charts: sequence of ChartFile
+	:type filt: str or int
+	:type workers: int
+	:rtype: tuple
+	:raise OSError: chart file not found
+	"""
+	install()
+	filt_idx = Filter(filt)._idx_
+	known = set(x[0] for x in db.execute(
+		'select path from ChartsIndex;').fetchall())
+	todo = [(x._path, os.path.getmtime(x._path), _hash(x._path),
+		x._path in known) for x in charts]
+	results = batch.calc_charts(charts, filt_idx, workers if todo else 0,
+		errors='return')
+	db.execute('begin;')
+	try:
+		ret = _index(todo, results, filt_idx)
+		db.execute('commit;')
+	except:
+		_rollback() # raises
+	return ret
+
+
+def query(planets=(), aspects=(), filt=None):
+	"""Return paths of indexed charts matching all conditions.
+	
+	Planets conditions are (planet name, house, sign) tuples, house (1 to
+	12) or sign (1 for Aries to 12) being None if indifferent. Aspects
+	conditions are (planet name, aspect name, planet name) tuples.
+	
+	Only charts indexed with the filter given are searched, default is
+	all charts.
+		
+		>>> res = query([('Sun', 10, None)], [('Moon', 'Square', 'Mars')])
+	
+	:type planets: sequence of tuple
+	:type aspects: sequence of tuple
+	:type filt: str or int
+	:rtype: list
+	"""
+	install()
+	sql = list()
+	var = list()
+	for name, house, sign in planets:
+		s = 'select chart_idx from _ChartsIndexPlanets where planet = ?'
+		var.append(name)
+		if house != None:
+			s += ' and house = ?'
+			var.append(int(house))
+		if sign != None:
+			s += ' and sign = ?'
+			var.append(int(sign))
+		sql.append(s)
+	for name1, asp, name2 in aspects:
+		sql.append('''select chart_idx from _ChartsIndexAspects
+			where aspect = ? and planet1 = ? and planet2 = ?
+			union select chart_idx from _ChartsIndexAspects
+			where aspect = ? and planet1 = ? and planet2 = ?''')
+		var.extend((asp, name1, name2, asp, name2, name1))
+	s = 'select path from ChartsIndex'
+	where = list()
+	if sql:
+		where.append('_idx in (%s)' % ' intersect '.join(
+			'select * from (%s)' % x for x in sql))
+	if filt != None:
+		where.append('filter_idx = ?')
+		var.append(Filter(filt)._idx_)
+	if where:
+		s += ' where ' + ' and '.join(where)
+	return [x[0] for x in db.execute(s + ' order by path;', var).fetchall()]
+
+
+def clear():
+	"""Remove all charts from index."""
+	install()
+	db.execute('delete from ChartsIndex;')
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
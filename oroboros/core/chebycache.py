@@ -0,0 +1,529 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Precomputed ephemeris (Chebyshev coefficients cache).
+
+For a set of bodies, a calculation flag and a span of Julian days,
+positions are computed once with swisseph and stored as Chebyshev
+coefficients in a binary file. At runtime the file is memory-mapped, and
+positions (longitude, latitude, distance and their speeds) are
+interpolated instead of calling swisseph.
+
+Each body has its own blocks length (days) and polynomial degree. With
+the defaults (see _dft_days), interpolation error against the Moshier
+ephemeris was measured as:
+
+	- longitude, latitude: 2e-3 degree (most planets: 2e-4 degree)
+	- distance: 1e-7 AU
+	- speeds: 0.1 degree per day for the osculating apogee, 1e-2 otherwise
+
+Errors come mostly from irregularities of the source itself (speeds are
+computed numerically), smoother with swiss ephemeris files.
+Use check() to measure a cache file.
+
+Select the cache with the filter ephemeris type 'cheby', and the file
+path as ephemeris path. Bodies, dates and calculation flags (apart from
+the ephemeris bits) not found in the file are computed by swisseph, with
+the ephemeris files used to build the cache. Sidereal positions are
+interpolated only with the sidereal mode used to build the cache.
+	
+	Build a cache file (for 2 bodies, 1 year), and use it.
+		
+		>>> import os, tempfile
+		>>> path = os.path.join(tempfile.gettempdir(), 'test.cheby')
+		>>> build(path, ['Sun', 'Moon'], 2451545, 2451910,
+		...     swe.FLG_SPEED|swe.FLG_MOSEPH)
+		>>> cache = ChebyCache(path)
+		>>> cache.covers(1, 2451700.3)
+		True
+		>>> res = cache.calc_ut(2451700.3, 1, swe.FLG_SPEED|swe.FLG_SWIEPH)
+		>>> err = check(path, samples=100)
+		>>> err[1][0] < 1e-5
+		True
+		>>> cache.close()
+		>>> os.remove(path)
+
+"""
+
+import mmap
+import struct
+from math import cos, pi
+
+import swisseph as swe
+
+import oroboros.core.swestate
+
+
+__all__ = ['ChebyCache', 'build', 'check', 'activate', 'deactivate',
+	'active']
+
+
+#: File magic string
+_magic = 'OROBCHEB'
+
+#: File format version
+_version = 2
+
+#: Header: magic, version, flag, jd_start, jd_end, sidereal mode, t0,
+#: ayan_t0, number of bodies, ephemeris path
+_header = struct.Struct('<8sIiddiddI256s')
+
+#: Bodies table row: num, days, degree, number of blocks, data offset
+_row = struct.Struct('<idIIQ')
+
+#: Ephemeris flags (not compared when using the cache)
+_ephemask = swe.FLG_SWIEPH | swe.FLG_JPLEPH | swe.FLG_MOSEPH
+
+#: Ephemeris types, by ephemeris flag
+_ephetypes = {
+	swe.FLG_SWIEPH: 'swiss',
+	swe.FLG_JPLEPH: 'jpl',
+	swe.FLG_MOSEPH: 'moshier'
+	}
+
+#: Default blocks length (days) and degree, by swisseph num
+_dft_days = {
+	0: (8, 12), # sun
+	1: (4, 12), # moon
+	2: (4, 12), # mercury
+	3: (8, 12), # venus
+	4: (8, 12), # mars
+	11: (2, 12), # true node
+	13: (2, 12), # osculating apogee
+	-3: (2, 12), # ketu (true)
+	-5: (2, 12) # priapus (true)
+	}
+
+#: Default blocks length and degree for other bodies
+_dft_other = (16, 12)
+
+#: Cache in use (see activate())
+_active = None
+
+
+def _nodes(degree):
+	"""Return Chebyshev nodes in [-1;1].
+	
+	:type degree: int
+	:rtype: list of float
+	"""
+	n = degree + 1
+	return [cos(pi * (k + 0.5) / n) for k in range(n)]
+
+
+def _fit(values, degree):
+	"""Return Chebyshev coefficients for values sampled at the nodes.
+	
+	First coefficient is halved.
+	
+	:type values: sequence of float
+	:type degree: int
+	:rtype: list of float
+	"""
+	n = degree + 1
+	ret = list()
+	for j in range(n):
+		s = 0.0
+		for k in range(n):
+			s += values[k] * cos(pi * j * (k + 0.5) / n)
+		ret.append(2.0 * s / n)
+	ret[0] /= 2.0
+	return ret
+
+
+def _derive(coeffs):
+	"""Return coefficients of the derivative (first coefficient halved).
+	
+	:type coeffs: sequence of float
+	:rtype: list of float
+	"""
+	n = len(coeffs)
+	ret = [0.0] * n
+	if n < 2:
+		return ret
+	ret[n-2] = 2.0 * (n - 1) * coeffs[n-1]
+	for j in range(n - 2, 0, -1):
+		ret[j-1] = (ret[j+1] if j + 1 < n else 0.0) + 2.0 * j * coeffs[j]
+	ret[0] /= 2.0
+	return ret
+
+
+def _eval(coeffs, x):
+	"""Evaluate a Chebyshev series (Clenshaw).
+	
+	:type coeffs: sequence of float
+	:type x: float
+	:rtype: float
+	"""
+	b1 = b2 = 0.0
+	x2 = 2.0 * x
+	for j in range(len(coeffs) - 1, 0, -1):
+		b1, b2 = x2 * b1 - b2 + coeffs[j], b1
+	return x * b1 - b2 + coeffs[0]
+
+
+def _calc(planet, jd, flag):
+	"""Return swisseph results for a body.
+	
+	:type planet: planets.Planet
+	:type jd: float
+	:type flag: int
+	:rtype: tuple
+	"""
+	return planet._calc_ut(jd, flag)
+
+
+def build(path, bodies, jd_start, jd_end, flag, days=None):
+	"""Compute and write a cache file.
+	
+	Days can be a dict of (days, degree) by swisseph num, overriding the
+	defaults. Houses, parts and topocentric positions cannot be cached.
+	Swisseph must be set up before (ephemeris path, sidereal mode) with
+	the swestate module: the settings are stored in the file.
+	
+	:type path: str
+	:type bodies: sequence of Planet, str or int
+	:type jd_start: numeric
+	:type jd_end: numeric
+	:type flag: int
+	:type days: dict
+	:raise ValueError: invalid span, body or flag, unknown settings
+	"""
+	from oroboros.core.planets import Planet, planets_registry
+	if jd_end <= jd_start:
+		raise ValueError('Invalid span %s %s.' % (jd_start, jd_end))
+	if flag & swe.FLG_TOPOCTR:
+		raise ValueError('Cannot cache topocentric positions.')
+	ephe_type = _ephetypes.get(flag & _ephemask, 'swiss')
+	ephe_path = ''
+	if ephe_type != 'moshier':
+		ephe = oroboros.core.swestate.ephemeris()
+		if ephe == None or ephe[0] != ephe_type:
+			raise ValueError('Unknown %s ephemeris path.' % ephe_type)
+		ephe_path = ephe[1]
+		if isinstance(ephe_path, unicode):
+			ephe_path = ephe_path.encode('utf-8')
+		if len(ephe_path) > 255:
+			raise ValueError('Ephemeris path too long %s.' % ephe_path)
+	sid = oroboros.core.swestate.context(flag)[0]
+	if flag & swe.FLG_SIDEREAL:
+		if sid == None:
+			raise ValueError('Unknown sidereal mode.')
+	else:
+		sid = (-1, 0, 0)
+	reg = planets_registry()
+	pl = list()
+	for b in bodies:
+		if isinstance(b, Planet):
+			pl.append(b)
+		elif isinstance(b, int):
+			pl.append(reg.get_num(b))
+		else:
+			pl.append(reg[b])
+	for p in pl:
+		if p._family in (4, 5):
+			raise ValueError('Cannot cache %s.' % p._name)
+	jd_start = float(jd_start)
+	jd_end = float(jd_end)
+	# bodies table
+	rows = list()
+	offset = _header.size + _row.size * len(pl)
+	for p in pl:
+		if days != None and p._num in days:
+			d, deg = days[p._num]
+		else:
+			d, deg = _dft_days.get(p._num, _dft_other)
+		d = float(d)
+		nblocks = int((jd_end - jd_start) / d)
+		if jd_start + nblocks * d < jd_end:
+			nblocks += 1
+		rows.append((p._num, d, deg, nblocks, offset))
+		offset += nblocks * 3 * (deg + 1) * 8
+	f = open(path, 'wb')
+	try:
+		f.write(_header.pack(_magic, _version, flag, jd_start, jd_end,
+			int(sid[0]), float(sid[1]), float(sid[2]), len(pl), ephe_path))
+		for row in rows:
+			f.write(_row.pack(*row))
+		for p, (num, d, deg, nblocks, offset) in zip(pl, rows):
+			nodes = _nodes(deg)
+			half = d / 2.0
+			for b in xrange(nblocks):
+				mid = jd_start + b * d + half
+				res = [_calc(p, mid + half * x, flag) for x in nodes]
+				# unwrap longitudes around first node
+				lons = [res[0][0]]
+				for r in res[1:]:
+					lon = r[0]
+					while lon - lons[-1] > 180.0:
+						lon -= 360.0
+					while lon - lons[-1] < -180.0:
+						lon += 360.0
+					lons.append(lon)
+				for coord in (lons, [r[1] for r in res],
+					[r[2] for r in res]):
+					coeffs = _fit(coord, deg)
+					f.write(struct.pack('<%sd' % (deg + 1), *coeffs))
+	finally:
+		f.close()
+
+
+class ChebyCache(object):
+	"""Memory-mapped cache file."""
+	
+	__slots__ = ('_path', '_file', '_map', '_flag', '_jd_start', '_jd_end',
+		'_sidereal', '_ephe_path', '_bodies', '_blocks')
+	
+	def _get_path(self):
+		"""Get cache file path.
+		
+		:rtype: str
+		"""
+		return self._path
+	
+	def _get_flag(self):
+		"""Get calculation flag used to build the cache.
+		
+		:rtype: int
+		"""
+		return self._flag
+	
+	def _get_span(self):
+		"""Get first and last Julian days.
+		
+		:rtype: tuple
+		"""
+		return self._jd_start, self._jd_end
+	
+	def _get_nums(self):
+		"""Get cached bodies swisseph nums.
+		
+		:rtype: list
+		"""
+		return self._bodies.keys()
+	
+	def _get_sidereal(self):
+		"""Get sidereal mode used to build the cache.
+		
+		:rtype: tuple (mode, t0, ayan_t0) or None
+		"""
+		return self._sidereal
+	
+	def _get_ephemeris(self):
+		"""Get ephemeris type and path used to build the cache.
+		
+		:rtype: tuple
+		"""
+		return (_ephetypes.get(self._flag & _ephemask, 'swiss'),
+			self._ephe_path)
+	
+	path = property(_get_path,
+		doc='Cache file path.')
+	flag = property(_get_flag,
+		doc='Calculation flag.')
+	span = property(_get_span,
+		doc='First and last Julian days.')
+	nums = property(_get_nums,
+		doc='Cached bodies swisseph nums.')
+	sidereal = property(_get_sidereal,
+		doc='Sidereal mode.')
+	ephemeris = property(_get_ephemeris,
+		doc='Ephemeris type and path.')
+	
+	def __init__(self, path):
+		"""Open and map a cache file.
+		
+		:type path: str
+		:raise ValueError: invalid file or version
+		"""
+		self._path = path
+		self._file = open(path, 'rb')
+		try:
+			self._map = mmap.mmap(self._file.fileno(), 0,
+				access=mmap.ACCESS_READ)
+			(magic, version, flag, jd_start, jd_end, sid_mode, sid_t0,
+				sid_ayan_t0, num, ephe_path) = _header.unpack_from(self._map, 0)
+		except Exception:
+			self._file.close()
+			raise ValueError('Invalid cache file %s.' % path)
+		if magic != _magic or version != _version:
+			self.close()
+			raise ValueError('Invalid cache file version %s.' % path)
+		self._flag = flag
+		self._jd_start = jd_start
+		self._jd_end = jd_end
+		if flag & swe.FLG_SIDEREAL:
+			self._sidereal = (sid_mode, sid_t0, sid_ayan_t0)
+		else:
+			self._sidereal = None
+		self._ephe_path = ephe_path.rstrip('\0')
+		self._bodies = dict()
+		for i in range(num):
+			row = _row.unpack_from(self._map, _header.size + i * _row.size)
+			self._bodies[row[0]] = row[1:]
+		# last block used, by body: (block, coefficients)
+		self._blocks = dict()
+	
+	def covers(self, num, jd):
+		"""Return True if body and Julian day are in the cache.
+		
+		:type num: int
+		:type jd: float
+		:rtype: bool
+		"""
+		return num in self._bodies and self._jd_start <= jd <= self._jd_end
+	
+	def _coefficients(self, num, block):
+		"""Return coefficients and derivatives for a body block.
+		
+		:type num: int
+		:type block: int
+		:rtype: tuple
+		"""
+		try:
+			b, coeffs = self._blocks[num]
+			if b == block:
+				return coeffs
+		except KeyError:
+			pass
+		days, deg, nblocks, offset = self._bodies[num]
+		n = deg + 1
+		fmt = '<%sd' % n
+		offset += block * 3 * n * 8
+		coeffs = [struct.unpack_from(fmt, self._map, offset + c * n * 8)
+			for c in range(3)]
+		coeffs = tuple(coeffs + [_derive(x) for x in coeffs])
+		self._blocks[num] = (block, coeffs)
+		return coeffs
+	
+	def calc_ut(self, jd, num, flag):
+		"""Return interpolated positions, like swisseph calc_ut.
+		
+		Return None if the body, Julian day or flag (apart from ephemeris
+		bits) is not in the cache, or if the sidereal mode applied (see
+		swestate) is not the one of the cache.
+		
+		:type jd: float
+		:type num: int
+		:type flag: int
+		:rtype: tuple or None
+		"""
+		if (flag & ~_ephemask) != (self._flag & ~_ephemask):
+			return None
+		if self._sidereal != None:
+			sid = oroboros.core.swestate.context(flag)[0]
+			if sid == None or (int(sid[0]), float(sid[1]),
+				float(sid[2])) != self._sidereal:
+				return None
+		if not self.covers(num, jd):
+			return None
+		days, deg, nblocks, offset = self._bodies[num]
+		block = int((jd - self._jd_start) / days)
+		if block >= nblocks: # jd_end
+			block = nblocks - 1
+		half = days / 2.0
+		x = (jd - (self._jd_start + block * days + half)) / half
+		lon, lat, dist, dlon, dlat, ddist = self._coefficients(num, block)
+		return (_eval(lon, x) % 360.0, _eval(lat, x), _eval(dist, x),
+			_eval(dlon, x) / half, _eval(dlat, x) / half,
+			_eval(ddist, x) / half)
+	
+	def fallback_flag(self, flag):
+		"""Return flag to compute with swisseph what is not cached.
+		
+		Ephemeris bits are those used to build the cache.
+		
+		:type flag: int
+		:rtype: int
+		"""
+		return (flag & ~_ephemask) | (self._flag & _ephemask)
+	
+	def close(self):
+		"""Unmap and close file."""
+		self._map.close()
+		self._file.close()
+	
+	def __repr__(self):
+		return "ChebyCache('''%s''')" % self._path
+
+
+def check(path, samples=1000):
+	"""Compare a cache file with swisseph, at random Julian days.
+	
+	Return the maximum absolute errors of the six values, by num.
+	Swisseph must be set up as when building the cache.
+	
+	:type path: str
+	:type samples: int
+	:rtype: dict
+	"""
+	import random
+	from oroboros.core.planets import planets_registry
+	cache = ChebyCache(path)
+	try:
+		reg = planets_registry()
+		jd0, jd1 = cache.span
+		ret = dict()
+		for num in cache.nums:
+			p = reg.get_num(num)
+			err = [0.0] * 6
+			for i in xrange(samples):
+				jd = random.uniform(jd0, jd1)
+				res = cache.calc_ut(jd, num, cache.flag)
+				ref = _calc(p, jd, cache.flag)
+				for k in range(6):
+					e = abs(res[k] - ref[k])
+					if k == 0:
+						e = min(e, 360.0 - e)
+					err[k] = max(err[k], e)
+			ret[num] = tuple(err)
+		return ret
+	finally:
+		cache.close()
+
+
+def activate(path):
+	"""Use a cache file for planets calculations.
+	
+	:see: planets.Planet.calc_ut()
+	
+	:type path: str
+	:raise ValueError: invalid file
+	:raise IOError: file not found
+	"""
+	global _active
+	if _active != None:
+		if _active._path == path:
+			return
+		_active.close()
+		_active = None
+	_active = ChebyCache(path)
+
+
+def deactivate():
+	"""Stop using a cache file."""
+	global _active
+	if _active != None:
+		_active.close()
+		_active = None
+
+
+def active():
+	"""Return the cache in use, or None.
+	
+	:rtype: ChebyCache or None
+	"""
+	return _active
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compatibility search.
+
+A collection of charts positions is kept in memory: longitudes and
+longitude speeds by body (one array per body, indexed by chart), and, for
+each body, buckets of charts by longitude (default is one bucket by
+degree). Charts are added from chart objects, from the charts index (see
+chartsindex module), or from a directory of charts with its snapshots
+cache (see snapshot module).
+
+A search gives a natal chart and weighted inter-aspects (natal body,
+aspect, other body). For each inter-aspect, the buckets within orb give
+the candidates, with the sum of weights of the inter-aspects they may
+form as upper bound of their score. Candidates are then scored exactly,
+best bounds first, until no candidate left can enter the results.
+
+Orbs follow the inter-aspects rules of bi-charts, with the natal chart
+filter and the collection filter.
+	
+	Search charts.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> natal = Chart()
+		>>> idx = CompatIndex()
+		>>> for y in (1970, 1975, 1980, 1985):
+		...     cht = Chart(do_calc=False)
+		...     cht.datetime = (y, 6, 1, 12, 0, 0)
+		...     cht.calc()
+		...     idx.add(y, cht)
+		>>> res = idx.search(natal, [('Sun', 'Conjunction', 'Moon', 2.0),
+		...     ('Venus', 'Trine', 'Mars', 1.0)], 2)
+		>>> len(res) <= 2
+		True
+
+"""
+
+import heapq
+import math
+from array import array
+from decimal import Decimal
+
+import swisseph as swe
+
+from oroboros.core import db
+from oroboros.core import aspectsengine
+from oroboros.core import chartsindex
+from oroboros.core import snapshot
+from oroboros.core.filters import Filter
+from oroboros.core.aspects import aspects_registry
+
+
+__all__ = ['CompatIndex']
+
+
+#: Missing position
+_nan = float('nan')
+
+
+class CompatIndex(object):
+	"""Charts positions, indexed by longitude buckets."""
+	
+	__slots__ = ('_filter', '_width', '_nbuckets', '_keys', '_lons',
+		'_speeds', '_buckets')
+	
+	def _get_filter(self):
+		"""Get filter of charts positions.
+		
+		:rtype: Filter
+		"""
+		return self._filter
+	
+	def _get_width(self):
+		"""Get width of buckets, in degrees.
+		
+		:rtype: float
+		"""
+		return self._width
+	
+	def _get_keys(self):
+		"""Get keys of charts, in order of addition.
+		
+		:rtype: list
+		"""
+		return self._keys
+	
+	def _get_bodies(self):
+		"""Get names of bodies found in charts.
+		
+		:rtype: list of str
+		"""
+		return self._lons.keys()
+	
+	filter = property(_get_filter,
+		doc='Filter of charts positions.')
+	width = property(_get_width,
+		doc='Width of buckets, in degrees.')
+	keys = property(_get_keys,
+		doc='Charts keys.')
+	bodies = property(_get_bodies,
+		doc='Bodies names.')
+	
+	def __init__(self, filt=None, width=1.0):
+		"""Init empty collection.
+		
+		Filter is the one used to calculate positions, for orbs and
+		restrictions (default is the default filter).
+		
+		:type filt: Filter, str, int or None
+		:type width: numeric
+		:raise ValueError: invalid width
+		"""
+		if not isinstance(filt, Filter):
+			filt = Filter(filt)
+		self._filter = filt
+		self._width = float(width)
+		if not 0 < self._width <= 360.0:
+			raise ValueError('Invalid width %s.' % width)
+		self._nbuckets = int(math.ceil(360.0 / self._width))
+		self._keys = list()
+		self._lons = dict()
+		self._speeds = dict()
+		self._buckets = dict()
+	
+	def __len__(self):
+		return len(self._keys)
+	
+	def _bucket(self, lon):
+		"""Return bucket index of a longitude.
+		
+		:type lon: float
+		:rtype: int
+		"""
+		return min(int(lon // self._width), self._nbuckets - 1)
+	
+	def add_positions(self, key, positions):
+		"""Add a chart positions.
+		
+		:type key: object
+		:type positions: dict of name: (longitude, lonspeed)
+		"""
+		n = len(self._keys)
+		self._keys.append(key)
+		for name in self._lons:
+			self._lons[name].append(_nan)
+			self._speeds[name].append(_nan)
+		for name, (lon, speed) in positions.items():
+			if name not in self._lons:
+				self._lons[name] = array('d', [_nan]) * (n + 1)
+				self._speeds[name] = array('d', [_nan]) * (n + 1)
+				self._buckets[name] = [array('i')
+					for x in xrange(self._nbuckets)]
+			lon = float(lon) % 360.0
+			self._lons[name][n] = lon
+			self._speeds[name][n] = float(speed)
+			self._buckets[name][self._bucket(lon)].append(n)
+	
+	def add(self, key, chart):
+		"""Add a chart calculated positions.
+		
+		:type key: object
+		:type chart: ChartCalc
+		"""
+		positions = dict()
+		for pos in chart.planets:
+			positions.setdefault(pos._planet._name,
+				(pos._longitude, pos._lonspeed))
+		self.add_positions(key, positions)
+	
+	def load_index(self):
+		"""Add charts of the charts index calculated with collection filter.
+		
+		Keys are charts paths. Return number of charts added.
+		
+		:rtype: int
+		"""
+		chartsindex.install()
+		sql = '''select c.path, p.planet, p.longitude, p.lonspeed
+			from ChartsIndex as c, _ChartsIndexPlanets as p
+			where p.chart_idx = c._idx and c.filter_idx = ?
+			order by c._idx;'''
+		ret = 0
+		path = positions = None
+		for row in db.execute(sql, (self._filter._idx_,)):
+			if row[0] != path:
+				if path != None:
+					self.add_positions(path, positions)
+					ret += 1
+				path = row[0]
+				positions = dict()
+			positions.setdefault(row[1], (row[2], row[3]))
+		if path != None:
+			self.add_positions(path, positions)
+			ret += 1
+		return ret
+	
+	def load_snapshots(self, path=None, errors='raise'):
+		"""Add charts of a directory, with their snapshots cache.
+		
+		Charts are calculated with collection filter (positions restored
+		from snapshots if still valid). Keys are charts paths. Return
+		number of charts added.
+		
+		:see: snapshot.load_dir()
+		
+		:type path: str
+		:type errors: str
+		:rtype: int
+		"""
+		from oroboros.core.charts import Chart
+		charts = snapshot.load_dir(path, Chart, errors=errors)
+		for cht in charts:
+			if cht._filter is not self._filter:
+				cht.filter = self._filter
+			if cht._planets == None: # not restored
+				cht.calc()
+			self.add(cht._path, cht)
+		return len(charts)
+	
+	def _specs(self, natal, aspects):
+		"""Resolve searched inter-aspects.
+		
+		Return (body, natal longitude, natal speed, angle, orb, weight)
+		tuples, for inter-aspects possible with both filters.
+		
+		:see: BiChart._interaspects_orbs()
+		
+		:type natal: ChartCalc
+		:type aspects: sequence of tuples
+		:rtype: list
+		:raise ValueError: negative weight
+		:raise KeyError: body not in natal chart
+		"""
+		plan1 = natal._filter.compile()
+		plan2 = self._filter.compile()
+		all_asp = aspects_registry()
+		ret = list()
+		for name1, aspname, name2, weight in aspects:
+			weight = float(weight)
+			if weight < 0:
+				raise ValueError('Invalid weight %s.' % weight)
+			pos = natal.planets.get_data(name1)
+			if (aspname not in plan1.aspects or aspname not in plan2.aspects
+				or name2 not in self._lons):
+				continue
+			orb = (plan1.orbs[plan1.aspects.index(aspname)]
+				+ plan2.orbs[plan2.aspects.index(aspname)]) / Decimal('2')
+			mods = list()
+			for plan, name in ((plan1, name1), (plan2, name2)):
+				if plan1.is_aspected(name) and plan2.is_aspected(name):
+					mods.append([plan.orbmod(name)])
+				else:
+					mods.append([None])
+			cell = aspectsengine.orbs_matrix([orb], *mods)[0][0]
+			if cell == None or cell[0] < 0:
+				continue
+			ret.append((name2, pos._longitude, pos._lonspeed,
+				float(all_asp[aspname]._angle), cell[0], weight))
+		return ret
+	
+	def search(self, natal, aspects, num=10):
+		"""Return charts best matching weighted inter-aspects with a chart.
+		
+		Aspects are (natal body name, aspect name, other body name,
+		weight) tuples. A chart scores the weight of each inter-aspect
+		found, multiplied by its precision (1 - factor). Inter-aspects not
+		possible with the filters are ignored.
+		
+		Return (score, key) tuples, best scores first, of charts forming
+		at least one inter-aspect.
+		
+		:type natal: ChartCalc
+		:type aspects: sequence of tuples
+		:type num: int
+		:rtype: list
+		:raise ValueError: negative weight
+		:raise KeyError: body not in natal chart
+		"""
+		specs = self._specs(natal, aspects)
+		# candidates, with upper bound of scores
+		bounds = dict()
+		for name, lon, speed, angle, orb, weight in specs:
+			buckets = self._buckets[name]
+			found = set()
+			for center in (lon + angle, lon - angle):
+				for lo, hi in aspectsengine._windows(center,
+					orb + aspectsengine._epsilon):
+					for b in xrange(self._bucket(lo), self._bucket(hi) + 1):
+						found.update(buckets[b])
+			for n in found:
+				bounds[n] = bounds.get(n, 0.0) + weight
+		# exact scores, best bounds first
+		match_aspect = swe._match_aspect2
+		best = list() # heap of (score, -n)
+		for bound, n in sorted(((v, k) for k, v in bounds.iteritems()),
+			key=lambda x: (-x[0], x[1])):
+			if len(best) == num and best[0][0] >= bound:
+				break
+			score = 0.0
+			for name, lon, speed, angle, orb, weight in specs:
+				lon2 = self._lons[name][n]
+				if lon2 != lon2: # nan, body missing
+					continue
+				diff, apply, factor = match_aspect(lon, speed, lon2,
+					self._speeds[name][n], angle, orb)
+				if diff != None:
+					score += weight * (1.0 - factor)
+			if score <= 0:
+				continue
+			if len(best) < num:
+				heapq.heappush(best, (score, -n))
+			elif (score, -n) > best[0]:
+				heapq.heapreplace(best, (score, -n))
+		return [(score, self._keys[-n]) for score, n in sorted(best,
+			reverse=True)]
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -33,8 +33,8 @@ from oroboros.core import etc
 
 
 __all__ = ['Object',
-	'connect', 'execute', 'close', 'autoconnect',
-	'install', 'connect_atlas', 'install_atlas']
+	'connect', 'execute', 'executemany', 'close', 'autoconnect', 'touch',
+	'revision', 'install', 'connect_atlas', 'install_atlas']
 
 # default db path
 _dsn = etc.sqlite['path']
@@ -45,6 +45,15 @@ _cnx = None
 #: Cursor singleton
 _cur = None
 
+#: Objects modifications counter
+_revision = 0
+
+#: Constraints changed since database version (table, old, new)
+_migrations = (
+	('Filters', "check (ephe_type in ('swiss','jpl','moshier'))",
+		"check (ephe_type in ('swiss','jpl','moshier','cheby'))"),
+	)
+
 ## oroboros.db._atl_cnx
 ##_atl_cnx = None # atlas connection
 
@@ -157,16 +166,55 @@ def execute(sql, var=None):
 	return _cur
 
 
-def close():
-	"""Close connection."""
+def executemany(sql, seq):
+	"""Execute a SQL query for each sequence of parameters.
+	
+	:type sql: str
+	:type seq: iterable of sequence
+	:rtype: cursor
+	"""
+	global _cur
+	_cur.executemany(sql, seq)
+	return _cur
+
+
+def close(vacuum=True):
+	"""Close connection.
+	
+	Database is vacuumed first, unless vacuum is False.
+	
+	:type vacuum: bool
+	"""
 	global _cnx, _cur
-	try:
-		_cur.execute('vacuum;')
-	except:
-		pass
+	if vacuum:
+		try:
+			_cur.execute('vacuum;')
+		except:
+			pass
 	return _cnx.close()
 
 
+def touch():
+	"""Signal that some database object has been modified.
+	
+	Objects derived from filters or definitions (compiled plans) compare
+	the revision number to know if they are outdated.
+	
+	"""
+	global _revision
+	_revision += 1
+
+
+def revision():
+	"""Return objects modifications counter.
+	
+	:see: touch()
+	
+	:rtype: int
+	"""
+	return _revision
+
+
 def autoconnect(dsn=_dsn):
 	"""Automagic database connection on module import.
 	
@@ -218,12 +266,13 @@ def install(path=_dsn):
 	if int(res) > 0:
 		# stuff in there. check version
 		if not _check_version():
-			close()
+			close(vacuum=False)
 			os.remove(os.path.expanduser(path))
 			autoconnect()
 			install()
 			return 2
 		else:
+			_migrate()
 			return 1
 	# executes
 	f = os.path.join(_basedir, 'sqlite-creates.sql')
@@ -237,6 +286,31 @@ def install(path=_dsn):
 	return True
 
 
+def _migrate():
+	"""Apply constraints changes to an existing database.
+	
+	Tables definitions are edited in place: only constraints not
+	affecting stored data (check) can be changed this way.
+	"""
+	sql = "select sql from sqlite_master where type = 'table' and name = ?;"
+	for table, old, new in _migrations:
+		res = execute(sql, (table,)).fetchone()
+		if res == None or old not in res[0]:
+			continue
+		version = execute('pragma schema_version;').fetchone()[0]
+		execute('begin;')
+		try:
+			execute('pragma writable_schema = 1;')
+			execute("""update sqlite_master set sql = ? where type = 'table'
+				and name = ?;""", (res[0].replace(old, new), table))
+			execute('pragma schema_version = %d;' % (version + 1))
+			execute('pragma writable_schema = 0;')
+			execute('commit;')
+		except:
+			execute('rollback;')
+			raise
+
+
 def _check_version():
 	"""Return True if db is up to date.
 	
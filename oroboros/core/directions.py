@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Primary directions (Placidus semi-arcs).
+
+Each point of a chart is placed on its diurnal circle: its hour angle
+from the meridian and its diurnal and nocturnal semi-arcs, computed once
+from right ascension and declination. Its mundane position is then its
+proportional distance to the angles, in degrees (0 at Mc, 90 at Dsc, 180
+at Ic, 270 at Asc). The rotation of the sphere bringing a promissor to
+the mundane position of a significator (or to an aspect of it) is the
+arc of direction. All arcs are thus simple differences of hour angles,
+without recalculating charts.
+
+Mundane directions use promissors with their latitude, and mundane
+aspects (a square is one quadrant). Zodiacal directions use the aspect
+points of promissors on the ecliptic, without latitude.
+
+Arcs are converted to years with a time key (Naibod or Ptolemy).
+Placidus semi-arcs are undefined for circumpolar points, these points
+are ignored.
+	
+	List directions of a chart, for 100 years.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> chart = Chart()
+		>>> table = DirectionsTable(chart)
+		>>> dirs = table.directions(100, aspects=['Conjunction', 'Square'])
+		>>> dirs == sorted(dirs, key=lambda x: x.arc)
+		True
+		>>> dirs[-1].years <= 100
+		True
+	
+	Direct a chart to the date of another one (see ChartCalc.direction_of).
+		
+		>>> natal = Chart(do_calc=False)
+		>>> natal.zoneinfo = 'Europe/Paris'
+		>>> natal.datetime = (1970, 5, 1, 14, 30, 0)
+		>>> later = Chart(do_calc=False)
+		>>> later.dup(natal)
+		>>> later.datetime = (2000, 5, 1, 14, 30, 0)
+		>>> later.direction_of(natal.julday)
+		>>> arc = years_to_arc(swe._years_diff(natal.julday, later.julday))
+		>>> moon = DirectionsTable(natal).directed_longitude('Moon', arc)
+		>>> abs(later.planets.get_data('Moon').longitude - moon) < 1e-3
+		True
+
+	Arcs and years.
+		
+		>>> round(arc_to_years(years_to_arc(42, 'ptolemy'), 'ptolemy'), 9)
+		42.0
+
+"""
+
+from math import asin, degrees, radians, tan
+
+import swisseph as swe
+
+from oroboros.core import roots
+from oroboros.core.planets import planets_registry
+from oroboros.core.aspects import Aspect, aspects_registry
+from oroboros.core.aspectsfilters import AspectsFilter
+
+
+__all__ = ['keys', 'default_key', 'arc_to_years', 'years_to_arc',
+	'Direction', 'DirectionsTable']
+
+
+#: Time keys, in degrees of arc per year
+keys = {
+	'naibod': 0.98564733,
+	'ptolemy': 1.0
+	}
+
+#: Time key used by default (and by directed charts)
+default_key = 'naibod'
+
+#: Days per year, to get dates of directions
+_year = 365.24219
+
+#: Default aspects names
+_dft_aspects = ('Conjunction', 'Opposition', 'Square', 'Trine', 'Sextile')
+
+#: Significators angles, and their mundane positions
+_angles = (('Mc', 0.0), ('Asc', 270.0))
+
+
+def arc_to_years(arc, key=None):
+	"""Return years for an arc of direction.
+	
+	:type arc: numeric
+	:type key: str
+	:rtype: float
+	:raise KeyError: invalid key
+	"""
+	return arc / keys[key if key != None else default_key]
+
+
+def years_to_arc(years, key=None):
+	"""Return arc of direction for years.
+	
+	:type years: numeric
+	:type key: str
+	:rtype: float
+	:raise KeyError: invalid key
+	"""
+	return years * keys[key if key != None else default_key]
+
+
+class Direction(object):
+	"""Direction of a promissor to a significator."""
+	
+	__slots__ = ('_promissor', '_aspect', '_significator', '_arc',
+		'_zodiacal', '_years', '_julday')
+	
+	def _get_promissor(self):
+		"""Get promissor.
+		
+		:rtype: Planet
+		"""
+		return self._promissor
+	
+	def _get_aspect(self):
+		"""Get aspect.
+		
+		:rtype: Aspect
+		"""
+		return self._aspect
+	
+	def _get_significator(self):
+		"""Get significator.
+		
+		:rtype: Planet
+		"""
+		return self._significator
+	
+	def _get_arc(self):
+		"""Get arc of direction (negative for converse directions).
+		
+		:rtype: float
+		"""
+		return self._arc
+	
+	def _get_zodiacal(self):
+		"""Return True for zodiacal directions, False for mundane ones.
+		
+		:rtype: bool
+		"""
+		return self._zodiacal
+	
+	def _get_years(self):
+		"""Get years of life (negative for converse directions).
+		
+		The direction falls abs(years) after the chart date.
+		
+		:rtype: float
+		"""
+		return self._years
+	
+	def _get_julday(self):
+		"""Get Julian day (UT) of direction.
+		
+		:rtype: float
+		"""
+		return self._julday
+	
+	promissor = property(_get_promissor,
+		doc='Promissor.')
+	aspect = property(_get_aspect,
+		doc='Aspect.')
+	significator = property(_get_significator,
+		doc='Significator.')
+	arc = property(_get_arc,
+		doc='Arc of direction.')
+	zodiacal = property(_get_zodiacal,
+		doc='Zodiacal (True) or mundane (False) direction.')
+	years = property(_get_years,
+		doc='Years of life.')
+	julday = property(_get_julday,
+		doc='Julian day.')
+	
+	def __init__(self, promissor, aspect, significator, arc, zodiacal,
+		years, julday):
+		"""Init direction.
+		
+		:type promissor: Planet
+		:type aspect: Aspect
+		:type significator: Planet
+		:type arc: float
+		:type zodiacal: bool
+		:type years: float
+		:type julday: float
+		"""
+		self._promissor = promissor
+		self._aspect = aspect
+		self._significator = significator
+		self._arc = arc
+		self._zodiacal = zodiacal
+		self._years = years
+		self._julday = julday
+	
+	def __repr__(self):
+		return 'Direction(%s, %s, %s, %s, %s)' % (self._promissor._name,
+			self._aspect._name, self._significator._name, self._arc,
+			'zodiacal' if self._zodiacal else 'mundane')
+
+
+class DirectionsTable(object):
+	"""Equatorial positions and semi-arcs of chart points."""
+	
+	__slots__ = ('_chart', '_ramc', '_latitude', '_obliquity', '_bodies',
+		'_points', '_mundane', '_zodiac')
+	
+	def _get_chart(self):
+		"""Get chart.
+		
+		:rtype: ChartCalc
+		"""
+		return self._chart
+	
+	def _get_ramc(self):
+		"""Get right ascension of Mc.
+		
+		:rtype: float
+		"""
+		return self._ramc
+	
+	def _get_latitude(self):
+		"""Get geographic latitude.
+		
+		:rtype: float
+		"""
+		return self._latitude
+	
+	def _get_obliquity(self):
+		"""Get obliquity of the ecliptic.
+		
+		:rtype: float
+		"""
+		return self._obliquity
+	
+	def _get_bodies(self):
+		"""Get bodies (not circumpolar).
+		
+		:rtype: list
+		"""
+		return [x[0] for x in self._bodies]
+	
+	chart = property(_get_chart,
+		doc='Chart.')
+	ramc = property(_get_ramc,
+		doc='Right ascension of Mc.')
+	latitude = property(_get_latitude,
+		doc='Geographic latitude.')
+	obliquity = property(_get_obliquity,
+		doc='Obliquity of the ecliptic.')
+	bodies = property(_get_bodies,
+		doc='Bodies directed.')
+	
+	def __init__(self, chart):
+		"""Precompute positions of chart bodies (but houses).
+		
+		Chart positions are computed if needed.
+		
+		:type chart: ChartCalc
+		"""
+		self._chart = chart
+		chart.calc()
+		self._ramc = chart._houses.get_data('Armc')._longitude
+		self._latitude = float(chart._latitude)
+		self._obliquity = chart._ecl_nut[0]
+		# (planet, point) and mundane positions, by name
+		self._bodies = list()
+		self._points = dict()
+		self._mundane = dict()
+		for pos in chart._planets:
+			if pos._planet._family == 4: # houses
+				continue
+			pt = self.point(pos._longitude, pos._latitude)
+			if pt != None:
+				self._bodies.append((pos._planet, pt))
+				self._points[pos._planet._name] = pt
+				self._mundane[pos._planet._name] = self.mundane(pt)
+		for name, m in _angles:
+			self._mundane[name] = m
+		# zodiacal aspects points, by longitude
+		self._zodiac = dict()
+	
+	def point(self, lon, lat=0.0):
+		"""Return hour angle, diurnal and nocturnal semi-arcs of a point.
+		
+		Return None for circumpolar points.
+		
+		:type lon: float
+		:type lat: float
+		:rtype: tuple or None
+		"""
+		ra, dec = swe.cotrans(lon, lat, 1.0, -self._obliquity)[:2]
+		x = tan(radians(dec)) * tan(radians(self._latitude))
+		if not -1 < x < 1:
+			return None
+		ad = degrees(asin(x))
+		return roots.angle_diff(self._ramc, ra), 90.0 + ad, 90.0 - ad
+	
+	def mundane(self, point, arc=0.0):
+		"""Return mundane position of a point, after a rotation.
+		
+		:type point: tuple
+		:type arc: float
+		:rtype: float
+		"""
+		ha, dsa, nsa = point
+		ha = roots.angle_diff(ha + arc, 0.0)
+		if -dsa <= ha <= dsa:
+			m = 90.0 * ha / dsa
+		elif ha > dsa:
+			m = 90.0 + 90.0 * (ha - dsa) / nsa
+		else:
+			m = -90.0 + 90.0 * (ha + dsa) / nsa
+		return m % 360.0
+	
+	def arc(self, point, m):
+		"""Return arc bringing a point to a mundane position.
+		
+		Arc is in [0;360[, substract 360 for converse motion.
+		
+		:type point: tuple
+		:type m: float
+		:rtype: float
+		"""
+		ha, dsa, nsa = point
+		m = roots.angle_diff(m, 0.0)
+		if -90 <= m <= 90:
+			target = m * dsa / 90.0
+		elif m > 90:
+			target = dsa + (m - 90.0) * nsa / 90.0
+		else:
+			target = -dsa + (m + 90.0) * nsa / 90.0
+		return (target - ha) % 360.0
+	
+	def _zodiac_point(self, lon):
+		"""Return point of the ecliptic, cached.
+		
+		:type lon: float
+		:rtype: tuple or None
+		"""
+		lon = lon % 360.0
+		try:
+			return self._zodiac[lon]
+		except KeyError:
+			pt = self._zodiac[lon] = self.point(lon)
+			return pt
+	
+	def directions(self, years=100, key=None, aspects=None, zodiacal=None,
+		converse=False, promissors=None, significators=None):
+		"""Return directions within some years, sorted by absolute arc.
+		
+		Aspects are given as an aspects filter, or a list of aspects (or
+		names), default are major aspects. Zodiacal is None for both
+		mundane and zodiacal directions. Significators may include angles
+		(Asc, Mc), default is all bodies and angles.
+		
+		Converse directions have negative arcs and years, and are dated
+		abs(years) after the chart date, like direct ones.
+		
+		:type years: numeric
+		:type key: str
+		:type aspects: AspectsFilter or sequence of Aspect or str
+		:type zodiacal: bool or None
+		:type converse: bool
+		:type promissors: sequence of str
+		:type significators: sequence of str
+		:rtype: list of Direction
+		:raise KeyError: invalid key
+		"""
+		max_arc = years_to_arc(years, key)
+		all_asp = aspects_registry()
+		if aspects == None:
+			aspects = _dft_aspects
+		if isinstance(aspects, AspectsFilter):
+			aspects = [x for x in all_asp if aspects.get(x._name, False)]
+		else:
+			aspects = [x if isinstance(x, Aspect) else all_asp[x]
+				for x in aspects]
+		# aspects angles, both sides
+		angles = list()
+		for asp in aspects:
+			a = float(asp._angle)
+			angles.append((asp, a))
+			if a not in (0.0, 180.0):
+				angles.append((asp, -a))
+		all_pl = planets_registry()
+		proms = [x for x in self._bodies if promissors == None
+			or x[0]._name in promissors]
+		if significators == None:
+			significators = [x[0]._name for x in self._bodies] + [
+				x[0] for x in _angles]
+		sigs = [(all_pl[x], self._mundane[x]) for x in significators
+			if x in self._mundane]
+		methods = (False, True) if zodiacal == None else (bool(zodiacal),)
+		found = list()
+		for zod in methods:
+			for prom, pt in proms:
+				lon = self._chart._planets.get_data(prom._name)._longitude
+				for asp, a in angles:
+					if zod:
+						apt = self._zodiac_point(lon + a)
+						if apt == None:
+							continue
+						arcs = [(self.arc(apt, m), sig) for sig, m in sigs
+							if sig._name != prom._name]
+					else:
+						arcs = [(self.arc(pt, m - a), sig) for sig, m in sigs
+							if sig._name != prom._name]
+					for arc, sig in arcs:
+						if arc <= max_arc:
+							found.append((arc, prom, asp, sig, zod))
+						if converse and 360.0 - arc <= max_arc:
+							found.append((arc - 360.0, prom, asp, sig, zod))
+		found.sort(key=lambda x: abs(x[0]))
+		jd = self._chart.julday
+		ret = list()
+		for arc, prom, asp, sig, zod in found:
+			y = arc_to_years(arc, key)
+			# converse directions fall after birth too
+			ret.append(Direction(prom, asp, sig, arc, zod, y,
+				jd + abs(y) * _year))
+		return ret
+	
+	def directed_longitude(self, name, arc):
+		"""Return longitude of the ecliptic point at the mundane position
+		a body reaches after a rotation.
+		
+		:type name: str
+		:type arc: float
+		:rtype: float
+		:raise KeyError: body is circumpolar or not in chart
+		:raise ValueError: ecliptic is circumpolar
+		"""
+		target = self.mundane(self._points[name], arc)
+		def func(lon):
+			pt = self._zodiac_point(lon)
+			if pt == None:
+				raise ValueError('Circumpolar ecliptic point %s.' % lon)
+			return roots.angle_diff(target, self.mundane(pt)), None
+		# mundane positions decrease along the ecliptic, find bracket
+		lon = self._chart._planets.get_data(name)._longitude
+		lon0, f0 = lon, func(lon)[0]
+		for i in xrange(12):
+			lon1 = lon0 + (30.0 if f0 < 0 else -30.0)
+			f1 = func(lon1)[0]
+			if ((f0 > 0) != (f1 > 0) or f1 == 0) and abs(f1 - f0) < 180:
+				return roots.find_root(func, lon0, lon1, f0, f1) % 360.0
+			lon0, f0 = lon1, f1
+		raise ValueError('Cannot direct %s.' % name)
+	
+	def __repr__(self):
+		return 'DirectionsTable(%s)' % repr(self._chart)
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
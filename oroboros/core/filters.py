@@ -30,6 +30,7 @@ from oroboros.core.orbsfilters import OrbsFilter
 from oroboros.core.aspectsrestrictions import AspectsRestrictions
 from oroboros.core.orbsrestrictions import OrbsRestrictions
 from oroboros.core.midpfilters import MidPointsFilter
+from oroboros.core.filtersplans import FilterPlan
 
 
 __all__ = ['Filter', 'FiltersList',
@@ -45,7 +46,9 @@ class Filter(db.Object):
 		'_xcentric', '_calc_midp', '_draw_midp', '_comment',
 		# sub-filters:
 		'_planets', '_aspects', '_orbs', '_asprestr', '_orbrestr',
-		'_midpoints')
+		'_midpoints',
+		# compiled plan:
+		'_plan')
 	
 	def _get_name(self):
 		"""Get filter name.
@@ -86,12 +89,15 @@ class Filter(db.Object):
 		return self._ephe_type
 	
 	def _set_ephe_type(self, ephe='swiss'):
-		"""Set ephemeris type ('swiss', 'jpl', 'moshier').
+		"""Set ephemeris type ('swiss', 'jpl', 'moshier', 'cheby').
+		
+		With 'cheby', ephemeris path is a cache file (see chebycache).
 		
 		:type ephe: str
 		:raise ValueError: invalid ephemeris type
 		"""
-		if ephe not in ('swiss', 'jpl', 'moshier'):
+		self._plan = None
+		if ephe not in ('swiss', 'jpl', 'moshier', 'cheby'):
 			raise ValueError('Invalid ephemeris type %s.' % ephe)
 		self._ephe_type = ephe
 	
@@ -107,6 +113,7 @@ class Filter(db.Object):
 		
 		:type path: str
 		"""
+		self._plan = None
 		self._ephe_path = str(path) # str() till pyswisseph accepts unicode!
 	
 	def _get_hsys(self):
@@ -123,6 +130,7 @@ class Filter(db.Object):
 		
 		:type hsys: str
 		"""
+		self._plan = None
 		if hsys not in 'PKRCBOAEHVXGU':
 			raise ValueError('Invalid house system %s.' % hsys)
 		self._hsys = str(hsys) ## till pyswisseph accepts unicode
@@ -140,6 +148,7 @@ class Filter(db.Object):
 		:type sidmode: int
 		:raise ValueError: invalid sidereal mode
 		"""
+		self._plan = None
 		if sidmode < -1 or sidmode > 255:
 			raise ValueError('Invalid sidereal mode %s.' % sidmode)
 		self._sid_mode = sidmode
@@ -156,6 +165,7 @@ class Filter(db.Object):
 		
 		:type sidt0: numeric
 		"""
+		self._plan = None
 		self._sid_t0 = float(sidt0)
 	
 	def _get_sid_ayan_t0(self):
@@ -170,6 +180,7 @@ class Filter(db.Object):
 		
 		:type ayan_t0: numeric
 		"""
+		self._plan = None
 		self._sid_ayan_t0 = float(ayan_t0)
 	
 	def _get_true_pos(self):
@@ -184,6 +195,7 @@ class Filter(db.Object):
 		
 		:type boolean: bool
 		"""
+		self._plan = None
 		self._true_pos = bool(boolean)
 	
 	def _get_xcentric(self):
@@ -199,6 +211,7 @@ class Filter(db.Object):
 		:type xcentric: str
 		:raise ValueError: invalid mode
 		"""
+		self._plan = None
 		if xcentric not in ('geo', 'topo', 'helio', 'bary'):
 			raise ValueError('Invalid xcentric mode %s.' % xcentric)
 		self._xcentric = xcentric
@@ -215,6 +228,7 @@ class Filter(db.Object):
 		
 		:type boolean: bool
 		"""
+		self._plan = None
 		if boolean in (True, 1, 'True', '1', 'yes'):
 			self._calc_midp = True
 		else:
@@ -265,6 +279,7 @@ class Filter(db.Object):
 		
 		:type filt: PlanetsFilter, str or int
 		"""
+		self._plan = None
 		if not isinstance(filt, PlanetsFilter):
 			self._planets = PlanetsFilter(filt)
 		else:
@@ -282,6 +297,7 @@ class Filter(db.Object):
 		
 		:type filt: AspectsFilter, str or int
 		"""
+		self._plan = None
 		if not isinstance(filt, AspectsFilter):
 			self._aspects = AspectsFilter(filt)
 		else:
@@ -299,6 +315,7 @@ class Filter(db.Object):
 		
 		:type filt: OrbsFilter, str or int
 		"""
+		self._plan = None
 		if not isinstance(filt, OrbsFilter):
 			self._orbs = OrbsFilter(filt)
 		else:
@@ -316,6 +333,7 @@ class Filter(db.Object):
 		
 		:type filt: AspectsRestrictions, str or int
 		"""
+		self._plan = None
 		if not isinstance(filt, AspectsRestrictions):
 			self._asprestr = AspectsRestrictions(filt)
 		else:
@@ -333,6 +351,7 @@ class Filter(db.Object):
 		
 		:type filt: OrbsRestrictions, str or int
 		"""
+		self._plan = None
 		if not isinstance(filt, OrbsRestrictions):
 			self._orbrestr = OrbsRestrictions(filt)
 		else:
@@ -350,6 +369,7 @@ class Filter(db.Object):
 		
 		:type filt: MidPointsFilter, str or int
 		"""
+		self._plan = None
 		if not isinstance(filt, MidPointsFilter):
 			self._midpoints = MidPointsFilter(filt)
 		else:
@@ -362,9 +382,9 @@ class Filter(db.Object):
 	bg_color = property(_get_bg_color, _set_bg_color,
 		doc='Background color (black|white).')
 	ephe_type = property(_get_ephe_type, _set_ephe_type,
-		doc='Ephemeris type (swiss|jpl|moshier).')
+		doc='Ephemeris type (swiss|jpl|moshier|cheby).')
 	ephe_path = property(_get_ephe_path, _set_ephe_path,
-		doc='Ephemeris directory/files path.')
+		doc='Ephemeris directory/files (or cache file) path.')
 	hsys = property(_get_hsys, _set_hsys,
 		doc='House system (PKORCAEVXHTBG). See swisseph docs.')
 	sid_mode = property(_get_sid_mode, _set_sid_mode,
@@ -449,6 +469,7 @@ class Filter(db.Object):
 		:type filt: str or int
 		:type set_default: bool
 		"""
+		self._plan = None
 		if filt != None:
 			return self._select(filt)
 		if set_default:
@@ -466,6 +487,7 @@ class Filter(db.Object):
 		Filter may have been deleted, then load the default one.
 		
 		"""
+		self._plan = None
 		try:
 			self._select_by_idx(self._idx_)
 		except ValueError: # filter deleted
@@ -604,8 +626,8 @@ class Filter(db.Object):
 		flag = 0
 		# speed
 		flag += swe.FLG_SPEED
-		# ephemeris type
-		if self._ephe_type == 'swiss':
+		# ephemeris type (cache falls back to its own ephemeris)
+		if self._ephe_type in ('swiss', 'cheby'):
 			flag += swe.FLG_SWIEPH
 		elif self._ephe_type == 'jpl':
 			flag += swe.FLG_JPLEPH
@@ -626,6 +648,18 @@ class Filter(db.Object):
 			flag += swe.FLG_BARYCTR
 		return flag
 	
+	def compile(self):
+		"""Return the compiled filter, for calculations.
+		
+		The plan is cached until the filter, one of its sub-filters, or a
+		planet or aspect definition is modified.
+		
+		:rtype: filtersplans.FilterPlan
+		"""
+		if self._plan == None or not self._plan.is_current():
+			self._plan = FilterPlan(self)
+		return self._plan
+	
 	def __iter__(self):
 		"""Iterate over filter internals.
 		
@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compiled filters (calculation plans).
+
+A plan is an immutable snapshot of a filter, resolved into plain values:
+enabled bodies and aspects, aspects angles, orbs as floats for all pairs
+of bodies and the swisseph calculation flag. Calculations use it instead
+of reading the filters (Decimal orbs, orbs modifiers strings) again and
+again.
+
+Plans are built and cached by Filter.compile(). They are outdated as soon
+as a filter, a sub-filter or a definition is modified (see db.touch()).
+	
+	Compile a filter.
+		
+		>>> from oroboros.core.filters import Filter
+		>>> f = Filter()
+		>>> plan = f.compile()
+		>>> plan is f.compile()
+		True
+		>>> 'Sun' in plan.bodies
+		True
+		>>> plan.calcflag == f.get_calcflag()
+		True
+	
+	Modify the filter.
+		
+		>>> f._orbs['Conjunction'] = 3
+		>>> plan.is_current()
+		False
+		>>> plan is f.compile()
+		False
+
+"""
+
+from decimal import Decimal
+
+from oroboros.core import db
+from oroboros.core import aspectsengine
+from oroboros.core import fixstars
+from oroboros.core.planets import planets_registry
+from oroboros.core.aspects import aspects_registry
+
+
+__all__ = ['FilterPlan', 'MidPointsPlan']
+
+
+class FilterPlan(object):
+	"""Compiled filter, for chart calculations."""
+	
+	__slots__ = ('_revision', '_calcflag', '_hsys', '_ephemeris', '_sidereal',
+		'_registries', '_bodies', '_index', '_aspects', '_angles', '_orbs',
+		'_orbmods', '_aspected', '_matrix', '_midpoints')
+	
+	def _get_revision(self):
+		"""Get database objects revision at compile time.
+		
+		:rtype: int
+		"""
+		return self._revision
+	
+	def _get_calcflag(self):
+		"""Get swisseph calculation flag.
+		
+		:rtype: int
+		"""
+		return self._calcflag
+	
+	def _get_hsys(self):
+		"""Get house system.
+		
+		:rtype: str
+		"""
+		return self._hsys
+	
+	def _get_ephemeris(self):
+		"""Get ephemeris type and path.
+		
+		:rtype: tuple
+		"""
+		return self._ephemeris
+	
+	def _get_sidereal(self):
+		"""Get sidereal mode, t0 and ayanamsa at t0.
+		
+		:rtype: tuple
+		"""
+		return self._sidereal
+	
+	def _get_registries(self):
+		"""Get planets and aspects registries used at compile time.
+		
+		:rtype: tuple
+		"""
+		return self._registries
+	
+	def _get_bodies(self):
+		"""Get names of enabled bodies, by ranking.
+		
+		:rtype: tuple
+		"""
+		return self._bodies
+	
+	def _get_aspects(self):
+		"""Get names of enabled aspects, by ranking.
+		
+		:rtype: tuple
+		"""
+		return self._aspects
+	
+	def _get_angles(self):
+		"""Get enabled aspects angles.
+		
+		:rtype: tuple of float
+		"""
+		return self._angles
+	
+	def _get_orbs(self):
+		"""Get enabled aspects base orbs.
+		
+		:rtype: tuple of Decimal
+		"""
+		return self._orbs
+	
+	def _get_matrix(self):
+		"""Get orbs matrix for enabled bodies.
+		
+		:see: aspectsengine.orbs_matrix()
+		
+		:rtype: list
+		"""
+		return self._matrix
+	
+	def _get_midpoints(self):
+		"""Get mid-points plan.
+		
+		:rtype: MidPointsPlan
+		"""
+		return self._midpoints
+	
+	revision = property(_get_revision,
+		doc='Database objects revision.')
+	calcflag = property(_get_calcflag,
+		doc='Swisseph calculation flag.')
+	hsys = property(_get_hsys,
+		doc='House system.')
+	ephemeris = property(_get_ephemeris,
+		doc='Ephemeris type and path.')
+	sidereal = property(_get_sidereal,
+		doc='Sidereal mode settings.')
+	registries = property(_get_registries,
+		doc='Planets and aspects registries.')
+	bodies = property(_get_bodies,
+		doc='Enabled bodies names.')
+	aspects = property(_get_aspects,
+		doc='Enabled aspects names.')
+	angles = property(_get_angles,
+		doc='Enabled aspects angles.')
+	orbs = property(_get_orbs,
+		doc='Enabled aspects base orbs.')
+	matrix = property(_get_matrix,
+		doc='Orbs for all pairs of enabled bodies.')
+	midpoints = property(_get_midpoints,
+		doc='Mid-points plan.')
+	
+	def __init__(self, filt):
+		"""Compile a filter.
+		
+		:type filt: filters.Filter
+		"""
+		self._revision = db.revision()
+		self._calcflag = filt.get_calcflag()
+		self._hsys = filt._hsys
+		self._ephemeris = (filt._ephe_type, filt._ephe_path)
+		self._sidereal = (filt._sid_mode, filt._sid_t0, filt._sid_ayan_t0)
+		all_pl = planets_registry()
+		all_asp = aspects_registry()
+		self._registries = (all_pl, all_asp)
+		self._bodies = tuple(x._name for x in all_pl
+			if filt._planets._dict_.get(x._name, False))
+		self._index = dict((x, i) for i, x in enumerate(self._bodies))
+		fixstars.preload(x for x in self._bodies if all_pl[x]._family == 2)
+		self._aspects = tuple(x._name for x in all_asp
+			if filt._aspects._dict_.get(x._name, False))
+		self._angles = tuple(float(all_asp[x]._angle) for x in self._aspects)
+		self._orbs = tuple(filt._orbs[x] for x in self._aspects)
+		self._orbmods = dict(filt._orbrestr._dict_)
+		self._aspected = frozenset(x for x, y in filt._asprestr.items() if y)
+		mods = [self.modifier(x) for x in self._bodies]
+		self._matrix = aspectsengine.orbs_matrix(self._orbs, mods, mods)
+		self._midpoints = MidPointsPlan(filt._midpoints, all_pl, all_asp)
+	
+	def is_current(self):
+		"""Return True if nothing has been modified since compilation.
+		
+		:rtype: bool
+		"""
+		return self._revision == db.revision()
+	
+	def is_aspected(self, name):
+		"""Return True if body can make aspects (aspects restrictions).
+		
+		:type name: str
+		:rtype: bool
+		"""
+		return name in self._aspected
+	
+	def orbmod(self, name):
+		"""Return body orb modifier (orbs restrictions).
+		
+		:type name: str
+		:rtype: OrbModifier
+		:raise KeyError: unknown body
+		"""
+		return self._orbmods[name]
+	
+	def modifier(self, name):
+		"""Return body orb modifier, or None if body is not aspected.
+		
+		:type name: str
+		:rtype: OrbModifier or None
+		"""
+		if name not in self._aspected:
+			return None
+		return self._orbmods[name]
+	
+	def orbs_for(self, names1, names2=None):
+		"""Return the orbs matrix for some bodies (default names2 = names1).
+		
+		Rows and columns are taken from the compiled matrix. Bodies not
+		enabled in the filter (computed elsewhere) have their orbs resolved
+		on the fly.
+		
+		:type names1: sequence of str
+		:type names2: sequence of str
+		:rtype: list
+		"""
+		if names2 == None:
+			names2 = names1
+		idx = self._index
+		try:
+			rows = [idx[x] for x in names1]
+			cols = [idx[x] for x in names2]
+		except KeyError:
+			return aspectsengine.orbs_matrix(self._orbs,
+				[self.modifier(x) for x in names1],
+				[self.modifier(x) for x in names2])
+		mat = self._matrix
+		return [[mat[r][c] for c in cols] for r in rows]
+	
+	def __repr__(self):
+		return 'FilterPlan(%s bodies, %s aspects, flag %s)' % (
+			len(self._bodies), len(self._aspects), self._calcflag)
+
+
+class MidPointsPlan(object):
+	"""Compiled mid-points filter."""
+	
+	__slots__ = ('_bodies', '_targets', '_index', '_aspects', '_angles',
+		'_orbs', '_orbmods', '_rows')
+	
+	def _get_bodies(self):
+		"""Get names of bodies used for mid-points, by ranking.
+		
+		:rtype: tuple
+		"""
+		return self._bodies
+	
+	def _get_targets(self):
+		"""Get names of bodies aspecting mid-points, by ranking.
+		
+		:rtype: tuple
+		"""
+		return self._targets
+	
+	def _get_aspects(self):
+		"""Get names of enabled aspects, by ranking.
+		
+		:rtype: tuple
+		"""
+		return self._aspects
+	
+	def _get_angles(self):
+		"""Get enabled aspects angles.
+		
+		:rtype: tuple of float
+		"""
+		return self._angles
+	
+	def _get_orbs(self):
+		"""Get enabled aspects base orbs.
+		
+		:rtype: tuple of Decimal
+		"""
+		return self._orbs
+	
+	bodies = property(_get_bodies,
+		doc='Mid-points bodies names.')
+	targets = property(_get_targets,
+		doc='Bodies aspecting mid-points names.')
+	aspects = property(_get_aspects,
+		doc='Enabled aspects names.')
+	angles = property(_get_angles,
+		doc='Enabled aspects angles.')
+	orbs = property(_get_orbs,
+		doc='Enabled aspects base orbs.')
+	
+	def __init__(self, filt, all_pl, all_asp):
+		"""Compile a mid-points filter.
+		
+		:type filt: midpfilters.MidPointsFilter
+		:type all_pl: planets.PlanetsList
+		:type all_asp: aspects.AspectsList
+		"""
+		self._bodies = tuple(x._name for x in all_pl
+			if filt._planets._dict_.get(x._name, False))
+		fixstars.preload(x for x in self._bodies if all_pl[x]._family == 2)
+		self._targets = tuple(x for x in self._bodies
+			if filt._asprestr._dict_.get(x, False))
+		self._index = dict((x, i) for i, x in enumerate(self._targets))
+		self._aspects = tuple(x._name for x in all_asp
+			if filt._aspects._dict_.get(x._name, False))
+		self._angles = tuple(float(all_asp[x]._angle) for x in self._aspects)
+		self._orbs = tuple(filt._orbs[x] for x in self._aspects)
+		self._orbmods = dict(filt._orbrestr._dict_)
+		self._rows = tuple(self._resolve(x) for x in self._targets)
+	
+	def _resolve(self, name):
+		"""Compute orbs of a body aspecting mid-points.
+		
+		Mid-points have no orb modifier, thus only half of the body
+		modifier is applied.
+		
+		:type name: str
+		:rtype: tuple of float
+		"""
+		mod = self._orbmods[name]
+		ret = list()
+		for orb in self._orbs:
+			orb = orb + mod.get_absolute(orb) / Decimal('2')
+			if orb < 0:
+				ret.append(-1.0)
+			else:
+				ret.append(float(orb))
+		return tuple(ret)
+	
+	def orbs_for(self, name):
+		"""Return orbs of a body aspecting mid-points, for enabled aspects.
+		
+		Negative orbs are set to -1.
+		
+		:type name: str
+		:rtype: tuple of float
+		:raise KeyError: unknown body
+		"""
+		try:
+			return self._rows[self._index[name]]
+		except KeyError:
+			return self._resolve(name)
+	
+	def __repr__(self):
+		return 'MidPointsPlan(%s bodies, %s aspects)' % (len(self._bodies),
+			len(self._aspects))
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Fixed stars calculations.
+
+Swisseph writes the complete star name (traditional name and
+nomenclature) back into the star name it is given. Passing names as read
+from the database (unicode objects, whose encoded buffers are shared)
+overflowed these buffers, and the database connection had to be closed
+during calculations.
+
+Here star names are resolved once to plain strings, and each calculation
+gets its own buffer, large enough for swisseph to write into. The
+database connection is never involved.
+	
+	Resolve star names up front (optional).
+		
+		>>> preload([u'Aldebaran', u'Regulus'])
+		>>> resolve(u'Aldebaran')
+		'Aldebaran'
+
+"""
+
+import swisseph as swe
+
+
+__all__ = ['resolve', 'preload', 'calc_ut']
+
+
+#: Size of stars names buffers (swisseph writes up to twice SE_MAX_STNAME)
+_bufsize = 2 * 256 + 2
+
+#: Resolved stars names
+_names = dict()
+
+
+def resolve(name):
+	"""Return star name as a plain string, suitable for swisseph.
+	
+	:type name: str or unicode
+	:rtype: str
+	"""
+	try:
+		return _names[name]
+	except KeyError:
+		if isinstance(name, unicode): ## not py3
+			_names[name] = name.encode('utf-8')
+		else:
+			_names[name] = str(name)
+		return _names[name]
+
+
+def preload(names):
+	"""Resolve stars names before calculations.
+	
+	:type names: sequence of str
+	"""
+	for name in names:
+		resolve(name)
+
+
+def calc_ut(name, jd, flag):
+	"""Return fixed star calculations results.
+	
+	Swisseph ignores whitespace in stars names, so the name is padded to
+	get a private buffer.
+	
+	:type name: str or unicode
+	:type jd: numeric
+	:type flag: int
+	:rtype: tuple
+	"""
+	return swe.fixstar_ut(resolve(name).ljust(_bufsize), jd, flag)
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
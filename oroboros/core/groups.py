@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Comparison of a group of charts, all against all.
+
+Positions of all members (their calculated planets) are stacked in
+arrays, one row of bodies by member. Inter-aspects of all pairs of
+members are found in bulk: for each body, members are sorted by
+longitude, and the members within orb of each aspect are found by binary
+search. Orbs follow the inter-aspects rules of bi-charts, with the group
+filter for both charts.
+
+Results are generated one by one as tuples, or summed up in arrays
+(scores of pairs), so that large groups do not fill memory with results
+objects.
+	
+	Compare three charts.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> charts = list()
+		>>> for y in (1970, 1975, 1980):
+		...     cht = Chart(do_calc=False)
+		...     cht.datetime = (y, 6, 1, 12, 0, 0)
+		...     cht.calc()
+		...     charts.append(cht)
+		>>> group = GroupChart(charts)
+		>>> found = list(group.iteraspects())
+		>>> len([x for x in found if x[:2] == (0, 1)]) == len(
+		...     group.interaspects(0, 1))
+		True
+		>>> score, i, j = group.top_pairs(1)[0]
+		>>> score == max(group.scores())
+		True
+
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+
+import swisseph as swe
+
+from oroboros.core import aspectsengine
+from oroboros.core.filters import Filter
+from oroboros.core.aspects import aspects_registry
+from oroboros.core.aspectsresults import AspectDataList
+
+
+__all__ = ['GroupChart']
+
+
+#: Missing position
+_nan = float('nan')
+
+
+class GroupChart(object):
+	"""Charts of a group, compared all against all."""
+	
+	__slots__ = ('_members', '_filter', '_bodies', '_lons', '_speeds',
+		'_orbs', '__weakref__')
+	
+	def _get_members(self):
+		"""Get group charts.
+		
+		:rtype: tuple of ChartCalc
+		"""
+		return self._members
+	
+	def _get_filter(self):
+		"""Get filter for aspects and orbs.
+		
+		:rtype: Filter
+		"""
+		return self._filter
+	
+	def _get_bodies(self):
+		"""Get names of bodies compared (columns of positions).
+		
+		:rtype: tuple of str
+		"""
+		if self._lons == None:
+			self._stack()
+		return self._bodies
+	
+	members = property(_get_members,
+		doc='Group charts.')
+	filter = property(_get_filter,
+		doc='Filter for aspects and orbs.')
+	bodies = property(_get_bodies,
+		doc='Names of bodies compared.')
+	
+	def __init__(self, charts, filt=None):
+		"""Init group (positions are stacked when needed).
+		
+		The filter gives aspects, orbs and restrictions for all pairs,
+		default is the first chart filter. Positions are the ones
+		calculated for each chart.
+		
+		:type charts: sequence of ChartCalc
+		:type filt: Filter, str, int or None
+		"""
+		self._members = tuple(charts)
+		if filt == None:
+			if self._members:
+				filt = self._members[0]._filter
+			else:
+				filt = Filter()
+		elif not isinstance(filt, Filter):
+			filt = Filter(filt)
+		self._filter = filt
+		self._lons = None
+		self._speeds = None
+		self._orbs = None
+		for cht in self._members:
+			cht.subscribe(self)
+	
+	def __len__(self):
+		return len(self._members)
+	
+	def __getitem__(self, idx):
+		return self._members[idx]
+	
+	def __iter__(self):
+		return iter(self._members)
+	
+	def chart_changed(self, chart, names):
+		"""Drop positions when a member planets change.
+		
+		Called by charts (see ChartCalc.subscribe).
+		
+		:type chart: ChartCalc
+		:type names: tuple of str
+		"""
+		if 'planets' in names:
+			self._lons = None
+			self._speeds = None
+	
+	def _stack(self):
+		"""Stack members positions.
+		
+		Bodies are all bodies found in members planets, in order of
+		appearance. Bodies missing for a member have NaN positions.
+		"""
+		bodies = list()
+		index = dict()
+		rows = list()
+		for cht in self._members:
+			row = dict()
+			for pos in cht.planets:
+				name = pos._planet._name
+				if name not in index:
+					index[name] = len(bodies)
+					bodies.append(name)
+				row.setdefault(index[name], (pos._longitude, pos._lonspeed))
+			rows.append(row)
+		nb = len(bodies)
+		lons = array('d', [_nan]) * (nb * len(rows))
+		speeds = array('d', [_nan]) * (nb * len(rows))
+		for m, row in enumerate(rows):
+			for b, (lon, speed) in row.items():
+				lons[m * nb + b] = lon
+				speeds[m * nb + b] = speed
+		self._bodies = tuple(bodies)
+		self._lons = lons
+		self._speeds = speeds
+	
+	def positions(self):
+		"""Return stacked longitudes and longitude speeds.
+		
+		Member m, body b is at index m * len(bodies) + b.
+		
+		:rtype: tuple of array
+		"""
+		if self._lons == None:
+			self._stack()
+		return self._lons, self._speeds
+	
+	def _get_orbs(self):
+		"""Get aspects, angles, and orbs matrix of bodies.
+		
+		Kept until filter or bodies change.
+		
+		:see: BiChart._interaspects_orbs()
+		
+		:rtype: tuple
+		"""
+		plan = self._filter.compile()
+		bodies = self._get_bodies()
+		if (self._orbs != None and self._orbs[0] is plan
+			and self._orbs[1] == bodies):
+			return self._orbs[2:]
+		all_asp = aspects_registry()
+		asps = [all_asp[x] for x in plan.aspects]
+		angles = [float(x._angle) for x in asps]
+		# same filter for both charts, mean orbs are the filter orbs
+		mods = [plan.modifier(x) for x in bodies]
+		orbs = aspectsengine.orbs_matrix(plan.orbs, mods, mods)
+		self._orbs = (plan, bodies, asps, angles, orbs)
+		return asps, angles, orbs
+	
+	def interaspects(self, i, j):
+		"""Return inter-aspects of two members.
+		
+		Same results as a bi-chart of both members, with group filter.
+		
+		:type i: int
+		:type j: int
+		:rtype: AspectDataList
+		"""
+		asps, angles, orbs = self._get_orbs()
+		bodies = self._get_bodies()
+		pl1 = self._members[i].planets
+		pl2 = self._members[j].planets
+		idx1 = [bodies.index(x._planet._name) for x in pl1]
+		idx2 = [bodies.index(x._planet._name) for x in pl2]
+		orbs = [[orbs[b1][b2] for b2 in idx2] for b1 in idx1]
+		res = AspectDataList()
+		found = aspectsengine.match(
+			pl1.column('longitude'), pl1.column('lonspeed'),
+			pl2.column('longitude'), pl2.column('lonspeed'),
+			angles, orbs, aspectsengine.rectangle(len(pl1), len(pl2)))
+		for x, y, k, diff, apply, factor in found:
+			res.feed(pl1[x], pl2[y], asps[k], diff, apply, factor)
+		return res
+	
+	def iteraspects(self):
+		"""Generate inter-aspects of all pairs of members.
+		
+		Yield (i, j, body1, body2, aspect, diff, apply, factor) tuples,
+		with member i < member j, body1 of member i, body2 of member j
+		(indexes in bodies), aspect index in filter aspects. Diff, apply
+		and factor are the swisseph.match_aspect2 results.
+		
+		Results are ordered by bodies, then members, then aspects.
+		
+		:rtype: generator
+		"""
+		lons, speeds = self.positions()
+		asps, angles, orbs = self._get_orbs()
+		n = len(self._members)
+		nb = len(self._bodies)
+		# members sorted by longitude, for each body
+		dials = list()
+		for b in xrange(nb):
+			order = [m for m in xrange(n)
+				if lons[m * nb + b] == lons[m * nb + b]] # not nan
+			order.sort(key=lambda m: lons[m * nb + b])
+			dials.append((order, [lons[m * nb + b] for m in order]))
+		windows = aspectsengine._windows
+		epsilon = aspectsengine._epsilon
+		match_aspect = swe._match_aspect2
+		for b1 in xrange(nb):
+			for b2 in xrange(nb):
+				cell = orbs[b1][b2]
+				if cell == None: # not aspected
+					continue
+				order, dial = dials[b2]
+				found = set()
+				for k, orb in enumerate(cell):
+					if orb < 0:
+						continue
+					angle = angles[k]
+					for i in dials[b1][0]:
+						lon1 = lons[i * nb + b1]
+						for center in (lon1 + angle, lon1 - angle):
+							for lo, hi in windows(center, orb + epsilon):
+								for x in xrange(bisect_left(dial, lo),
+									bisect_right(dial, hi)):
+									if order[x] > i:
+										found.add((i, order[x], k))
+				for i, j, k in sorted(found):
+					x = i * nb + b1
+					y = j * nb + b2
+					diff, apply, factor = match_aspect(lons[x], speeds[x],
+						lons[y], speeds[y], angles[k], cell[k])
+					if diff != None:
+						yield i, j, b1, b2, k, diff, apply, factor
+	
+	def tensor(self):
+		"""Return inter-aspects of all pairs of members, as arrays.
+		
+		Arrays are members i and j, bodies, aspects (indexes), diffs,
+		apply flags (1 applying, 0 separating, -1 stable) and factors, of
+		all results of iteraspects().
+		
+		:rtype: tuple of array
+		"""
+		ret = (array('i'), array('i'), array('i'), array('i'), array('i'),
+			array('d'), array('b'), array('d'))
+		flags = {True: 1, False: 0, None: -1}
+		for res in self.iteraspects():
+			for i, v in enumerate(res):
+				if i == 6:
+					v = flags[v]
+				ret[i].append(v)
+		return ret
+	
+	def _weights(self, weights):
+		"""Return weights by aspect index.
+		
+		:type weights: dict or None
+		:rtype: list of float
+		"""
+		asps = self._get_orbs()[0]
+		if weights == None:
+			return [1.0] * len(asps)
+		return [float(weights.get(x._name, 0.0)) for x in asps]
+	
+	def scores(self, weights=None):
+		"""Return scores of all pairs of members.
+		
+		An inter-aspect scores its aspect weight multiplied by its
+		precision (1 - factor). Weights are given by aspect name (missing
+		aspects score 0), default is 1 for all aspects.
+		
+		Score of members i and j is at index i * len(members) + j (and
+		j * len(members) + i).
+		
+		:type weights: dict or None
+		:rtype: array
+		"""
+		n = len(self._members)
+		w = self._weights(weights)
+		ret = array('d', [0.0]) * (n * n)
+		for i, j, b1, b2, k, diff, apply, factor in self.iteraspects():
+			v = w[k] * (1.0 - factor)
+			ret[i * n + j] += v
+			ret[j * n + i] += v
+		return ret
+	
+	def top_pairs(self, num, weights=None):
+		"""Return best scoring pairs of members.
+		
+		:see: scores()
+		
+		:type num: int
+		:type weights: dict or None
+		:rtype: list of (score, i, j) tuples
+		"""
+		n = len(self._members)
+		scores = self.scores(weights)
+		return heapq.nlargest(num, ((scores[i * n + j], i, j)
+			for i in xrange(n - 1) for j in xrange(i + 1, n)))
+	
+	def top_aspects(self, num):
+		"""Return most exact inter-aspects of all pairs of members.
+		
+		:see: iteraspects()
+		
+		:type num: int
+		:rtype: list of tuples
+		"""
+		return heapq.nsmallest(num, self.iteraspects(), key=lambda x: x[5])
+	
+	def __repr__(self):
+		return 'GroupChart(%s)' % ', '.join([repr(x) for x in self._members])
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -92,6 +92,7 @@ class OrbsFilter(db.Object):
 		
 		:type res: sequence
 		"""
+		db.touch()
 		self._dict_.clear()
 		for x, y in res:
 			self._dict_[x] = Orb(y)
@@ -285,6 +286,7 @@ class OrbsFilter(db.Object):
 		for asp in self._dict_.iterkeys():
 			if asp == key:
 				self._dict_[asp] = Orb(value)
+				db.touch()
 				return
 		raise KeyError(key)
 	
@@ -72,6 +72,7 @@ class OrbsRestrictions(db.Object):
 	
 	def _set_dict(self, res):
 		"""Set internal dict of planets (with db result rows)."""
+		db.touch()
 		self._dict_.clear()
 		for x, y in res:
 			self._dict_[x] = OrbModifier(y)
@@ -261,6 +262,7 @@ class OrbsRestrictions(db.Object):
 		for plt in self._dict_:
 			if plt == key:
 				self._dict_[plt] = OrbModifier(value)
+				db.touch()
 				return
 		raise KeyError(key)
 	
@@ -40,18 +40,32 @@ Oroboros planets, asteroids, cusps, parts, etc.
 
 """
 
+from array import array
+
 import swisseph as swe
 
 from oroboros.core import db
 from oroboros.core.orbs import OrbModifier
 import oroboros.core.parts
+import oroboros.core.fixstars
+import oroboros.core.chebycache
 
 
-__all__ = ['Planet', 'PlanetsList',
+__all__ = ['Planet', 'PlanetsList', 'PlanetsRegistry',
 	'all_planets', 'all_planets_names',
+	'planets_registry', 'clear_planets_registry',
+	'PositionsSeries', 'calc_series',
 	'xml_export_planets', 'xml_import_planets']
 
 
+#: Inverted objects: swisseph num of the calculated body
+_inverted = {-2: 10, -3: 11, -4: 12, -5: 13}
+
+
+#: Shared planets definitions (see planets_registry())
+_registry = None
+
+
 
 class Planet(db.Object):
 	"""Planet(-like) object type.
@@ -342,6 +356,8 @@ class Planet(db.Object):
 			self._insert()
 		else:
 			self._update()
+		clear_planets_registry()
+		db.touch()
 	
 	def _insert(self):
 		"""Insert planet in database.
@@ -387,6 +403,8 @@ class Planet(db.Object):
 		sql = "delete from Planets where _idx = ?;"
 		db.execute(sql, (self._idx_,))
 		self._idx_ = None
+		clear_planets_registry()
+		db.touch()
 	
 	def __iter__(self):
 		"""Return iterator over planet properties (including planet type).
@@ -471,12 +489,27 @@ class Planet(db.Object):
 		
 		Houses cusps are calculated in block (see chartcalc).
 		Parts require that you pass the chart object.
+		Bodies found in the ephemeris cache are interpolated (see
+		chebycache).
 		
 		:type jd: numeric
 		:type flag: int
 		:type chart: ChartCalc
 		:raise ValueError: invalid planet (houses)
 		"""
+		cache = oroboros.core.chebycache.active()
+		if cache != None and self._family in (0, 1, 3):
+			r = cache.calc_ut(jd, self._num, flag)
+			if r != None:
+				return r
+			flag = cache.fallback_flag(flag)
+		return self._calc_ut(jd, flag, chart)
+	
+	def _calc_ut(self, jd, flag, chart=None):
+		"""Return calculations results, computed by swisseph.
+		
+		:see: calc_ut()
+		"""
 		if self._family == 4:
 			raise ValueError('Cannot calculate houses.')
 		# "inverted objects". Should invert latitude too??
@@ -501,7 +534,7 @@ class Planet(db.Object):
 			return swe.calc_ut(jd, self._num, flag)
 		# fixed stars
 		elif self._family == 2:
-			return swe.fixstar_ut(self._name, jd, flag)
+			return oroboros.core.fixstars.calc_ut(self._name, jd, flag)
 		# parts
 		elif self._family == 5:
 			return oroboros.core.parts.calc_ut(self._name, chart)
@@ -538,6 +571,82 @@ class PlanetsList(list):
 		raise KeyError(num)
 
 
+class PlanetsRegistry(PlanetsList):
+	"""All planets definitions, indexed by name, swisseph num and db idx.
+	
+	Planets are shared by all calculations results: they must not be
+	modified (use Planet objects to edit definitions).
+	
+	"""
+	
+	def __init__(self):
+		"""Load all planets definitions, by ranking."""
+		PlanetsList.__init__(self)
+		sql = "select * from Planets order by ranking;"
+		for row in db.execute(sql).fetchall():
+			self.append(Planet())
+			self[-1].set(*row)
+		self._names = dict((p._name, p) for p in self)
+		self._nums = dict((p._num, p) for p in self)
+		self._idxs = dict((p._idx_, p) for p in self)
+	
+	def __getitem__(self, item):
+		"""Return planet by position in list, or by name.
+		
+		:type item: int or str
+		:rtype: Planet
+		:raise KeyError: planet not found
+		"""
+		if isinstance(item, int):
+			return list.__getitem__(self, item)
+		return self._names[item]
+	
+	def __contains__(self, item):
+		"""Return True if a planet name is registered.
+		
+		:type item: str
+		:rtype: bool
+		"""
+		return item in self._names
+	
+	def get_idx(self, idx):
+		"""Return planet by database index.
+		
+		:type idx: int
+		:rtype: Planet
+		:raise KeyError: planet not found
+		"""
+		return self._idxs[idx]
+	
+	def get_num(self, num):
+		"""Return planet by swisseph num.
+		
+		:type num: int
+		:rtype: Planet
+		:raise KeyError: planet not found
+		"""
+		return self._nums[num]
+
+
+def planets_registry():
+	"""Return shared planets definitions, loaded once.
+	
+	Registry is cleared when a planet is saved or deleted.
+	
+	:rtype: PlanetsRegistry
+	"""
+	global _registry
+	if _registry == None:
+		_registry = PlanetsRegistry()
+	return _registry
+
+
+def clear_planets_registry():
+	"""Forget shared planets definitions (reload them when needed)."""
+	global _registry
+	_registry = None
+
+
 def all_planets():
 	"""Return a list of all planet objects.
 	
@@ -565,6 +674,181 @@ def all_planets_names():
 	return ret
 
 
+class PositionsSeries(object):
+	"""Positions of bodies for a range of Julian days.
+	
+	Results are stored in a flat array of floats, indexed by time, body,
+	then the six swisseph values (shape n_times * n_bodies * 6).
+	
+	"""
+	
+	__slots__ = ('_jds', '_bodies', '_data')
+	
+	def _get_jds(self):
+		"""Get Julian days.
+		
+		:rtype: array
+		"""
+		return self._jds
+	
+	def _get_bodies(self):
+		"""Get calculated bodies.
+		
+		:rtype: tuple of Planet
+		"""
+		return self._bodies
+	
+	def _get_data(self):
+		"""Get positions array.
+		
+		:rtype: array
+		"""
+		return self._data
+	
+	def _get_shape(self):
+		"""Get dimensions of positions array.
+		
+		:rtype: tuple
+		"""
+		return (len(self._jds), len(self._bodies), 6)
+	
+	jds = property(_get_jds,
+		doc='Julian days.')
+	bodies = property(_get_bodies,
+		doc='Calculated bodies.')
+	data = property(_get_data,
+		doc='Positions (flat array).')
+	shape = property(_get_shape,
+		doc='Dimensions (times, bodies, values).')
+	
+	def __init__(self, jds, bodies, data):
+		"""Init positions series.
+		
+		:type jds: array
+		:type bodies: sequence of Planet
+		:type data: array
+		:raise ValueError: invalid data length
+		"""
+		if len(data) != len(jds) * len(bodies) * 6:
+			raise ValueError('Invalid series length %s.' % len(data))
+		self._jds = jds
+		self._bodies = tuple(bodies)
+		self._data = data
+	
+	def __len__(self):
+		"""Return number of Julian days.
+		
+		:rtype: int
+		"""
+		return len(self._jds)
+	
+	def __getitem__(self, item):
+		"""Return a value (time, body, value) or a position (time, body).
+		
+		:type item: tuple
+		:rtype: float or tuple
+		"""
+		if len(item) == 3:
+			t, b, k = item
+			return self._data[(t * len(self._bodies) + b) * 6 + k]
+		t, b = item
+		i = (t * len(self._bodies) + b) * 6
+		return tuple(self._data[i:i+6])
+	
+	def index(self, body):
+		"""Return index of a body.
+		
+		:type body: Planet or str
+		:rtype: int
+		:raise ValueError: body not calculated
+		"""
+		for i, p in enumerate(self._bodies):
+			if p is body or p._name == body:
+				return i
+		raise ValueError('Invalid body %s.' % body)
+	
+	def column(self, body, value=0):
+		"""Return one value of one body for all Julian days.
+		
+		Default is longitude (value 0).
+		
+		:type body: int or Planet or str
+		:type value: int
+		:rtype: array
+		"""
+		if not isinstance(body, int):
+			body = self.index(body)
+		step = len(self._bodies) * 6
+		return self._data[body * 6 + value::step]
+	
+	def __repr__(self):
+		return 'PositionsSeries(%s times, %s bodies)' % (len(self._jds),
+			len(self._bodies))
+
+
+def calc_series(bodies, jd_start, jd_end, step, flag):
+	"""Calculate positions of bodies from jd_start to jd_end (included).
+	
+	Bodies are calculated like Planet.calc_ut does (inverted objects, fixed
+	stars), without creating objects for each result. Houses and parts
+	depend on a chart and cannot be calculated. Swisseph must be set up
+	before.
+	
+		>>> res = calc_series(['Sun', 'Moon'], 2451545, 2451555, 1,
+		...     swe.FLG_SPEED|swe.FLG_MOSEPH)
+		>>> res.shape
+		(11, 2, 6)
+		>>> len(res.column('Moon'))
+		11
+	
+	:type bodies: sequence of Planet, str or int
+	:type jd_start: numeric
+	:type jd_end: numeric
+	:type step: numeric
+	:type flag: int
+	:rtype: PositionsSeries
+	:raise ValueError: invalid step, invalid body (houses, parts)
+	"""
+	if step <= 0:
+		raise ValueError('Invalid step %s.' % step)
+	reg = planets_registry()
+	pl = list()
+	for b in bodies:
+		if isinstance(b, Planet):
+			pl.append(b)
+		elif isinstance(b, int):
+			pl.append(reg.get_num(b))
+		else:
+			pl.append(reg[b])
+	if any(p._family == 4 for p in pl):
+		raise ValueError('Cannot calculate houses.')
+	if any(p._family == 5 for p in pl):
+		raise ValueError('Cannot calculate parts.')
+	num = int((jd_end - jd_start) / float(step) + 1e-9) + 1
+	jds = array('d', (jd_start + i * step for i in xrange(num)))
+	# prepare calculations functions
+	calc = swe.calc_ut
+	funcs = list()
+	for p in pl:
+		if p._num in _inverted:
+			funcs.append((calc, _inverted[p._num], True))
+		elif p._family in (0, 1, 3):
+			funcs.append((calc, p._num, False))
+		else: # fixed stars
+			funcs.append((p.calc_ut, None, False))
+	data = array('d')
+	degnorm = swe.degnorm
+	for jd in jds:
+		for func, arg, invert in funcs:
+			if func is calc:
+				data.extend(calc(jd, arg, flag))
+			else:
+				data.extend(func(jd, flag, arg))
+			if invert:
+				data[-6] = degnorm(data[-6] - 180)
+	return PositionsSeries(jds, pl, data)
+
+
 def xml_export_planets(with_idx=False):
 	"""Return a xmlutils.Element('Planets') containing all planets.
 	
@@ -93,6 +93,7 @@ class PlanetsFilter(db.Object):
 		
 		:type res: list
 		"""
+		db.touch()
 		self._dict_.clear()
 		for x, y in res:
 			if y in (True, '1', 1, 'True', 'true'):
@@ -294,6 +295,7 @@ class PlanetsFilter(db.Object):
 				else:
 					value = False
 				self._dict_[plt] = value
+				db.touch()
 				return
 		raise KeyError(key)
 	
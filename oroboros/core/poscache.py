@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Positions cache.
+
+Switching bicharts modes, or editing filters, recalculates the same
+positions again and again. Planets positions and houses cusps are kept
+here, keyed by Julian day, body, calculation flag and the swisseph
+settings affecting results (sidereal mode, topocentric position).
+
+The least recently used entries are dropped when the cache is full. The
+cache is cleared when ephemeris settings change (see swestate).
+
+Parts depend on the chart and are never cached.
+	
+	Get positions.
+		
+		>>> from oroboros.core.planets import Planet
+		>>> clear()
+		>>> reset_stats()
+		>>> sun = Planet('Sun')
+		>>> res = calc_ut(sun, 2451545.0, swe.FLG_SPEED)
+		>>> res is calc_ut(sun, 2451545.0, swe.FLG_SPEED)
+		True
+		>>> stats()
+		(1, 1, 1)
+		>>> hit_rate()
+		0.5
+
+"""
+
+from collections import OrderedDict
+
+import swisseph as swe
+
+from oroboros.core import swestate
+
+
+__all__ = ['calc_ut', 'houses_ex', 'clear', 'get_maxsize', 'set_maxsize',
+	'stats', 'hit_rate', 'reset_stats']
+
+
+#: Cached results
+_cache = OrderedDict()
+
+#: Maximum number of entries (0 disables the cache)
+_maxsize = 4096
+
+#: Ephemeris revision of cached results
+_revision = swestate.revision()
+
+#: Number of results found in cache
+_hits = 0
+
+#: Number of results computed
+_misses = 0
+
+
+def _lookup(key):
+	"""Return cached result, or None.
+	
+	:type key: tuple
+	:rtype: tuple or None
+	"""
+	global _revision, _hits
+	if _revision != swestate.revision():
+		_cache.clear()
+		_revision = swestate.revision()
+		return None
+	try:
+		res = _cache.pop(key)
+	except KeyError:
+		return None
+	_cache[key] = res # most recent
+	_hits += 1
+	return res
+
+
+def _store(key, res):
+	"""Cache a result, drop the least recently used if full.
+	
+	:type key: tuple
+	:type res: tuple
+	"""
+	global _misses
+	_misses += 1
+	if _maxsize <= 0:
+		return
+	_cache[key] = res
+	while len(_cache) > _maxsize:
+		_cache.popitem(last=False)
+
+
+def calc_ut(planet, jd, flag, chart=None):
+	"""Return planet calculations results (see Planet.calc_ut).
+	
+	Swisseph must be set up first.
+	
+	:type planet: planets.Planet
+	:type jd: numeric
+	:type flag: int
+	:type chart: ChartCalc
+	:rtype: tuple
+	"""
+	if planet._family == 5: # parts
+		return planet.calc_ut(jd, flag, chart)
+	key = (jd, planet._num, planet._name, flag, swestate.context(flag))
+	res = _lookup(key)
+	if res == None:
+		res = planet.calc_ut(jd, flag, chart)
+		_store(key, res)
+	return res
+
+
+def houses_ex(jd, lat, lon, hsys, flag):
+	"""Return houses cusps and ascmc (see swisseph.houses_ex).
+	
+	Swisseph must be set up first.
+	
+	:type jd: numeric
+	:type lat: float
+	:type lon: float
+	:type hsys: str
+	:type flag: int
+	:rtype: tuple
+	"""
+	key = ('houses', jd, lat, lon, hsys, flag, swestate.context(flag)[0])
+	res = _lookup(key)
+	if res == None:
+		res = swe.houses_ex(jd, lat, lon, hsys, flag)
+		_store(key, res)
+	return res
+
+
+def clear():
+	"""Drop all cached results."""
+	_cache.clear()
+
+
+def get_maxsize():
+	"""Return maximum number of entries.
+	
+	:rtype: int
+	"""
+	return _maxsize
+
+
+def set_maxsize(size):
+	"""Set maximum number of entries (0 disables the cache).
+	
+	:type size: int
+	"""
+	global _maxsize
+	_maxsize = int(size)
+	while len(_cache) > max(_maxsize, 0):
+		_cache.popitem(last=False)
+
+
+def stats():
+	"""Return number of hits, misses, and cache size.
+	
+	:rtype: tuple
+	"""
+	return _hits, _misses, len(_cache)
+
+
+def hit_rate():
+	"""Return ratio of results found in cache.
+	
+	:rtype: float
+	"""
+	total = _hits + _misses
+	if total == 0:
+		return 0.0
+	return float(_hits) / total
+
+
+def reset_stats():
+	"""Reset hits and misses counters."""
+	global _hits, _misses
+	_hits = 0
+	_misses = 0
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
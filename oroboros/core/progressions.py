@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Secondary progressions timeline.
+
+Progressed positions (one day after birth for one year of life) are
+calculated once for a range of years, on a grid of days (see
+planets.calc_series). Positions for any age are then interpolated from
+this grid, with the speeds (cubic Hermite interpolation), and the natal
+chart is never modified.
+
+Progressed to natal aspects are searched on the same grid, like transits
+(see transits module).
+
+Houses are not progressed, and parts are ignored.
+	
+	Progressed positions of a chart.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> natal = Chart()
+		>>> tl = ProgressionTimeline(natal, 0, 50)
+		>>> pos = tl.at(30)
+		>>> sun = pos.get_data('Sun')
+		>>> res = sun.planet.calc_ut(natal.julday + 30, tl.flag)
+		>>> abs(sun.longitude - res[0]) < 1e-4
+		True
+	
+	Progressed aspects to natal positions.
+		
+		>>> events = list(tl.aspects(['Conjunction', 'Square']))
+		>>> events == sorted(events)
+		True
+
+"""
+
+import swisseph as swe
+
+from oroboros.core import roots
+from oroboros.core.planets import Planet, planets_registry, calc_series
+from oroboros.core.results import PlanetDataList
+from oroboros.core.transits import Transits
+
+
+__all__ = ['ProgressionTimeline']
+
+
+class ProgressionTimeline(object):
+	"""Progressed positions of a natal chart for a range of years."""
+	
+	__slots__ = ('_natal', '_year_start', '_year_end', '_flag', '_series',
+		'_transits')
+	
+	def _get_natal(self):
+		"""Get natal chart.
+		
+		:rtype: ChartCalc
+		"""
+		return self._natal
+	
+	def _get_span(self):
+		"""Get first and last years.
+		
+		:rtype: tuple
+		"""
+		return self._year_start, self._year_end
+	
+	def _get_flag(self):
+		"""Get calculation flag.
+		
+		:rtype: int
+		"""
+		return self._flag
+	
+	def _get_bodies(self):
+		"""Get progressed bodies.
+		
+		:rtype: tuple of Planet
+		"""
+		return self._series.bodies
+	
+	def _get_series(self):
+		"""Get positions series.
+		
+		:rtype: PositionsSeries
+		"""
+		return self._series
+	
+	natal = property(_get_natal,
+		doc='Natal chart.')
+	span = property(_get_span,
+		doc='First and last years.')
+	flag = property(_get_flag,
+		doc='Calculation flag.')
+	bodies = property(_get_bodies,
+		doc='Progressed bodies.')
+	series = property(_get_series,
+		doc='Positions series.')
+	
+	def __init__(self, natal, year_start=0, year_end=100, bodies=None,
+		step=1.0):
+		"""Calculate progressed positions.
+		
+		Bodies default to the natal chart filter bodies. The grid step is
+		in days (years of life).
+		
+		:type natal: ChartCalc
+		:type year_start: numeric
+		:type year_end: numeric
+		:type bodies: sequence of Planet, str or int
+		:type step: numeric
+		:raise ValueError: invalid span or step
+		"""
+		if year_end <= year_start:
+			raise ValueError('Invalid span %s %s.' % (year_start, year_end))
+		self._natal = natal
+		self._year_start = float(year_start)
+		self._year_end = float(year_end)
+		natal._setup_swisseph()
+		plan = natal._filter.compile()
+		self._flag = plan.calcflag | swe.FLG_SPEED
+		reg = planets_registry()
+		if bodies == None:
+			bodies = plan.bodies
+		pl = list()
+		for b in bodies:
+			if isinstance(b, Planet):
+				p = b
+			elif isinstance(b, int):
+				p = reg.get_num(b)
+			else:
+				p = reg[b]
+			if p._family not in (4, 5): # houses, parts
+				pl.append(p)
+		step = float(step)
+		jd = natal.julday
+		self._series = calc_series(pl, jd + self._year_start,
+			jd + self._year_end + step, step, self._flag)
+		self._transits = None
+	
+	def julday(self, year):
+		"""Return progressed Julian day for some year of life.
+		
+		:type year: numeric
+		:rtype: float
+		"""
+		return self._natal.julday + year
+	
+	def year(self, jd):
+		"""Return year of life for some (real) Julian day.
+		
+		:type jd: numeric
+		:rtype: float
+		"""
+		return swe._years_diff(self._natal.julday, jd)
+	
+	def at(self, year):
+		"""Return progressed positions for some year of life.
+		
+		:type year: numeric
+		:rtype: PlanetDataList
+		:raise ValueError: year out of range
+		"""
+		if not self._year_start <= year <= self._year_end:
+			raise ValueError('Year %s out of range.' % year)
+		series = self._series
+		jds = series.jds
+		data = series.data
+		step = jds[1] - jds[0]
+		t = self.julday(year)
+		k = min(int((t - jds[0]) / step), len(jds) - 2)
+		u = (t - jds[k]) / step
+		# hermite basis
+		h00 = 2 * u ** 3 - 3 * u ** 2 + 1
+		h10 = u ** 3 - 2 * u ** 2 + u
+		h01 = -2 * u ** 3 + 3 * u ** 2
+		h11 = u ** 3 - u ** 2
+		n = len(series.bodies)
+		ret = PlanetDataList()
+		for b, p in enumerate(series.bodies):
+			i = (k * n + b) * 6
+			j = i + n * 6
+			res = list()
+			for v in xrange(3):
+				y0, y1 = data[i+v], data[j+v]
+				if v == 0: # unwrap longitude
+					y1 = y0 + roots.angle_diff(y1, y0)
+				d0, d1 = data[i+v+3], data[j+v+3]
+				res.append(h00 * y0 + h10 * step * d0 + h01 * y1 +
+					h11 * step * d1)
+			res[0] %= 360.0
+			for v in xrange(3, 6):
+				res.append(data[i+v] + u * (data[j+v] - data[i+v]))
+			ret.feed(p, res)
+		return ret
+	
+	def at_julday(self, jd):
+		"""Return progressed positions for some (real) Julian day.
+		
+		:type jd: numeric
+		:rtype: PlanetDataList
+		:raise ValueError: date out of range
+		"""
+		return self.at(self.year(jd))
+	
+	def aspects(self, aspects, points=None):
+		"""Generate progressed to natal aspects, in chronological order.
+		
+		Events are (year of life, transits.TransitEvent) tuples, the
+		event Julian day being the progressed one.
+		
+		:see: transits.Transits.search()
+		
+		:type aspects: AspectsFilter or sequence of Aspect or str
+		:type points: sequence of str
+		:rtype: generator
+		"""
+		if self._transits == None:
+			self._natal._setup_swisseph()
+			jd = self._natal.julday
+			self._transits = Transits(self._series.bodies,
+				jd + self._year_start, jd + self._year_end, self._flag,
+				series=self._series)
+		jd = self._natal.julday
+		for ev in self._transits.search(self._natal, aspects, points):
+			yield ev._jd - jd, ev
+	
+	def __repr__(self):
+		return 'ProgressionTimeline(%s, %s, %s)' % (repr(self._natal),
+			self._year_start, self._year_end)
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -6,22 +6,47 @@ Objects holding calculations results.
 
 Provides functions for searching, retrieving, sorting results.
 
+Planets positions are stored by columns (one array per swisseph value,
+and an array of bodies numbers), PlanetData objects being light views
+on a row of these columns. Lists of positions index their elements by
+planet name.
+
+	>>> res = PlanetDataList()
+	>>> res.feed('Sun', (280.5, 0.0, 0.98, 1.02, 0.0, 0.0))
+	>>> res.feed('Moon', 12.25)
+	>>> res.get_data('Moon').longitude
+	12.25
+	>>> 'Sun' in res, 'Mars' in res
+	(True, False)
+	>>> res.column('longitude').tolist()
+	[280.5, 12.25]
+
 """
 
+from array import array
+
 import swisseph as swe
 
-from oroboros.core.planets import Planet
+from oroboros.core.planets import Planet, planets_registry
 
 
 __all__ = ['Data', 'PlanetData', 'PlanetDataList',
 	'HousesDataList', 'MidPointData', 'MidPointDataList']
 
 
+#: Swisseph values names, in results order
+_values = ('longitude', 'latitude', 'distance', 'lonspeed', 'latspeed',
+	'distspeed')
+
+
 class Data(object):
-	"""Object holding positions information as given by swe.calc_ut function."""
+	"""Object holding positions information as given by swe.calc_ut function.
 	
-	__slots__ = ('_longitude', '_latitude', '_distance',
-		'_lonspeed', '_latspeed', '_distspeed')
+	Base type, values are stored by subclasses.
+	
+	"""
+	
+	__slots__ = tuple()
 	
 	def _get_longitude(self):
 		"""Get longitude.
@@ -91,12 +116,77 @@ class Data(object):
 
 
 
-class PlanetData(Data):
-	"""One planet object and its positions."""
+class _Columns(object):
+	"""Positions of many bodies, stored by columns (a row per body)."""
 	
-	__slots__ = ('_planet', '_longitude', '_latitude', '_distance',
+	__slots__ = ('_bodies', '_longitude', '_latitude', '_distance',
 		'_lonspeed', '_latspeed', '_distspeed')
 	
+	def __init__(self):
+		self._bodies = array('i')
+		self._longitude = array('d')
+		self._latitude = array('d')
+		self._distance = array('d')
+		self._lonspeed = array('d')
+		self._latspeed = array('d')
+		self._distspeed = array('d')
+	
+	def append(self, num, res):
+		"""Append a row, return its index.
+		
+		:type num: int
+		:type res: sequence or numeric
+		:rtype: int
+		"""
+		if isinstance(res, (tuple, list)):
+			lon, lat, dist, lonspeed, latspeed, distspeed = res
+		else:
+			lon, lat, dist = float(res), 0.0, 0.0
+			lonspeed = latspeed = distspeed = 0.0
+		self._bodies.append(num)
+		self._longitude.append(lon)
+		self._latitude.append(lat)
+		self._distance.append(dist)
+		self._lonspeed.append(lonspeed)
+		self._latspeed.append(latspeed)
+		self._distspeed.append(distspeed)
+		return len(self._bodies) - 1
+	
+	def __len__(self):
+		return len(self._bodies)
+
+
+def _column_property(name, doc):
+	"""Return a property reading and writing a row of some column.
+	
+	:type name: str
+	:type doc: str
+	:rtype: property
+	"""
+	name = '_' + name
+	def fget(self):
+		return getattr(self._columns, name)[self._row]
+	def fset(self, value):
+		getattr(self._columns, name)[self._row] = value
+	return property(fget, fset, doc=doc)
+
+
+def _ranking_key(elem):
+	"""Return sort key of a planet or midpoint data, by planets ranking.
+	
+	:type elem: PlanetData or MidPointData
+	:rtype: int
+	"""
+	if isinstance(elem, MidPointData):
+		return elem._data1._planet._ranking
+	return elem._planet._ranking
+
+
+class PlanetData(Data):
+	"""One planet object and its positions (a row of results columns)."""
+	
+	__slots__ = ('_planet', '_columns', '_row')
+	
 	def _get_planet(self):
 		"""Get Planet object.
 		
@@ -114,38 +204,118 @@ class PlanetData(Data):
 		"""
 		if not isinstance(pl, Planet):
 			try:
-				pl = Planet(pl)
+				if isinstance(pl, int):
+					pl = planets_registry().get_num(pl)
+				else:
+					pl = planets_registry()[pl]
 			except:
 				raise ValueError('Invalid planet object %s.' % pl)
 		self._planet = pl
 	
-	planet = property(_get_planet, _set_planet, doc='Planet object.')
-	longitude = property(Data._get_longitude, doc='Longitude.')
-	latitude = property(Data._get_latitude, doc='Latitude.')
-	distance = property(Data._get_distance, doc='Distance.')
-	lonspeed = property(Data._get_lonspeed, doc='Longitude speed.')
-	latspeed = property(Data._get_latspeed, doc='Latitude speed')
-	distspeed = property(Data._get_distspeed, doc='Distance speed.')
+	_longitude = _column_property('longitude', 'Longitude (read/write).')
+	_latitude = _column_property('latitude', 'Latitude (read/write).')
+	_distance = _column_property('distance', 'Distance (read/write).')
+	_lonspeed = _column_property('lonspeed', 'Longitude speed (read/write).')
+	_latspeed = _column_property('latspeed', 'Latitude speed (read/write).')
+	_distspeed = _column_property('distspeed',
+		'Distance speed (read/write).')
 	
-	def __init__(self, pl, res):
+	planet = property(_get_planet, _set_planet, doc='Planet object.')
+	longitude = property(_longitude.fget, doc='Longitude.')
+	latitude = property(_latitude.fget, doc='Latitude.')
+	distance = property(_distance.fget, doc='Distance.')
+	lonspeed = property(_lonspeed.fget, doc='Longitude speed.')
+	latspeed = property(_latspeed.fget, doc='Latitude speed')
+	distspeed = property(_distspeed.fget, doc='Distance speed.')
+	
+	def __init__(self, pl, res, _columns=None):
 		"""Init planet data object.
 		
+		Data not given results columns has its own.
+		
 		:type pl: Planet or str or int
 		:type res: sequence or numeric
 		"""
-		Data.__init__(self, res)
 		self.planet = pl
+		if _columns == None:
+			_columns = _Columns()
+		self._columns = _columns
+		self._row = _columns.append(self._planet._num, res)
 	
 	def __repr__(self):
-		return 'PlanetData(%s, (%s, %s, %s, %s, %s, %s))' % (
+		return 'PlanetData(%s, (%s, %s, %s, %s, %s, %s))' % tuple(
 			repr(x) for x in (
 			self._planet, self._longitude, self._latitude, self._distance,
 			self._lonspeed, self._latspeed, self._distspeed))
 
 
 
-class PlanetDataList(list):
-	"""List of PlanetData objects."""
+class _IndexedList(list):
+	"""List with an index of its elements, reset when elements change.
+	
+	Subclasses set the _index attribute to None at init, and build it
+	when needed.
+	
+	"""
+	
+	def append(self, elem):
+		list.append(self, elem)
+		self._index = None
+	
+	def extend(self, seq):
+		list.extend(self, seq)
+		self._index = None
+	
+	def insert(self, i, elem):
+		list.insert(self, i, elem)
+		self._index = None
+	
+	def remove(self, elem):
+		list.remove(self, elem)
+		self._index = None
+	
+	def pop(self, i=-1):
+		self._index = None
+		return list.pop(self, i)
+	
+	def __setitem__(self, i, elem):
+		list.__setitem__(self, i, elem)
+		self._index = None
+	
+	def __delitem__(self, i):
+		list.__delitem__(self, i)
+		self._index = None
+	
+	def __setslice__(self, i, j, seq):
+		list.__setslice__(self, i, j, seq)
+		self._index = None
+	
+	def __delslice__(self, i, j):
+		list.__delslice__(self, i, j)
+		self._index = None
+	
+	def __iadd__(self, seq):
+		self._index = None
+		return list.__iadd__(self, seq)
+
+
+class PlanetDataList(_IndexedList):
+	"""List of PlanetData objects.
+	
+	Data fed are stored in the list results columns. Data appended keep
+	their own columns (so positions can be shared between lists, like
+	houses cusps).
+	
+	"""
+	
+	def __init__(self, seq=()):
+		"""Init list.
+		
+		:type seq: iterable of PlanetData
+		"""
+		list.__init__(self, seq)
+		self._columns = _Columns()
+		self._index = None
 	
 	def feed(self, pl, res):
 		"""Append a planet data object.
@@ -156,7 +326,19 @@ class PlanetDataList(list):
 		:type pl: Planet or str or int
 		:type res: sequence or numeric
 		"""
-		self.append(PlanetData(pl, res))
+		self.append(PlanetData(pl, res, self._columns))
+	
+	def _get_index(self):
+		"""Get planets names index.
+		
+		:rtype: dict
+		"""
+		if self._index == None:
+			idx = dict()
+			for elem in self:
+				idx.setdefault(elem._planet._name, elem)
+			self._index = idx
+		return self._index
 	
 	def get_data(self, plname):
 		"""Get data for a planet (given its name).
@@ -165,55 +347,48 @@ class PlanetDataList(list):
 		:rtype: PlanetData
 		:raise KeyError: planet not found
 		"""
-		for elem in self:
-			if elem._planet._name == plname:
-				return elem
-		raise KeyError(item)
+		return self._get_index()[plname]
 	
 	def __contains__(self, plname):
 		"""Return True if planet is in results.
 		
 		:rtype: bool
 		"""
-		for elem in self:
-			if elem._planet._name == plname:
-				return True
-		return False
+		return plname in self._get_index()
+	
+	def column(self, name):
+		"""Return values of all elements, in list order.
+		
+		Name is one of longitude, latitude, distance, lonspeed, latspeed,
+		distspeed.
+		
+		:type name: str
+		:rtype: array
+		:raise ValueError: invalid name
+		"""
+		if name not in _values:
+			raise ValueError('Invalid column %s.' % name)
+		name = '_' + name
+		return array('d', [getattr(x, name) for x in self])
+	
+	def bodies(self):
+		"""Return swisseph numbers of all elements, in list order.
+		
+		:rtype: array
+		"""
+		return array('i', (x._planet._num for x in self))
 	
 	def sort_by_ranking(self, reverse=False):
 		"""Sort elements by planets display rank.
 		
+		Midpoints are sorted by the rank of their first planet.
+		
 		:type reverse: bool
 		:rtype: self
 		"""
-		self.sort(self._sort_by_ranking, reverse=reverse)
+		self.sort(key=_ranking_key, reverse=reverse)
 		return self
 	
-	@staticmethod
-	def _sort_by_ranking(x, y):
-		"""Function to sort elements by planets ranking."""
-		try:
-			if x._planet._ranking > y._planet._ranking:
-				return 1
-			elif x._planet._ranking < y._planet._ranking:
-				return -1
-			return 0
-		except:
-			if isinstance(x, MidPointData):
-				_x = x._data1._planet._ranking
-			else:
-				_x = x._planet._ranking
-			if isinstance(y, MidPointData):
-				_y = y._data1._planet._ranking
-			else:
-				_y = y._planet._ranking
-			if _x > _y:
-				return 1
-			elif _x < _y:
-				return -1
-			else:
-				return 0
-	
 	# following functions will fail if mixed with midpoints
 	
 	def only_planets(self):
@@ -317,22 +492,25 @@ class HousesDataList(PlanetDataList):
 		:type ascmc: sequence
 		:type hsys: str
 		"""
+		PlanetDataList.__init__(self)
 		self._hsys = hsys
 		# cusps. get their planet objects
 		if len(cusps) == 12:
 			for i, num in enumerate(range(-100, -112, -1)):
-				self.append(PlanetData(num, cusps[i]))
+				self.feed(num, cusps[i])
 		elif len(cusps) == 36: # gauquelin
 			for i, num in enumerate(range(-112, -148, -1)):
-				self.append(PlanetData(num, cusps[i]))
+				self.feed(num, cusps[i])
 		else:
 			raise ValueError('Invalid cusps results.')
 		# ascmc
 		for i, num in enumerate(range(-148, -156, -1)):
-			self.append(PlanetData(num, ascmc[i]))
+			self.feed(num, ascmc[i])
 		# additional dsc, ic
-		self.insert(-6, PlanetData(-156, swe.degnorm(ascmc[0] - 180))) # dsc
-		self.insert(-6, PlanetData(-157, swe.degnorm(ascmc[1] - 180))) # ic
+		self.insert(-6, PlanetData(-156, swe.degnorm(ascmc[0] - 180),
+			self._columns)) # dsc
+		self.insert(-6, PlanetData(-157, swe.degnorm(ascmc[1] - 180),
+			self._columns)) # ic
 
 
 
@@ -347,7 +525,7 @@ class MidPointData(Data):
 		
 		:rtype: PlanetData
 		"""
-		return self._pos
+		return self._data1
 	
 	def _set_data1(self, data):
 		"""Set planet 1 data object.
@@ -399,7 +577,7 @@ class MidPointData(Data):
 		self.data2 = data2
 	
 	def __repr__(self):
-		return 'MidPointData(%s, %s, (%s, %s, %s, %s, %s, %s))' % (
+		return 'MidPointData(%s, %s, (%s, %s, %s, %s, %s, %s))' % tuple(
 			repr(x) for x in (
 			self._data1, self._data2, self._longitude, self._latitude,
 			self._distance, self._lonspeed, self._latspeed, self._distspeed))
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Solar and lunar returns.
+
+The exact moment the Sun (or Moon) comes back to its natal longitude is
+found with Newton iterations on its longitude and speed (see roots),
+starting from an estimate made with its mean motion. Return charts are
+made at the natal place, or at a relocated place.
+
+Successive returns are estimated from the previous one, and all charts
+share the same ephemeris settings and positions cache, so that a long
+series of returns is cheap to get.
+	
+	Get the solar return following a birth.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> natal = Chart()
+		>>> jd = return_julday(natal, 'Sun', natal.julday + 1)
+		>>> 365.0 < jd - natal.julday < 365.5
+		True
+	
+	Get return charts for some years.
+		
+		>>> charts = list(returns(natal, 'Sun', natal.julday + 1,
+		...     natal.julday + 365.25 * 5, do_calc=False))
+		>>> len(charts)
+		5
+	
+	Lunar returns.
+		
+		>>> jds = list(returns_julday(natal, 'Moon', natal.julday + 1,
+		...     natal.julday + 365.25))
+		>>> len(jds) in (13, 14)
+		True
+
+"""
+
+import swisseph as swe
+
+from oroboros.core import roots
+from oroboros.core.charts import Chart
+from oroboros.core.planets import Planet, planets_registry
+
+
+__all__ = ['return_julday', 'returns_julday', 'return_chart', 'returns']
+
+
+#: Mean daily motions, by swisseph num
+_mean_speeds = {
+	0: 0.98564736, # sun
+	1: 13.176358 # moon
+	}
+
+#: Search margins around estimates (days), by swisseph num
+_margins = {
+	0: 3.0, # sun
+	1: 1.0 # moon
+	}
+
+#: Return charts names formats, by swisseph num
+_names = {
+	0: 'Solar return %s (%s)',
+	1: 'Lunar return %s (%s)'
+	}
+
+
+def _planet(body):
+	"""Return planet from body name, num, or planet.
+	
+	:type body: Planet, str or int
+	:rtype: Planet
+	:raise ValueError: body has no returns
+	"""
+	reg = planets_registry()
+	if isinstance(body, Planet):
+		p = body
+	elif isinstance(body, int):
+		p = reg.get_num(body)
+	else:
+		p = reg[body]
+	if p._family != 0 or p._num not in _mean_speeds:
+		raise ValueError('Cannot find returns of %s.' % p._name)
+	return p
+
+
+def _natal_longitude(natal, planet, flag):
+	"""Return natal longitude of a planet.
+	
+	:type natal: ChartCalc
+	:type planet: Planet
+	:type flag: int
+	:rtype: float
+	"""
+	if natal._planets != None:
+		for pos in natal._planets:
+			if pos._planet._name == planet._name:
+				return pos._longitude
+	return planet.calc_ut(natal.julday, flag)[0]
+
+
+def _find(planet, lon, jd, flag):
+	"""Return Julian day of the return nearest to an estimate.
+	
+	:type planet: Planet
+	:type lon: float
+	:type jd: float
+	:type flag: int
+	:rtype: float
+	"""
+	def func(t):
+		res = planet.calc_ut(t, flag)
+		return roots.angle_diff(res[0], lon), res[3]
+	# one Newton step from the estimate, then bracket
+	f, df = func(jd)
+	jd -= f / df
+	margin = _margins[planet._num]
+	while True:
+		t0, t1 = jd - margin, jd + margin
+		f0, f1 = func(t0)[0], func(t1)[0]
+		if (f0 > 0) != (f1 > 0) or f0 == 0 or f1 == 0:
+			return roots.find_root(func, t0, t1, f0, f1)
+		margin *= 2
+
+
+def _flag(natal):
+	"""Prepare swisseph for a natal chart, return calculation flag.
+	
+	:type natal: ChartCalc
+	:rtype: int
+	"""
+	natal._setup_swisseph()
+	return natal._filter.compile().calcflag | swe.FLG_SPEED
+
+
+def return_julday(natal, body, jd):
+	"""Return Julian day (UT) of the first return at or after jd.
+	
+	:type natal: ChartCalc
+	:type body: Planet, str or int
+	:type jd: numeric
+	:rtype: float
+	:raise ValueError: body has no returns (only Sun and Moon)
+	"""
+	return returns_julday(natal, body, jd, None).next()
+
+
+def returns_julday(natal, body, jd_start, jd_end):
+	"""Generate Julian days (UT) of all returns within a period.
+	
+	Returns are generated lazily, if jd_end is None they never stop.
+	
+	:type natal: ChartCalc
+	:type body: Planet, str or int
+	:type jd_start: numeric
+	:type jd_end: numeric or None
+	:rtype: generator
+	:raise ValueError: body has no returns (only Sun and Moon)
+	"""
+	planet = _planet(body)
+	flag = _flag(natal)
+	lon = _natal_longitude(natal, planet, flag)
+	speed = _mean_speeds[planet._num]
+	period = 360.0 / speed
+	jd_start = float(jd_start)
+	cur = planet.calc_ut(jd_start, flag)[0]
+	jd = _find(planet, lon, jd_start + ((lon - cur) % 360.0) / speed, flag)
+	if jd < jd_start:
+		jd = _find(planet, lon, jd + period, flag)
+	while jd_end == None or jd <= jd_end:
+		yield jd
+		jd = _find(planet, lon, jd + period, flag)
+
+
+def _set_utc(chart, jd):
+	"""Set chart local date and time from a Julian day (UT).
+	
+	:type chart: ChartCalc
+	:type jd: float
+	"""
+	chart._set_utc_julday(jd)
+
+
+def return_chart(natal, jd, body='Sun', place=None, do_calc=True):
+	"""Make the chart of the first return at or after jd.
+	
+	Place is a dict of chart properties (location, latitude, longitude,
+	altitude, country, zoneinfo, timezone, utcoffset...) for a relocated
+	return. Default is the natal place.
+	
+	:see: ChartFile.set()
+	
+	:type natal: ChartCalc
+	:type jd: numeric
+	:type body: Planet, str or int
+	:type place: dict
+	:type do_calc: bool
+	:rtype: Chart
+	:raise ValueError: body has no returns (only Sun and Moon)
+	"""
+	return returns(natal, body, jd, None, place, do_calc).next()
+
+
+def returns(natal, body, jd_start, jd_end, place=None, do_calc=True):
+	"""Generate charts of all returns within a period.
+	
+	:see: return_chart()
+	
+	:type natal: ChartCalc
+	:type body: Planet, str or int
+	:type jd_start: numeric
+	:type jd_end: numeric or None
+	:type place: dict
+	:type do_calc: bool
+	:rtype: generator of Chart
+	:raise ValueError: body has no returns (only Sun and Moon)
+	"""
+	planet = _planet(body)
+	fmt = _names[planet._num]
+	for jd in returns_julday(natal, planet, jd_start, jd_end):
+		chart = Chart(do_calc=False)
+		chart.dup(natal)
+		chart.filter = natal._filter
+		if place != None:
+			chart.set(**place)
+		_set_utc(chart, jd)
+		chart.name = fmt % (chart._datetime.year, natal._name)
+		if do_calc:
+			chart.calc()
+		yield chart
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
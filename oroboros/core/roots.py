@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Root finding, for events searches (transits, stations, returns...).
+
+Functions of time are given as callables returning a value and its
+derivative (or None if unknown). Roots must be bracketed first, e.g. by
+stepping through time with the speeds swisseph returns.
+	
+	Find a root with Newton iterations.
+		
+		>>> t = find_root(lambda x: (x * x - 2, 2 * x), 1.0, 2.0, -1.0, 2.0)
+		>>> round(t, 9)
+		1.414213562
+	
+	Without derivative (bisection).
+		
+		>>> t = find_root(lambda x: (x * x - 2, None), 1.0, 2.0, -1.0, 2.0)
+		>>> abs(t - 2 ** 0.5) < 1e-6
+		True
+
+"""
+
+__all__ = ['find_root', 'angle_diff']
+
+
+#: Default precision (days, about 0.09 second)
+tolerance = 1e-6
+
+#: Maximum number of iterations
+maxiter = 100
+
+
+def angle_diff(lon1, lon2):
+	"""Return signed difference lon1 - lon2, in [-180;180[.
+	
+	:type lon1: float
+	:type lon2: float
+	:rtype: float
+	"""
+	return (lon1 - lon2 + 180.0) % 360.0 - 180.0
+
+
+def find_root(func, t0, t1, f0, f1, precision=None):
+	"""Return t in [t0;t1] where func(t) is zero.
+	
+	Values f0 = func(t0) and f1 = func(t1) must have opposite signs.
+	Newton steps are taken when the derivative is known and the step
+	stays within the bracket, bisection otherwise.
+	
+	:type func: callable
+	:type t0: float
+	:type t1: float
+	:type f0: float
+	:type f1: float
+	:type precision: float
+	:rtype: float
+	:raise ValueError: root not bracketed
+	"""
+	if precision == None:
+		precision = tolerance
+	if f0 == 0:
+		return t0
+	if f1 == 0:
+		return t1
+	if (f0 > 0) == (f1 > 0):
+		raise ValueError('Root not bracketed in [%s;%s].' % (t0, t1))
+	if t0 > t1:
+		t0, t1, f0, f1 = t1, t0, f1, f0
+	t = t0 - f0 * (t1 - t0) / (f1 - f0)
+	for i in xrange(maxiter):
+		f, df = func(t)
+		if f == 0:
+			return t
+		if (f > 0) == (f0 > 0):
+			t0, f0 = t, f
+		else:
+			t1, f1 = t, f
+		nt = None
+		if df:
+			nt = t - f / df
+			if not t0 < nt < t1:
+				nt = None
+		if nt == None:
+			nt = (t0 + t1) / 2.0
+		if abs(nt - t) <= precision or t1 - t0 <= precision:
+			return nt
+		t = nt
+	return t
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
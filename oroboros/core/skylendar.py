@@ -4,26 +4,28 @@
 """
 Import Skif charts.
 
+Files holding many charts (DATASET elements) can be read incrementally,
+elements being dropped once converted.
+
 """
 
 import os.path
 
+from oroboros.core.chartfile import ChartFile
 from oroboros.core.charts import Chart
 from oroboros.core import xmlutils
 
 
-__all__ = ['load']
+__all__ = ['load', 'iterload']
 
 
-def load(path):
-	"""Load skif and return chart object (not calculated).
+def _set(cht, data):
+	"""Set chart properties from a DATASET element.
 	
-	:type path: str
-	:rtype: Chart
+	:type cht: ChartFile
+	:type data: xmlutils.Element
+	:rtype: ChartFile
 	"""
-	path = os.path.abspath(os.path.expanduser(path))
-	f = xmlutils.parse(path)
-	data = f.get_child(tag='DATASET')
 	# name
 	name = data.get_child_text(tag='NAME')
 	# datetime
@@ -69,11 +71,33 @@ def load(path):
 	comment += 'Keywords: %s\n' % data.get_child_text(tag='KEYWORDS')
 	comment += 'Comment: %s' % data.get_child_text(tag='COMMENT')
 	# ...
-	cht = Chart(set_default=False, do_calc=False)
 	cht.set(name=name, datetime=datetime, location=location, country=country,
 		zoneinfo=zoneinfo, dst=dst, utcoffset=utcoffset, latitude=latitude,
 		longitude=longitude, altitude=0, comment=comment)
 	return cht
 
 
+def load(path):
+	"""Load skif and return chart object (not calculated).
+	
+	:type path: str
+	:rtype: Chart
+	"""
+	path = os.path.abspath(os.path.expanduser(path))
+	f = xmlutils.parse(path)
+	data = f.get_child(tag='DATASET')
+	return _set(Chart(set_default=False, do_calc=False), data)
+
+
+def iterload(path):
+	"""Generate charts of a skif file (not calculated).
+	
+	:type path: str
+	:rtype: generator of ChartFile
+	"""
+	path = os.path.abspath(os.path.expanduser(path))
+	for data in xmlutils.iterparse(path, 'DATASET'):
+		yield _set(ChartFile(set_default=False), data)
+
+
 # End.
@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Binary charts snapshots.
+
+Charts are saved in a compact binary format (packed with struct module),
+much faster to load than xml files: properties are restored as they were
+saved, without parsing nor checks. Positions of calculated charts
+(obliquity and nutation, houses and planets) can be saved along, and are
+used when loading if the chart filter gives the same calculations.
+
+Each charts directory can have a snapshots cache, holding all its xml
+charts in one file. A snapshot is used as long as its xml file has not
+been modified since (same modification time), else the xml file is
+parsed and the cache updated.
+	
+	Save a chart and load it.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> chart = Chart()
+		>>> data = dump(chart)
+		>>> res = load(data, Chart)
+		>>> tuple(res)[:15] == tuple(chart)[:15]
+		True
+		>>> res._planets[0]._longitude == chart._planets[0]._longitude
+		True
+	
+	Load a directory.
+		
+		>>> import tempfile, shutil
+		>>> tmp = tempfile.mkdtemp()
+		>>> chart.path = os.path.join(tmp, 'test.xml')
+		>>> chart.write()
+		True
+		>>> [x.name for x in load_dir(tmp)] == [chart.name]
+		True
+		>>> os.path.isfile(os.path.join(tmp, cache_name))
+		True
+		>>> load_dir(tmp)[0].path == chart.path
+		True
+		>>> shutil.rmtree(tmp)
+
+"""
+
+import os
+import os.path
+import struct
+from datetime import datetime
+
+from oroboros.core import cfg
+from oroboros.core import geocoords
+from oroboros.core import timezone
+from oroboros.core.chartfile import ChartFile
+from oroboros.core.chartdate import ChartDate
+from oroboros.core.chartcalc import ChartCalc
+from oroboros.core.kwdict import KeywordsDict
+from oroboros.core.planets import planets_registry
+from oroboros.core.results import PlanetDataList, HousesDataList
+
+
+__all__ = ['dump', 'load', 'write', 'read', 'convert', 'load_dir',
+	'extension', 'cache_name']
+
+
+#: Snapshot files extension
+extension = '.orbsnap'
+
+#: Snapshots cache file name, in charts directories
+cache_name = '.oroboros-snapshots'
+
+#: Format magic and version
+_magic = 'ORBS'
+_version = 1
+
+_header = struct.Struct('<4sB')
+_int = struct.Struct('<i')
+_double = struct.Struct('<d')
+_entry = struct.Struct('<di') # cache entry: mtime, size
+
+#: Properties: datetime (6), calendar, latitude (4), longitude (4),
+#: altitude, dst, utcoffset
+_props = struct.Struct('<h5BBBcBBBcBBibd')
+
+_calendars = ('gregorian', 'julian')
+
+_timezones = dict((x.utc, x) for x in timezone.all_timezones)
+
+
+def _pack_str(s):
+	"""Return packed string (or None).
+	
+	:type s: str or unicode or None
+	:rtype: str
+	"""
+	if s == None:
+		return _int.pack(-1)
+	if isinstance(s, unicode):
+		s = s.encode('utf-8')
+	return _int.pack(len(s)) + s
+
+
+def _unpack_str(data, pos):
+	"""Return (utf-8 string or None, new position).
+	
+	:type data: str
+	:type pos: int
+	:rtype: tuple
+	"""
+	n = _int.unpack_from(data, pos)[0]
+	pos += 4
+	if n == -1:
+		return None, pos
+	return data[pos:pos+n], pos + n
+
+
+def _unpack_unicode(data, pos):
+	"""Return (unicode string or None, new position).
+	
+	:type data: str
+	:type pos: int
+	:rtype: tuple
+	"""
+	s, pos = _unpack_str(data, pos)
+	if s != None:
+		s = s.decode('utf-8')
+	return s, pos
+
+
+def _pack_doubles(seq):
+	"""Return packed sequence of floats.
+	
+	:type seq: sequence of float
+	:rtype: str
+	"""
+	return _int.pack(len(seq)) + struct.pack('<%dd' % len(seq), *seq)
+
+
+def _unpack_doubles(data, pos):
+	"""Return (tuple of floats, new position).
+	
+	:type data: str
+	:type pos: int
+	:rtype: tuple
+	"""
+	n = _int.unpack_from(data, pos)[0]
+	pos += 4
+	return struct.unpack_from('<%dd' % n, data, pos), pos + n * 8
+
+
+def _coords(cls, values):
+	"""Return geocoords object, without checks.
+	
+	:type cls: type
+	:type values: sequence
+	:rtype: Latitude or Longitude
+	"""
+	obj = cls.__new__(cls)
+	obj._degrees, obj._direction, obj._minutes, obj._seconds = values
+	return obj
+
+
+def _plan_key(plan):
+	"""Return a str identifying positions calculated with a compiled filter.
+	
+	:type plan: filtersplans.FilterPlan
+	:rtype: str
+	"""
+	return repr((plan._calcflag, plan._hsys, plan._ephemeris, plan._sidereal,
+		plan._bodies))
+
+
+def _prototype(cls):
+	"""Return the type and the values of other slots than ChartFile ones,
+	used to create charts of some type without init costs.
+	
+	:type cls: type
+	:rtype: tuple
+	"""
+	if issubclass(cls, ChartCalc):
+		obj = cls(do_calc=False)
+	else:
+		obj = cls(set_default=False)
+	slots = list()
+	for c in cls.__mro__:
+		for k in getattr(c, '__slots__', ()):
+			if k not in ChartFile.__slots__ and k not in slots:
+				slots.append(k)
+	return cls, [(k, getattr(obj, k)) for k in slots]
+
+
+def dump(chart, results=True):
+	"""Return a chart snapshot.
+	
+	Positions are saved if the chart is calculated, and results is True.
+	
+	:type chart: ChartFile
+	:type results: bool
+	:rtype: str
+	"""
+	dt = chart._datetime
+	lat = chart._latitude
+	lon = chart._longitude
+	ret = [_props.pack(dt.year, dt.month, dt.day, dt.hour, dt.minute,
+		dt.second, _calendars.index(chart._calendar), lat._degrees,
+		lat._direction, lat._minutes, lat._seconds, lon._degrees,
+		lon._direction, lon._minutes, lon._seconds, int(chart._altitude),
+		-1 if chart._dst == None else int(chart._dst),
+		float('nan') if chart._utcoffset == None else chart._utcoffset)]
+	for s in (chart._path, chart._name, chart._location, chart._country,
+		chart._zoneinfo,
+		chart._timezone.utc if chart._timezone != None else None,
+		chart._comment):
+		ret.append(_pack_str(s))
+	kw = chart._keywords.items()
+	ret.append(_int.pack(len(kw)))
+	for k, v in kw:
+		ret.append(_pack_str(k))
+		ret.append(_pack_str(v))
+	if (results and isinstance(chart, ChartCalc) and chart._ecl_nut != None
+		and chart._houses != None and chart._planets != None):
+		h = chart._houses
+		ret.append(_int.pack(1))
+		ret.append(_pack_str(_plan_key(chart._filter.compile())))
+		ret.append(_double.pack(chart.julday))
+		ret.append(_pack_doubles(chart._ecl_nut))
+		ret.append(_pack_str(h._hsys))
+		ret.append(_pack_doubles([x._longitude for x in h]))
+		ret.append(_int.pack(len(chart._planets)))
+		for x in chart._planets:
+			ret.append(_pack_str(x._planet._name))
+			ret.append(struct.pack('<6d', x._longitude, x._latitude,
+				x._distance, x._lonspeed, x._latspeed, x._distspeed))
+	else:
+		ret.append(_int.pack(0))
+	return ''.join(ret)
+
+
+def _load_results(chart, data, pos):
+	"""Set chart positions from snapshot data, if still valid.
+	
+	:type chart: ChartCalc
+	:type data: str
+	:type pos: int
+	"""
+	key, pos = _unpack_str(data, pos)
+	jd = _double.unpack_from(data, pos)[0]
+	plan = chart._filter.compile()
+	if key != _plan_key(plan) or jd != chart.julday:
+		return
+	ecl_nut, pos = _unpack_doubles(data, pos + 8)
+	hsys, pos = _unpack_str(data, pos)
+	lons, pos = _unpack_doubles(data, pos)
+	# cusps, asc, mc, dsc, ic, armc, vertex, equasc, coasc1, coasc2, polasc
+	houses = HousesDataList(lons[:-10], lons[-10:-8] + lons[-6:], hsys)
+	planets = PlanetDataList()
+	all_pl = planets_registry()
+	n = _int.unpack_from(data, pos)[0]
+	pos += 4
+	for i in xrange(n):
+		name, pos = _unpack_unicode(data, pos)
+		p = all_pl[name]
+		if p._family == 4: # houses
+			planets.append(houses.get_data(name))
+		else:
+			planets.feed(p, list(struct.unpack_from('<6d', data, pos)))
+		pos += 48
+	chart._plan = plan
+	chart._ecl_nut = ecl_nut
+	chart._houses = houses
+	chart._planets = planets
+
+
+def load(data, cls=ChartFile, _proto=None):
+	"""Return chart from a snapshot.
+	
+	Positions saved are used if the chart type is calculated and its
+	(default) filter gives the same positions.
+	
+	:type data: str
+	:type cls: type
+	:rtype: ChartFile
+	"""
+	if _proto == None:
+		_proto = _prototype(cls)
+	chart = cls.__new__(cls)
+	for k, v in _proto[1]:
+		setattr(chart, k, v)
+	v = _props.unpack_from(data)
+	pos = _props.size
+	chart._datetime = datetime(*v[:6])
+	chart._calendar = _calendars[v[6]]
+	chart._latitude = _coords(geocoords.Latitude, v[7:11])
+	chart._longitude = _coords(geocoords.Longitude, v[11:15])
+	chart._altitude = geocoords.Altitude(v[15])
+	chart._dst = None if v[16] == -1 else bool(v[16])
+	chart._utcoffset = None if v[17] != v[17] else v[17] # nan
+	chart._path, pos = _unpack_str(data, pos)
+	chart._name, pos = _unpack_unicode(data, pos)
+	chart._location, pos = _unpack_unicode(data, pos)
+	chart._country, pos = _unpack_unicode(data, pos)
+	chart._zoneinfo, pos = _unpack_str(data, pos)
+	tz, pos = _unpack_str(data, pos)
+	chart._timezone = _timezones[tz] if tz != None else None
+	chart._comment, pos = _unpack_unicode(data, pos)
+	kw = KeywordsDict()
+	n = _int.unpack_from(data, pos)[0]
+	pos += 4
+	for i in xrange(n):
+		k, pos = _unpack_unicode(data, pos)
+		v, pos = _unpack_unicode(data, pos)
+		dict.__setitem__(kw, k, v)
+	chart._keywords = kw
+	if isinstance(chart, ChartDate):
+		chart._reset_datetime()
+	if isinstance(chart, ChartCalc):
+		chart._observers = list()
+		chart.reset_positions()
+		if _int.unpack_from(data, pos)[0]:
+			_load_results(chart, data, pos + 4)
+	return chart
+
+
+def write(chart, path=None, results=True):
+	"""Write a chart snapshot file.
+	
+	Default path is the chart path, with snapshot extension.
+	
+	:type chart: ChartFile
+	:type path: str
+	:type results: bool
+	:raise TypeError: missing path
+	"""
+	if path == None:
+		if chart._path == None:
+			raise TypeError('Missing path.')
+		path = os.path.splitext(chart._path)[0] + extension
+	f = open(os.path.abspath(os.path.expanduser(path)), 'wb')
+	try:
+		f.write(_header.pack(_magic, _version))
+		f.write(dump(chart, results))
+	finally:
+		f.close()
+
+
+def _read(path):
+	"""Return snapshot file contents, without header.
+	
+	:type path: str
+	:rtype: str
+	:raise ValueError: invalid file
+	"""
+	f = open(path, 'rb')
+	try:
+		data = f.read()
+	finally:
+		f.close()
+	if len(data) < _header.size:
+		raise ValueError('Invalid snapshot file %s.' % path)
+	magic, version = _header.unpack_from(data)
+	if magic != _magic or version != _version:
+		raise ValueError('Invalid snapshot file %s.' % path)
+	return data[_header.size:]
+
+
+def read(path, cls=ChartFile):
+	"""Read a chart snapshot file.
+	
+	:type path: str
+	:type cls: type
+	:rtype: ChartFile
+	:raise ValueError: invalid file
+	"""
+	return load(_read(os.path.abspath(os.path.expanduser(path))), cls)
+
+
+def convert(src, dest):
+	"""Convert a chart file, from xml to snapshot or the other way round.
+	
+	Snapshots of xml files have the xml file path, xml files of snapshots
+	have the new path.
+	
+	:type src: str
+	:type dest: str
+	:raise ValueError: unknown file format
+	"""
+	src = os.path.abspath(os.path.expanduser(src))
+	if src.lower().endswith('.xml'):
+		write(ChartFile(src), dest, False)
+	elif src.lower().endswith(extension):
+		chart = read(src)
+		chart.path = dest
+		chart.write()
+	else:
+		raise ValueError('Unknown chart file format %s.' % src)
+
+
+def _read_cache(path):
+	"""Return snapshots cache, as a dict of file name: (mtime, data).
+	
+	Invalid or missing caches are empty.
+	
+	:type path: str
+	:rtype: dict
+	"""
+	ret = dict()
+	try:
+		data = _read(path)
+	except (IOError, ValueError):
+		return ret
+	pos = 0
+	try:
+		while pos < len(data):
+			name, pos = _unpack_str(data, pos)
+			mtime, size = _entry.unpack_from(data, pos)
+			pos += _entry.size
+			ret[name] = (mtime, data[pos:pos+size])
+			pos += size
+	except struct.error:
+		pass # truncated
+	return ret
+
+
+def _write_cache(path, cache):
+	"""Write snapshots cache.
+	
+	:type path: str
+	:type cache: dict
+	"""
+	tmp = path + '.tmp'
+	f = open(tmp, 'wb')
+	try:
+		f.write(_header.pack(_magic, _version))
+		for name in sorted(cache):
+			mtime, data = cache[name]
+			f.write(_pack_str(name))
+			f.write(_entry.pack(mtime, len(data)))
+			f.write(data)
+	finally:
+		f.close()
+	try:
+		os.rename(tmp, path)
+	except OSError: # windows
+		os.remove(path)
+		os.rename(tmp, path)
+
+
+def load_dir(path=None, cls=ChartFile, update=True, errors='raise'):
+	"""Load all xml charts of a directory, using its snapshots cache.
+	
+	Charts are sorted by file name. Default directory is the charts
+	directory. Errors can be 'raise' (stop at the first invalid xml file)
+	or 'skip' (ignore invalid files).
+	
+	:type path: str
+	:type cls: type
+	:type update: bool
+	:type errors: str
+	:rtype: list
+	:raise ValueError: invalid errors option
+	"""
+	if errors not in ('raise', 'skip'):
+		raise ValueError('Invalid errors option %s.' % errors)
+	if path == None:
+		path = cfg.charts_dir
+	path = os.path.abspath(os.path.expanduser(path))
+	cache_path = os.path.join(path, cache_name)
+	cache = _read_cache(cache_path)
+	fresh = dict()
+	changed = False
+	proto = _prototype(cls)
+	ret = list()
+	for name in sorted(os.listdir(path)):
+		if not name.lower().endswith('.xml'):
+			continue
+		f = os.path.join(path, name)
+		mtime = os.path.getmtime(f)
+		entry = cache.get(name)
+		if entry != None and entry[0] == mtime:
+			chart = load(entry[1], cls, proto)
+			chart._path = f
+		else:
+			try:
+				if issubclass(cls, ChartCalc):
+					chart = cls(f, do_calc=False)
+				else:
+					chart = cls(f)
+			except Exception:
+				if errors == 'raise':
+					raise
+				continue
+			entry = (mtime, dump(chart, False))
+			changed = True
+		fresh[name] = entry
+		ret.append(chart)
+	if update and (changed or len(fresh) != len(cache)):
+		_write_cache(cache_path, fresh)
+	return ret
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
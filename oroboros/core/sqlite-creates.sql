@@ -437,7 +437,7 @@ create table Filters (
 	_idx integer primary key,
 	name varchar not null unique default '<?>',
 	bg_color varchar not null default 'black' check (bg_color in ('black', 'white')),
-	ephe_type varchar not null default 'swiss' check (ephe_type in ('swiss','jpl','moshier')),
+	ephe_type varchar not null default 'swiss' check (ephe_type in ('swiss','jpl','moshier','cheby')),
 	ephe_path varchar not null default '/usr/local/share/swisseph',  -- path to ephe dir/file
 	hsys varchar not null default 'P', -- house system
 	sid_mode integer not null default -1 check (sid_mode between -1 and 255), -- sidereal mode: -1=tropical, 0+=sidereal mode
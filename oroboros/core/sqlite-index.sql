@@ -0,0 +1,65 @@
+/* Oroboros - SQLite charts index structure */
+
+/* ChartsIndex */
+create table if not exists ChartsIndex (
+	_idx integer primary key,
+	path varchar not null unique, -- chart file path
+	mtime numeric not null, -- file modification time
+	hash varchar not null, -- sha1 of file contents
+	filter_idx integer not null, -- filter used for positions (Filters._idx)
+	name varchar not null default '',
+	datetime varchar not null, -- local date and time
+	calendar varchar not null default 'gregorian' check (calendar in ('gregorian', 'julian')),
+	location varchar not null default '',
+	latitude numeric not null default 0 check (latitude between -90 and 90),
+	longitude numeric not null default 0 check (longitude between -180 and 180),
+	country varchar not null default '',
+	zoneinfo varchar,
+	julday numeric not null
+);/*End*/
+
+/* _ChartsIndexPlanets */
+create table if not exists _ChartsIndexPlanets (
+	chart_idx integer not null, -- references ChartsIndex._idx
+	planet varchar not null, -- planet or cusp name
+	longitude numeric not null,
+	latitude numeric not null,
+	lonspeed numeric not null,
+	sign integer not null check (sign between 1 and 12),
+	house integer check (house between 1 and 12) -- null for gauquelin sectors
+);/*End*/
+
+/* _ChartsIndexPlanetsIndex */
+create index if not exists _ChartsIndexPlanetsIndex
+	on _ChartsIndexPlanets (planet, house, sign, chart_idx);/*End*/
+
+/* _ChartsIndexPlanetsChartIndex */
+create index if not exists _ChartsIndexPlanetsChartIndex
+	on _ChartsIndexPlanets (chart_idx);/*End*/
+
+/* _ChartsIndexAspects */
+create table if not exists _ChartsIndexAspects (
+	chart_idx integer not null, -- references ChartsIndex._idx
+	planet1 varchar not null,
+	planet2 varchar not null,
+	aspect varchar not null, -- aspect name
+	diff numeric not null, -- distance to exact aspect
+	apply integer check (apply in (0, 1)), -- null if unknown
+	factor numeric not null -- aspect strength
+);/*End*/
+
+/* _ChartsIndexAspectsIndex */
+create index if not exists _ChartsIndexAspectsIndex
+	on _ChartsIndexAspects (aspect, planet1, planet2, chart_idx);/*End*/
+
+/* _ChartsIndexAspectsChartIndex */
+create index if not exists _ChartsIndexAspectsChartIndex
+	on _ChartsIndexAspects (chart_idx);/*End*/
+
+/* ChartsIndexDeleteTrigger */
+-- Cascade charts delete on positions and aspects
+create trigger if not exists ChartsIndexDeleteTrigger after delete on ChartsIndex for each row
+	begin
+		delete from _ChartsIndexPlanets where chart_idx = old._idx;
+		delete from _ChartsIndexAspects where chart_idx = old._idx;
+	end;/*End*/
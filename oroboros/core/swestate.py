@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Swisseph global state.
+
+Ephemeris files, sidereal mode and topocentric position are global
+settings in swisseph, and changing them flushes its internal caches
+(ephemeris files may be reopened). This module remembers the settings
+last applied, and calls swisseph only when they differ.
+
+Hits (nothing to do) and misses (swisseph called) are counted, to check
+how often the state changes, e.g. when comparing two charts.
+	
+	Apply settings.
+		
+		>>> reset_stats()
+		>>> set_sidereal(0, 0, 0)
+		>>> set_sidereal(0, 0, 0)
+		>>> stats()
+		(1, 1)
+	
+	Forget settings (if swisseph was set up elsewhere).
+		
+		>>> invalidate()
+		>>> set_sidereal(0, 0, 0)
+		>>> stats()
+		(1, 2)
+
+"""
+
+import swisseph as swe
+
+import oroboros.core.chebycache
+
+
+__all__ = ['set_ephemeris', 'set_sidereal', 'set_topo', 'setup',
+	'invalidate', 'revision', 'ephemeris', 'context', 'stats',
+	'reset_stats']
+
+
+#: Last ephemeris settings applied (type, path)
+_ephe = None
+
+#: Last sidereal mode settings applied (mode, t0, ayan_t0)
+_sid = None
+
+#: Last topocentric position applied (lon, lat, alt)
+_topo = None
+
+#: Ephemeris changes counter
+_revision = 0
+
+#: Number of settings already applied
+_hits = 0
+
+#: Number of settings passed to swisseph
+_misses = 0
+
+
+def _apply(current, state):
+	"""Count a hit or a miss, return True if state must be applied.
+	
+	:type current: tuple or None
+	:type state: tuple
+	:rtype: bool
+	"""
+	global _hits, _misses
+	if current == state:
+		_hits += 1
+		return False
+	_misses += 1
+	return True
+
+
+def set_ephemeris(ephe_type, path):
+	"""Set ephemeris type and files path.
+	
+	Moshier ephemeris needs no file and leaves the state untouched.
+	Other ephemeris reset the sidereal mode and topocentric position.
+	With 'cheby', path is an ephemeris cache file (see chebycache), and
+	swisseph is set up with the ephemeris used to build the cache, for
+	calculations not cached.
+	
+	:type ephe_type: str
+	:type path: str
+	:raise ValueError: invalid ephemeris type
+	"""
+	global _ephe, _sid, _topo, _revision
+	if ephe_type not in ('swiss', 'jpl', 'moshier', 'cheby'):
+		raise ValueError('Invalid ephemeris type %s.' % ephe_type)
+	cache = oroboros.core.chebycache.active()
+	if ephe_type == 'cheby':
+		if cache == None or cache.path != path:
+			oroboros.core.chebycache.activate(path)
+			cache = oroboros.core.chebycache.active()
+			_revision += 1
+		ephe_type, path = cache.ephemeris
+	elif cache != None:
+		oroboros.core.chebycache.deactivate()
+		_revision += 1
+	if ephe_type == 'moshier':
+		return
+	state = (ephe_type, path)
+	if not _apply(_ephe, state):
+		return
+	if ephe_type == 'swiss':
+		swe.set_ephe_path(path)
+	else:
+		swe.set_jpl_file(path)
+	_ephe = state
+	# swisseph closes and resets sidereal mode and topocentric position
+	_sid = None
+	_topo = None
+	_revision += 1
+
+
+def set_sidereal(mode, t0, ayan_t0):
+	"""Set sidereal mode.
+	
+	:type mode: int
+	:type t0: float
+	:type ayan_t0: float
+	"""
+	global _sid
+	state = (mode, t0, ayan_t0)
+	if not _apply(_sid, state):
+		return
+	swe.set_sid_mode(mode, t0, ayan_t0)
+	_sid = state
+
+
+def set_topo(lon, lat, alt):
+	"""Set topocentric position.
+	
+	:type lon: float
+	:type lat: float
+	:type alt: numeric
+	"""
+	global _topo
+	state = (lon, lat, alt)
+	if not _apply(_topo, state):
+		return
+	swe.set_topo(lon, lat, alt)
+	_topo = state
+
+
+def setup(filt, lon, lat, alt):
+	"""Prepare swisseph for calculations with a filter, at some place.
+	
+	:type filt: filters.Filter
+	:type lon: float
+	:type lat: float
+	:type alt: numeric
+	"""
+	set_ephemeris(filt._ephe_type, filt._ephe_path)
+	if filt._sid_mode > -1:
+		set_sidereal(filt._sid_mode, filt._sid_t0, filt._sid_ayan_t0)
+	if filt._xcentric == 'topo':
+		set_topo(lon, lat, alt)
+
+
+def invalidate():
+	"""Forget settings, next ones will be applied."""
+	global _ephe, _sid, _topo, _revision
+	_ephe = None
+	_sid = None
+	_topo = None
+	_revision += 1
+
+
+def revision():
+	"""Return ephemeris changes counter.
+	
+	:rtype: int
+	"""
+	return _revision
+
+
+def ephemeris():
+	"""Return last ephemeris settings applied (type, path), or None.
+	
+	:rtype: tuple or None
+	"""
+	return _ephe
+
+
+def context(flag):
+	"""Return settings affecting results computed with a flag.
+	
+	That is the sidereal mode (if flag is sidereal) and the topocentric
+	position (if flag is topocentric).
+	
+	:type flag: int
+	:rtype: tuple
+	"""
+	return (_sid if flag & swe.FLG_SIDEREAL else None,
+		_topo if flag & swe.FLG_TOPOCTR else None)
+
+
+def stats():
+	"""Return number of hits and misses.
+	
+	:rtype: tuple
+	"""
+	return _hits, _misses
+
+
+def reset_stats():
+	"""Reset hits and misses counters."""
+	global _hits, _misses
+	_hits = 0
+	_misses = 0
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
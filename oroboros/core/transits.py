@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Transits search.
+
+Transiting bodies are calculated once for a range of Julian days, on a
+grid of dates (see planets.calc_series). Their motion is cut into direct
+and retrograde segments, at stations found with the speeds. Natal points
+are then searched against these segments: each segment sweeps an arc of
+longitudes, and the aspected points within it are found by binary
+search. Exact times are refined with Newton iterations (see roots).
+
+Segments do not depend on the natal chart, so the same Transits object
+serves any number of natal charts.
+	
+	Search transits of Mars and Saturn to a chart, for one year.
+		
+		>>> from oroboros.core.charts import Chart
+		>>> chart = Chart()
+		>>> tr = Transits(['Mars', 'Saturn'], chart.julday,
+		...     chart.julday + 365, swe.FLG_SPEED|swe.FLG_MOSEPH)
+		>>> events = list(tr.search(chart, ['Conjunction', 'Square']))
+		>>> events == sorted(events, key=lambda x: x.jd)
+		True
+	
+	Or directly.
+		
+		>>> events = find_transits(chart, ['Saturn'], ['Opposition'],
+		...     chart.julday, chart.julday + 365)
+
+"""
+
+from bisect import bisect_left, bisect_right
+import heapq
+
+import swisseph as swe
+
+from oroboros.core import roots
+from oroboros.core.planets import Planet, planets_registry, calc_series
+from oroboros.core.aspects import Aspect, aspects_registry
+from oroboros.core.aspectsfilters import AspectsFilter
+
+
+__all__ = ['TransitEvent', 'Transits', 'find_transits']
+
+
+#: Default grid steps (days), by swisseph num
+_dft_steps = {
+	1: 0.5, # moon
+	0: 2, # sun
+	2: 1, # mercury
+	3: 2, # venus
+	4: 2, # mars
+	10: 5, # mean node
+	11: 0.5, # true node
+	12: 5, # mean apogee
+	13: 0.5, # osculating apogee
+	-2: 5, # ketu (mean)
+	-3: 0.5, # ketu (true)
+	-4: 5, # priapus (mean)
+	-5: 0.5 # priapus (true)
+	}
+
+#: Default grid step for other bodies (days)
+_dft_step = 4
+
+
+class TransitEvent(object):
+	"""Exact transit of a body to a natal point."""
+	
+	__slots__ = ('_jd', '_body', '_natal', '_aspect', '_longitude',
+		'_lonspeed')
+	
+	def _get_jd(self):
+		"""Get Julian day (UT).
+		
+		:rtype: float
+		"""
+		return self._jd
+	
+	def _get_body(self):
+		"""Get transiting body.
+		
+		:rtype: Planet
+		"""
+		return self._body
+	
+	def _get_natal(self):
+		"""Get natal point.
+		
+		:rtype: results.PlanetData
+		"""
+		return self._natal
+	
+	def _get_aspect(self):
+		"""Get aspect.
+		
+		:rtype: Aspect
+		"""
+		return self._aspect
+	
+	def _get_longitude(self):
+		"""Get transiting body longitude.
+		
+		:rtype: float
+		"""
+		return self._longitude
+	
+	def _get_lonspeed(self):
+		"""Get transiting body longitude speed.
+		
+		:rtype: float
+		"""
+		return self._lonspeed
+	
+	def _get_retrograde(self):
+		"""Return True if transiting body is retrograde.
+		
+		:rtype: bool
+		"""
+		return self._lonspeed < 0
+	
+	jd = property(_get_jd,
+		doc='Julian day.')
+	body = property(_get_body,
+		doc='Transiting body.')
+	natal = property(_get_natal,
+		doc='Natal point.')
+	aspect = property(_get_aspect,
+		doc='Aspect.')
+	longitude = property(_get_longitude,
+		doc='Transiting body longitude.')
+	lonspeed = property(_get_lonspeed,
+		doc='Transiting body longitude speed.')
+	retrograde = property(_get_retrograde,
+		doc='Transiting body is retrograde (bool).')
+	
+	def __init__(self, jd, body, natal, aspect, longitude, lonspeed):
+		"""Init transit event.
+		
+		:type jd: float
+		:type body: Planet
+		:type natal: results.PlanetData
+		:type aspect: Aspect
+		:type longitude: float
+		:type lonspeed: float
+		"""
+		self._jd = jd
+		self._body = body
+		self._natal = natal
+		self._aspect = aspect
+		self._longitude = longitude
+		self._lonspeed = lonspeed
+	
+	def __repr__(self):
+		return 'TransitEvent(%s, %s, %s, %s%s)' % (self._jd,
+			self._body._name, self._aspect._name, self._natal._planet._name,
+			', R' if self._lonspeed < 0 else '')
+
+
+class Transits(object):
+	"""Transiting bodies motion, for a range of Julian days."""
+	
+	__slots__ = ('_bodies', '_jd_start', '_jd_end', '_flag', '_segments',
+		'_stations')
+	
+	def _get_bodies(self):
+		"""Get transiting bodies.
+		
+		:rtype: tuple of Planet
+		"""
+		return self._bodies
+	
+	def _get_span(self):
+		"""Get first and last Julian days.
+		
+		:rtype: tuple
+		"""
+		return self._jd_start, self._jd_end
+	
+	def _get_flag(self):
+		"""Get calculation flag.
+		
+		:rtype: int
+		"""
+		return self._flag
+	
+	def _get_stations(self):
+		"""Get stations, as (jd, body, longitude, retrograde after) tuples.
+		
+		:rtype: list
+		"""
+		return self._stations
+	
+	bodies = property(_get_bodies,
+		doc='Transiting bodies.')
+	span = property(_get_span,
+		doc='First and last Julian days.')
+	flag = property(_get_flag,
+		doc='Calculation flag.')
+	stations = property(_get_stations,
+		doc='Stations found (jd, body, longitude, retrograde after).')
+	
+	def __init__(self, bodies, jd_start, jd_end, flag, steps=None,
+		series=None):
+		"""Calculate transiting bodies motion.
+		
+		Swisseph must be set up before. Steps can be a dict of grid steps
+		(days) by swisseph num, overriding the defaults. Or positions
+		already calculated can be given as a series including all bodies,
+		from jd_start to jd_end (at least), its grid is used instead.
+		
+		:type bodies: sequence of Planet, str or int
+		:type jd_start: numeric
+		:type jd_end: numeric
+		:type flag: int
+		:type steps: dict
+		:type series: PositionsSeries
+		:raise ValueError: invalid span or body (houses, parts, not in
+			series)
+		"""
+		if jd_end <= jd_start:
+			raise ValueError('Invalid span %s %s.' % (jd_start, jd_end))
+		reg = planets_registry()
+		pl = list()
+		for b in bodies:
+			if isinstance(b, Planet):
+				pl.append(b)
+			elif isinstance(b, int):
+				pl.append(reg.get_num(b))
+			else:
+				pl.append(reg[b])
+		for p in pl:
+			if p._family in (4, 5):
+				raise ValueError('Cannot search transits of %s.' % p._name)
+		self._bodies = tuple(pl)
+		self._jd_start = float(jd_start)
+		self._jd_end = float(jd_end)
+		self._flag = flag
+		# segments (start, end, lon start, lon end, body idx), stations
+		self._segments = list()
+		self._stations = list()
+		for i, p in enumerate(pl):
+			if series != None:
+				self._segment(i, p, series=series)
+				continue
+			if steps != None and p._num in steps:
+				step = steps[p._num]
+			else:
+				step = _dft_steps.get(p._num, _dft_step)
+			self._segment(i, p, float(step))
+		self._segments.sort()
+		self._stations.sort()
+	
+	def _segment(self, idx, planet, step=None, series=None):
+		"""Cut the motion of a body into direct and retrograde segments.
+		
+		:type idx: int
+		:type planet: Planet
+		:type step: float
+		:type series: PositionsSeries
+		"""
+		flag = self._flag
+		if series == None:
+			series = calc_series([planet], self._jd_start,
+				self._jd_end + step, step, flag)
+		col = series.index(planet)
+		jds = series.jds
+		lons = series.column(col, 0)
+		speeds = series.column(col, 3)
+		speed = lambda t: (planet.calc_ut(t, flag)[3], None)
+		seg = self._segments.append
+		for k in xrange(len(jds) - 1):
+			t0, t1 = jds[k], jds[k+1]
+			lon0, lon1 = lons[k], lons[k+1]
+			s0, s1 = speeds[k], speeds[k+1]
+			if (s0 < 0) != (s1 < 0) and s0 != 0 and s1 != 0: # station
+				ts = roots.find_root(speed, t0, t1, s0, s1)
+				lons_ = planet.calc_ut(ts, flag)[0]
+				seg((t0, ts, lon0, lons_, idx))
+				seg((ts, t1, lons_, lon1, idx))
+				self._stations.append((ts, planet, lons_, s1 < 0))
+			else:
+				seg((t0, t1, lon0, lon1, idx))
+	
+	def search(self, natal, aspects, points=None):
+		"""Search transits to a natal chart, in chronological order.
+		
+		Aspects are given as an aspects filter, or a list of aspects (or
+		names). Points are the names of natal bodies to consider, default
+		is all chart planets.
+		
+		:type natal: ChartCalc or sequence of results.PlanetData
+		:type aspects: AspectsFilter or sequence of Aspect or str
+		:type points: sequence of str
+		:rtype: generator of TransitEvent
+		"""
+		if hasattr(natal, 'planets'):
+			natal = natal.planets
+		if points != None:
+			natal = [x for x in natal if x._planet._name in points]
+		all_asp = aspects_registry()
+		if isinstance(aspects, AspectsFilter):
+			aspects = [x for x in all_asp if aspects.get(x._name, False)]
+		else:
+			aspects = [x if isinstance(x, Aspect) else all_asp[x]
+				for x in aspects]
+		# targets longitudes (natal points at aspects angles)
+		targets = list()
+		for pos in natal:
+			for asp in aspects:
+				angle = float(asp._angle)
+				targets.append(((pos._longitude + angle) % 360.0, pos, asp))
+				if angle not in (0.0, 180.0):
+					targets.append(((pos._longitude - angle) % 360.0, pos,
+						asp))
+		targets.sort(key=lambda x: x[0])
+		tlons = [x[0] for x in targets]
+		# sweep segments, in order of start time
+		jd_start, jd_end = self._jd_start, self._jd_end
+		pending = list()
+		for t0, t1, lon0, lon1, idx in self._segments:
+			while pending and pending[0][0] <= t0:
+				yield heapq.heappop(pending)[1]
+			if t0 > jd_end:
+				break
+			arc = roots.angle_diff(lon1, lon0)
+			if arc == 0:
+				continue
+			# targets in ]lon0;lon1] (direct) or [lon1;lon0[ (retrograde)
+			if arc > 0:
+				windows = self._windows(lon0, arc, True)
+			else:
+				windows = self._windows(lon1, -arc, False)
+			for lo, hi, left in windows:
+				if left:
+					a, b = bisect_right(tlons, lo), bisect_right(tlons, hi)
+				else:
+					a, b = bisect_left(tlons, lo), bisect_left(tlons, hi)
+				for x in xrange(a, b):
+					ev = self._refine(idx, t0, t1, lon0, lon1, targets[x])
+					if ev != None and jd_start <= ev._jd <= jd_end:
+						heapq.heappush(pending, (ev._jd, ev))
+		while pending:
+			yield heapq.heappop(pending)[1]
+	
+	def _windows(self, lon, arc, left):
+		"""Split an arc of longitudes at 360 degrees.
+		
+		Return (lo, hi, left) tuples, left True for ]lo;hi], False for
+		[lo;hi[.
+		
+		:type lon: float
+		:type arc: float
+		:type left: bool
+		:rtype: list
+		"""
+		lo = lon % 360.0
+		hi = lo + arc
+		if hi <= 360.0:
+			return [(lo, hi, left)]
+		return [(lo, 360.0, left), (0.0, hi - 360.0, left)]
+	
+	def _refine(self, idx, t0, t1, lon0, lon1, target):
+		"""Return exact transit event within a segment.
+		
+		:type idx: int
+		:type t0: float
+		:type t1: float
+		:type lon0: float
+		:type lon1: float
+		:type target: tuple
+		:rtype: TransitEvent or None
+		"""
+		planet = self._bodies[idx]
+		flag = self._flag
+		tlon, pos, asp = target
+		diff = roots.angle_diff
+		def func(t):
+			res = planet.calc_ut(t, flag)
+			return diff(res[0], tlon), res[3]
+		try:
+			jd = roots.find_root(func, t0, t1, diff(lon0, tlon),
+				diff(lon1, tlon))
+		except ValueError:
+			return None
+		res = planet.calc_ut(jd, flag)
+		return TransitEvent(jd, planet, pos, asp, res[0], res[3])
+	
+	def __repr__(self):
+		return 'Transits(%s bodies, %s %s)' % (len(self._bodies),
+			self._jd_start, self._jd_end)
+
+
+def find_transits(natal, bodies, aspects, jd_start, jd_end, points=None):
+	"""Search transits to a natal chart, with the chart filter settings.
+	
+	:see: Transits.search()
+	
+	:type natal: ChartCalc
+	:type bodies: sequence of Planet, str or int
+	:type aspects: AspectsFilter or sequence of Aspect or str
+	:type jd_start: numeric
+	:type jd_end: numeric
+	:type points: sequence of str
+	:rtype: generator of TransitEvent
+	"""
+	natal._setup_swisseph()
+	tr = Transits(bodies, jd_start, jd_end, natal._filter.compile().calcflag)
+	return tr.search(natal, aspects, points)
+
+
+
+def _test():
+	import doctest
+	doctest.testmod()
+
+
+if __name__ == '__main__':
+	_test()
+
+# End.
@@ -66,7 +66,7 @@ Write element to file:
 import xml.etree.cElementTree as etree
 
 
-__all__ = ['Element', 'parse', 'comment']
+__all__ = ['Element', 'parse', 'iterparse', 'comment']
 
 
 def _serialize(obj):
@@ -520,6 +520,23 @@ def parse(path):
 	return Element(_etree_elem=etree.parse(path).getroot())
 
 
+def iterparse(path, tag):
+	"""Read a file incrementally, generate elements named 'tag'.
+	
+	Elements are cleared once consumed, so big files are never fully
+	loaded in memory.
+	
+	:type path: str
+	:type tag: str
+	:rtype: generator of Element
+	"""
+	tag = _serialize(tag)
+	for event, e in etree.iterparse(path):
+		if e.tag == tag:
+			yield Element(_etree_elem=e)
+			e.clear()
+
+
 def comment(text):
 	"""Comment factory. Return an elementree comment to append somewhere.
 	
@@ -180,6 +180,10 @@ def html_data(chart):
         txt += fmt % {
             'ephem': tr('Jet Propulsion Lab.'),
             'info': chart.filter._ephe_path}
+    elif chart.filter._ephe_type == 'cheby':
+        txt += fmt % {
+            'ephem': tr('Ephemeris cache'),
+            'info': chart.filter._ephe_path}
     else:
         txt += unicode(tr('%(moshier)s<br/>')) % {
             'moshier': tr('Moshier Ephemeris')}
@@ -257,7 +257,7 @@ class ChartPainter(QPainter):
 			width = 55
 		else: ## 2
 			width = 50
-		for aspr in aspectsres.sort_by_ranking():
+		for aspr in aspectsres.ranked():
 			a1 = self._vernalAng - aspr._data1._longitude
 			a2 = self._vernalAng - aspr._data2._longitude
 			w, x = _getPointAt(a1, width)
@@ -186,13 +186,13 @@ class ChartInfoToolBox(QToolBox):
 	
 	def createAspects(self):
 		txt = chthtml.html_aspects(
-			app.desktop.charts[self._idx][self._num].aspects.sort_by_precision())
+			app.desktop.charts[self._idx][self._num].aspects.tightest())
 		self.textEdit4.setHtml(txt)
 	
 	def createMidPoints(self):
 		txt = chthtml.html_midpoints(
 			app.desktop.charts[self._idx][self._num].midpoints,
-			app.desktop.charts[self._idx][self._num].midp_aspects.sort_by_precision())
+			app.desktop.charts[self._idx][self._num].midp_aspects.tightest())
 		self.textEdit5.setHtml(txt)
 	
 	def resetIdx(self, idx):
@@ -291,22 +291,22 @@ class CompareInfoToolBox(QToolBox):
 	
 	def createAspects(self):
 		txt = chthtml.html_aspects(
-			app.desktop.charts[self._idx].interaspects.sort_by_precision())
+			app.desktop.charts[self._idx].interaspects.tightest())
 		self.textEdit1.setHtml(txt)
 	
 	def createMidPoints1(self):
 		txt = chthtml.html_intermidp(
-			app.desktop.charts[self._idx].intermidp1.sort_by_precision())
+			app.desktop.charts[self._idx].intermidp1.tightest())
 		self.textEdit2.setHtml(txt)
 	
 	def createMidPoints2(self):
 		txt = chthtml.html_intermidp(
-			app.desktop.charts[self._idx].intermidp2.sort_by_precision())
+			app.desktop.charts[self._idx].intermidp2.tightest())
 		self.textEdit3.setHtml(txt)
 	
 	def createInterMidPoints(self):
 		txt = chthtml.html_intermidpoints(
-			app.desktop.charts[self._idx].intermidpoints.sort_by_precision())
+			app.desktop.charts[self._idx].intermidpoints.tightest())
 		self.textEdit4.setHtml(txt)
 
 
@@ -84,7 +84,8 @@ class FilterDialog(QDialog):
 		grid.addWidget(QLabel(tr('Ephemeris')), 2, 0)
 		self.ephetypeEdit = QComboBox(self)
 		self.ephetypeEdit.setEditable(False)
-		self.ephetypeEdit.addItems([tr('Swiss'), tr('JPL'), tr('Moshier')])
+		self.ephetypeEdit.addItems([tr('Swiss'), tr('JPL'), tr('Moshier'),
+			tr('Cache')])
 		grid.addWidget(self.ephetypeEdit, 2, 1)
 		# ephe path
 		grid.addWidget(QLabel(tr('Ephem. path')), 3, 0)
@@ -261,7 +262,7 @@ class FilterDialog(QDialog):
 		self.reset()
 	
 	def ephePathSelect(self):
-		"""Select directory (for swisseph) or a file (for jpl)."""
+		"""Select directory (for swisseph) or a file (for jpl, cache)."""
 		path = ''
 		if self.ephetypeEdit.currentIndex() == 0: # swisseph
 			path = unicode(QFileDialog.getExistingDirectory(self,
@@ -271,6 +272,10 @@ class FilterDialog(QDialog):
 			path = unicode(QFileDialog.getOpenFileName(self,
 				self.tr('Set JPL file'),
 				os.path.expanduser('~')))
+		elif self.ephetypeEdit.currentIndex() == 3: # cache
+			path = unicode(QFileDialog.getOpenFileName(self,
+				self.tr('Set ephemeris cache file'),
+				os.path.expanduser('~')))
 		else: # moshier
 			QMessageBox.information(self, self.tr('Moshier ephemeris'),
 				self.tr('No ephemeris path needed for Moshier ephemeris.'))
@@ -411,6 +416,8 @@ class FilterDialog(QDialog):
 			t = 0
 		elif t == 'jpl':
 			t = 1
+		elif t == 'cheby':
+			t = 3
 		else:
 			t = 2
 		self.ephetypeEdit.setCurrentIndex(t)
@@ -486,6 +493,8 @@ class FilterDialog(QDialog):
 			ephetype = 'swiss'
 		elif ephetype == 1:
 			ephetype = 'jpl'
+		elif ephetype == 3:
+			ephetype = 'cheby'
 		else:
 			ephetype = 'moshier'
 		# ephe path
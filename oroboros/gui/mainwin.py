@@ -355,9 +355,8 @@ FITNESS FOR A PARTICULAR PURPOSE.</qt>""")) % {'version': oroboros.__version__}
 		self.resetTabs(idx)
 	
 	def directionModeEvent(self):
-		return
-		# TODO: directions
-		if len(app.desktop.charts) == 1:
+		idx = self.central.currentIndex()
+		if len(app.desktop.charts[idx]) == 1:
 			ok = ChartInfoDialog(idx, 1).exec_()
 			if not ok:
 				return
@@ -158,7 +158,8 @@ setup(
 		},
 	scripts = [
 		'bin/oroboros',
-		'bin/oroboros-hg'
+		'bin/oroboros-hg',
+		'bin/oroboros-cheby'
 		],
 	data_files = [
 		('/usr/share/applications', ['share/oroboros.desktop']),